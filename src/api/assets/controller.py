@@ -0,0 +1,220 @@
+import json
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.api.assets.models import (
+    AssetCreate,
+    AssetRead,
+    AssetSearchPage,
+    AssetUpdate,
+)
+from src.configs.core import settings
+from src.database.core import engine, get_db, get_read_db
+from src.database.entities.assets import Asset, AssetStatusEnum
+from src.database.entities.location import Location, LocationNameEnum
+from src.services.assets.bulk_import import ImportFormat, ImportReport, import_assets
+from src.services.assets.search import AssetSearch, search_assets, search_cache
+
+router = APIRouter()
+
+_CONTENT_TYPES = {
+    "text/csv": ImportFormat.CSV,
+    "application/x-ndjson": ImportFormat.NDJSON,
+    "application/ndjson": ImportFormat.NDJSON,
+    "application/jsonl": ImportFormat.NDJSON,
+}
+
+
+def _bounds(values: List[str], param: str) -> Tuple[Tuple[str, float], ...]:
+    """Parses `key:number` query values."""
+    bounds = []
+    for value in values:
+        key, _, number = value.rpartition(":")
+        try:
+            bounds.append((key, float(number)))
+        except ValueError:
+            key = ""
+        if not key:
+            raise HTTPException(
+                status_code=422, detail=f"{param} must look like 'key:number'."
+            )
+    return tuple(bounds)
+
+
+def _asset_read(db: Session, asset: Asset) -> AssetRead:
+    location = db.get(Location, asset.current_location_id)
+    return AssetRead(
+        id=asset.id,
+        serial_number=asset.serial_number,
+        short_id=asset.short_id,
+        name=asset.name,
+        description=asset.description,
+        attributes=asset.attributes,
+        location=location.name if location else None,
+        current_status=asset.current_status,
+        created_at=asset.created_at,
+        updated_at=asset.updated_at,
+    )
+
+
+@router.post(
+    "/import",
+    response_model=ImportReport,
+    summary="Bulk Import Assets from CSV or NDJSON",
+)
+async def import_asset_catalogue(
+    request: Request, format: Optional[ImportFormat] = Query(None)
+):
+    """
+    Streams a catalogue of assets into the registry, upserting on `serial_number`.
+    The format is taken from `format` or the `Content-Type` (`text/csv` or
+    `application/x-ndjson`). CSV needs a header row; columns are `serial_number`,
+    `name`, `description`, `attributes` (a JSON object), `location` and
+    `current_status`, the last two only applied to new assets.
+
+    The body is never held in memory as a whole: rows are validated and loaded with
+    COPY in chunks, each in its own transaction. Rejected rows are reported by line
+    number and do not stop the import.
+    """
+    import_format = format or _CONTENT_TYPES.get(
+        request.headers.get("content-type", "").split(";")[0].strip()
+    )
+    if import_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send text/csv or application/x-ndjson, or set ?format=.",
+        )
+    try:
+        return await import_assets(
+            engine,
+            request.stream(),
+            import_format,
+            chunk_rows=settings.ASSET_IMPORT_CHUNK_ROWS,
+            max_errors=settings.ASSET_IMPORT_MAX_ERRORS,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        search_cache.clear()
+
+
+@router.get(
+    "/search",
+    response_model=AssetSearchPage,
+    summary="Search the Asset Catalogue",
+)
+def search_asset_catalogue(
+    q: Optional[str] = Query(
+        None, min_length=1, description="Text in the name or description."
+    ),
+    attributes: Optional[str] = Query(
+        None,
+        description='JSON object the attributes must contain, e.g. {"origin": "Mogok"}.',
+    ),
+    attribute_min: List[str] = Query(
+        [], description="Lower bound of a numeric attribute, e.g. carats:5."
+    ),
+    attribute_max: List[str] = Query(
+        [], description="Upper bound of a numeric attribute, e.g. carats:10."
+    ),
+    status: List[AssetStatusEnum] = Query([]),
+    location: Optional[LocationNameEnum] = Query(None),
+    after: Optional[str] = Query(None, description="`next_after` of the last page."),
+    limit: int = Query(50, ge=1, le=settings.ASSET_SEARCH_MAX_LIMIT),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Finds assets by any combination of text, attributes, status and location, in
+    serial number order. Text and attribute filters use GIN indexes; pages are
+    fetched by keyset (`after`) and cached briefly per query.
+    """
+    contains = None
+    if attributes is not None:
+        try:
+            contains = json.loads(attributes)
+        except ValueError:
+            contains = None
+        if not isinstance(contains, dict):
+            raise HTTPException(
+                status_code=422, detail="attributes must be a JSON object."
+            )
+    page = search_assets(
+        db,
+        AssetSearch(
+            text=q,
+            attributes=contains,
+            attribute_min=_bounds(attribute_min, "attribute_min"),
+            attribute_max=_bounds(attribute_max, "attribute_max"),
+            statuses=tuple(status),
+            location=location,
+            after=after,
+            limit=limit,
+        ),
+    )
+    return AssetSearchPage(items=page.items, next_after=page.next_after)
+
+
+@router.post(
+    "",
+    response_model=AssetRead,
+    summary="Register an Asset",
+    status_code=201,
+)
+def create_asset(asset_in: AssetCreate, db: Session = Depends(get_db)):
+    location = db.query(Location).filter(Location.name == asset_in.location).first()
+    if location is None:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Location {asset_in.location.value} does not exist.",
+        )
+    asset = Asset(
+        serial_number=asset_in.serial_number,
+        name=asset_in.name,
+        description=asset_in.description,
+        attributes=asset_in.attributes,
+        current_location_id=location.id,
+    )
+    db.add(asset)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"An asset with serial number '{asset_in.serial_number}' exists.",
+        )
+    db.refresh(asset)
+    search_cache.clear()
+    return _asset_read(db, asset)
+
+
+@router.get("/{asset_id}", response_model=AssetRead, summary="Get an Asset")
+def get_asset(asset_id: UUID, db: Session = Depends(get_read_db)):
+    asset = db.get(Asset, asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found.")
+    return _asset_read(db, asset)
+
+
+@router.patch(
+    "/{asset_id}", response_model=AssetRead, summary="Update an Asset's Catalogue Entry"
+)
+def update_asset(asset_id: UUID, asset_in: AssetUpdate, db: Session = Depends(get_db)):
+    """Updates name, description or attributes; custody state is left to the daemon."""
+    updates = asset_in.dict(exclude_unset=True)
+    if "name" in updates and updates["name"] is None:
+        # Only description and attributes may be cleared.
+        raise HTTPException(status_code=422, detail="An asset's name cannot be null.")
+    asset = db.get(Asset, asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found.")
+    for field, value in updates.items():
+        setattr(asset, field, value)
+    db.commit()
+    db.refresh(asset)
+    search_cache.clear()
+    return _asset_read(db, asset)
@@ -0,0 +1,51 @@
+import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from src.database.entities.assets import AssetStatusEnum
+from src.database.entities.location import LocationNameEnum
+
+
+class AssetCreate(BaseModel):
+    serial_number: str = Field(..., min_length=1, max_length=255)
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
+    location: LocationNameEnum = LocationNameEnum.VAULT
+
+
+# Location and status are custody state, changed only by the daemon.
+class AssetUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
+
+
+class AssetRead(BaseModel):
+    id: UUID
+    serial_number: str
+    short_id: int
+    name: str
+    description: Optional[str]
+    attributes: Optional[Dict[str, Any]]
+    location: Optional[LocationNameEnum]
+    current_status: AssetStatusEnum
+    created_at: Optional[datetime.datetime]
+    updated_at: Optional[datetime.datetime]
+
+
+class AssetSummary(BaseModel):
+    id: UUID
+    serial_number: str
+    name: str
+    current_status: AssetStatusEnum
+    location: Optional[LocationNameEnum]
+    attributes: Optional[Dict[str, Any]]
+
+
+class AssetSearchPage(BaseModel):
+    items: List[AssetSummary]
+    # Pass as `after` to get the next page; null on the last page.
+    next_after: Optional[str]
@@ -0,0 +1,96 @@
+import hmac
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, Request
+
+from src.configs.core import settings
+from src.services.ingest.admission import (
+    AdmissionRejected,
+    RequestTooLarge,
+    admission_controller,
+)
+
+
+def authenticate_gateway(gateway_id: Optional[str], token: Optional[str]) -> bool:
+    """Whether `token` is the shared token of `gateway_id` in INGEST_GATEWAY_TOKENS."""
+    expected = settings.INGEST_GATEWAY_TOKENS.get(gateway_id or "")
+    return bool(expected and token) and hmac.compare_digest(expected, token)
+
+
+def gateway_key(request: Request) -> str:
+    """
+    Who a request is charged to: its gateway, if `X-Gateway-Id` comes with that
+    gateway's `X-Gateway-Token`, or else the client address. An unauthenticated id
+    is ignored, so a client cannot get a fresh bucket or drain another gateway's
+    by changing the header.
+    """
+    gateway_id = request.headers.get("X-Gateway-Id")
+    if authenticate_gateway(gateway_id, request.headers.get("X-Gateway-Token")):
+        return f"gw:{gateway_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def _http_error(e: AdmissionRejected) -> HTTPException:
+    if isinstance(e, RequestTooLarge):
+        return HTTPException(
+            status_code=413,
+            detail="The request has more readings than ingestion admits at once; "
+            "split it.",
+        )
+    return HTTPException(
+        status_code=429,
+        detail=f"Ingestion is over its limit ({e.reason}); retry later.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@contextmanager
+def admitted(
+    request: Request,
+    sensor: Optional[str] = None,
+    sensor_type: Optional[str] = None,
+    priority: Optional[bool] = None,
+    cost: int = 1,
+) -> Iterator[None]:
+    """Runs the block under admission control, shedding the request with a 429."""
+    if admission_controller is None:
+        yield
+        return
+    try:
+        admission_controller.acquire(
+            gateway_key(request),
+            sensor=sensor,
+            sensor_type=sensor_type,
+            priority=priority,
+            cost=cost,
+        )
+    except AdmissionRejected as e:
+        raise _http_error(e)
+    try:
+        yield
+    finally:
+        admission_controller.release()
+
+
+@contextmanager
+def admitted_mixed(
+    request: Request, priority_cost: int, normal_cost: int
+) -> Iterator[bool]:
+    """
+    `admitted` for a request with priority and normal readings, e.g. a frame.
+    Yields whether the normal readings are admitted too.
+    """
+    if admission_controller is None:
+        yield True
+        return
+    try:
+        admit_normal = admission_controller.acquire_mixed(
+            gateway_key(request), priority_cost=priority_cost, normal_cost=normal_cost
+        )
+    except AdmissionRejected as e:
+        raise _http_error(e)
+    try:
+        yield admit_normal
+    finally:
+        admission_controller.release()
@@ -0,0 +1,196 @@
+import time
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.api.ingest.admission import admitted_mixed
+from src.database.core import get_db, get_read_db
+from src.database.entities.asset_tracking import AssetTracking
+from src.database.entities.assets import Asset
+from src.database.entities.sensor import Sensor
+from src.services.ingest.frames import (
+    CONTENT_TYPE,
+    FrameError,
+    build_rows,
+    decode_frame,
+)
+from src.services.ingest.admission import admission_controller
+from src.services.ingest.health import sensor_health
+from src.services.ingest.registry import ingest_registry
+from src.services.ingest.write_behind import write_behind_buffer
+from src.services.metrics.collectors import (
+    INGEST_FRAME_READINGS_TOTAL,
+    INGEST_FRAME_SECONDS,
+)
+
+
+class FrameResult(BaseModel):
+    accepted: int
+    rejected: List[Dict[str, Any]]
+
+
+class Heartbeats(BaseModel):
+    sensors: List[int]
+
+
+class HeartbeatResult(BaseModel):
+    statuses: Dict[int, str]
+    unknown: List[int]
+
+
+class ShortIds(BaseModel):
+    sensors: Dict[str, int]
+    assets: Dict[str, int]
+
+
+router = APIRouter()
+
+
+def store_rows(db: Session, rows: List[Dict[str, Any]]):
+    """Writes validated rows with one bulk insert, or hands them to write-behind."""
+    if not rows:
+        return
+    if write_behind_buffer:
+        ids = write_behind_buffer.ids.next_ids(len(rows))
+        write_behind_buffer.append_inserts(
+            [{"id": row_id, **row} for row_id, row in zip(ids, rows)]
+        )
+        return
+    db.execute(insert(AssetTracking), rows)
+    db.commit()
+
+
+@router.post(
+    "/frames",
+    response_model=FrameResult,
+    summary="Ingest a Binary Frame of Sensor Readings",
+    status_code=201,
+)
+def ingest_frame(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: bytes = Body(..., media_type=CONTENT_TYPE),
+):
+    """
+    Accepts a CBOR frame of many readings from a sensor gateway (see
+    `src/services/ingest/frames.py` for the layout) and stores them with a single
+    bulk insert. Sensors and assets are referenced by the short ids listed at
+    `GET /ingest/short-ids`.
+
+    Readings that fail validation are reported back by index and skipped; the rest
+    of the frame is stored. With write-behind ingestion enabled the response is
+    `202 Accepted` once the readings are durable in the local ingest log.
+
+    A frame costs its gateway (`X-Gateway-Id` with its `X-Gateway-Token`, or else
+    the client address) one token per reading and is shed with `429` and
+    `Retry-After` when over the limit, or refused with `413` if it has more readings
+    than the limit ever admits at once. Under load only the readings of priority
+    sensor types are admitted and the rest are rejected individually; so are
+    readings from a sensor that is over its own limit or in MAINTENANCE. Every
+    admitted reading counts as a heartbeat of its sensor.
+    """
+    with INGEST_FRAME_SECONDS.time():
+        try:
+            readings = decode_frame(payload)
+        except FrameError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Classified from the registry's cache only, so a shed frame costs no
+        # query. A sensor that is not cached yet is charged as normal priority,
+        # unless that would make the frame too large to ever admit: it may well be
+        # a custody sensor, and the lookup below caches it for the next frame.
+        cached = ingest_registry.cached_sensors_by_short_ids(r.sensor for r in readings)
+        priority_ids = set()
+        if admission_controller:
+            priority_ids = {
+                short_id
+                for short_id, sensor in cached.items()
+                if admission_controller.is_priority(sensor.sensor_type)
+            }
+            uncached = {r.sensor for r in readings} - cached.keys()
+            if (
+                sum(1 for r in readings if r.sensor not in priority_ids)
+                > admission_controller.max_normal_cost
+            ):
+                priority_ids |= uncached
+        priority_cost = sum(1 for r in readings if r.sensor in priority_ids)
+        with admitted_mixed(
+            request,
+            priority_cost=priority_cost,
+            normal_cost=len(readings) - priority_cost,
+        ) as admit_normal:
+            sensors = ingest_registry.sensors_by_short_ids(
+                db, (r.sensor for r in readings)
+            )
+            assets = ingest_registry.assets_by_short_ids(
+                db, (r.asset for r in readings if r.asset is not None)
+            )
+            rows, rejected = build_rows(
+                readings,
+                sensors,
+                assets,
+                allow=(
+                    (lambda sensor: admission_controller.allow_sensor(str(sensor.id)))
+                    if admission_controller
+                    else None
+                ),
+                in_maintenance=sensor_health.in_maintenance,
+                shed=(
+                    None
+                    if admit_normal
+                    else (lambda sensor: sensor.short_id not in priority_ids)
+                ),
+            )
+            sensor_health.beat(
+                {
+                    sensors[r.sensor].id
+                    for r in readings
+                    if r.sensor in sensors
+                    and (admit_normal or r.sensor in priority_ids)
+                }
+            )
+            store_rows(db, rows)
+
+    INGEST_FRAME_READINGS_TOTAL.labels("accepted").inc(len(rows))
+    INGEST_FRAME_READINGS_TOTAL.labels("rejected").inc(len(rejected))
+    if write_behind_buffer:
+        response.status_code = 202
+    return FrameResult(accepted=len(rows), rejected=rejected)
+
+
+@router.post(
+    "/heartbeats",
+    response_model=HeartbeatResult,
+    summary="Report That Sensors Are Alive",
+)
+def record_heartbeats(heartbeats: Heartbeats, db: Session = Depends(get_read_db)):
+    """
+    Marks the sensors (by short id) as alive. Heartbeats are kept in memory and
+    flushed to `sensors` in bulk, never stored as tracking events. Returns each
+    known sensor's status, so a gateway learns when one is put in MAINTENANCE.
+    """
+    sensors = ingest_registry.sensors_by_short_ids(db, heartbeats.sensors)
+    sensor_health.beat(s.id for s in sensors.values())
+    return HeartbeatResult(
+        statuses={
+            short_id: sensor_health.status(sensor)
+            for short_id, sensor in sensors.items()
+        },
+        unknown=sorted(set(heartbeats.sensors) - sensors.keys()),
+    )
+
+
+@router.get(
+    "/short-ids",
+    response_model=ShortIds,
+    summary="List the Short Ids Gateways Use in Binary Frames",
+)
+def list_short_ids(db: Session = Depends(get_read_db)):
+    return ShortIds(
+        sensors=dict(db.query(Sensor.name, Sensor.short_id).all()),
+        assets=dict(db.query(Asset.serial_number, Asset.short_id).all()),
+    )
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from typing import List, Set, Tuple
+
+import cbor2
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.api.ingest.admission import authenticate_gateway
+from src.configs.core import settings
+from src.database.core import SessionLocal
+from src.database.entities.asset_tracking import AssetTracking
+from src.database.entities.ingest_gateway import IngestGateway
+from src.services.ingest.frames import FrameError, Reading, build_rows, parse_frame
+from src.services.ingest.health import sensor_health
+from src.services.ingest.registry import ingest_registry
+from src.services.metrics.collectors import (
+    INGEST_FRAME_READINGS_TOTAL,
+    INGEST_WS_COMMIT_SECONDS,
+    INGEST_WS_CONNECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_sessions: Set["GatewaySession"] = set()
+INGEST_WS_CONNECTIONS.set_function(lambda: len(_sessions))
+
+# A frame that could not be parsed is committed as an empty frame, so the cumulative
+# ack can move past it and the gateway does not resend it forever.
+_EMPTY: List[Reading] = []
+
+
+def _last_committed_seq(gateway_id: str) -> int:
+    with SessionLocal() as db:
+        last_seq = db.scalar(
+            select(IngestGateway.last_seq).where(IngestGateway.gateway_id == gateway_id)
+        )
+        return last_seq or 0
+
+
+def _commit_frames(gateway_id: str, frames: List[Tuple[int, List[Reading]]]):
+    """
+    Stores a batch of frames in one transaction together with the gateway's new
+    resume point, so an acknowledged frame is never stored twice. The gateway's row
+    is locked first and frames at or below its stored sequence number are skipped:
+    a session the gateway has since replaced may still be committing. Returns the
+    rejected readings per sequence number.
+    """
+    rejected_by_seq = {}
+    with SessionLocal() as db:
+        db.execute(
+            pg_insert(IngestGateway)
+            .values(gateway_id=gateway_id, last_seq=0)
+            .on_conflict_do_nothing(index_elements=[IngestGateway.gateway_id])
+        )
+        last_seq = db.scalar(
+            select(IngestGateway.last_seq)
+            .where(IngestGateway.gateway_id == gateway_id)
+            .with_for_update()
+        )
+        frames = [(seq, frame) for seq, frame in frames if seq > last_seq]
+        if not frames:
+            db.commit()
+            return rejected_by_seq
+
+        readings = [reading for _, frame in frames for reading in frame]
+        sensors = ingest_registry.sensors_by_short_ids(db, (r.sensor for r in readings))
+        sensor_health.beat(s.id for s in sensors.values())
+        assets = ingest_registry.assets_by_short_ids(
+            db, (r.asset for r in readings if r.asset is not None)
+        )
+        rows = []
+        for seq, frame in frames:
+            frame_rows, rejected = build_rows(
+                frame, sensors, assets, in_maintenance=sensor_health.in_maintenance
+            )
+            rows.extend(frame_rows)
+            if rejected:
+                rejected_by_seq[seq] = rejected
+        if rows:
+            db.execute(insert(AssetTracking), rows)
+        db.execute(
+            update(IngestGateway)
+            .where(IngestGateway.gateway_id == gateway_id)
+            .values(last_seq=func.greatest(IngestGateway.last_seq, frames[-1][0]))
+        )
+        db.commit()
+    INGEST_FRAME_READINGS_TOTAL.labels("accepted").inc(len(rows))
+    INGEST_FRAME_READINGS_TOTAL.labels("rejected").inc(
+        sum(len(r) for r in rejected_by_seq.values())
+    )
+    return rejected_by_seq
+
+
+class GatewaySession:
+    """
+    One connected gateway. The receiver parses frames into a queue bounded by the
+    maximum window, so a gateway that ignores the advertised window is slowed down
+    by TCP backpressure once the queue is full. The committer drains whatever is
+    queued, commits it as one transaction and sends a single cumulative ack.
+
+    The advertised window is additive-increase / multiplicative-decrease on commit
+    latency: a slow commit halves it, a fast one grows it by one frame.
+    """
+
+    def __init__(self, websocket: WebSocket, gateway_id: str, last_seq: int):
+        self.websocket = websocket
+        self.gateway_id = gateway_id
+        self.expected_seq = last_seq + 1
+        self.max_window = settings.INGEST_WS_MAX_WINDOW
+        self.window = self.max_window
+        self.queue: "asyncio.Queue[Tuple[int, List[Reading]]]" = asyncio.Queue(
+            maxsize=self.max_window
+        )
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self):
+        self._tasks = {
+            asyncio.create_task(self._receive()),
+            asyncio.create_task(self._commit()),
+        }
+        done, pending = await asyncio.wait(
+            self._tasks, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not task.cancelled():
+                task.result()
+
+    async def supersede(self):
+        """
+        Ends the session because its gateway connected again. A commit already
+        running finishes; `_commit_frames` skips what it stored.
+        """
+        for task in self._tasks:
+            task.cancel()
+        try:
+            await self.websocket.close(
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason="Superseded by a newer connection.",
+            )
+        except RuntimeError:
+            pass  # Already closed.
+
+    async def _receive(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                seq, frame = cbor2.loads(message["bytes"])
+                seq = int(seq)
+            except (KeyError, cbor2.CBORDecodeError, TypeError, ValueError):
+                await self.websocket.close(
+                    code=status.WS_1003_UNSUPPORTED_DATA,
+                    reason="Messages must be CBOR [seq, frame].",
+                )
+                return
+            if seq < self.expected_seq:
+                continue  # Resent after a reconnect; already committed.
+            if seq > self.expected_seq:
+                await self.websocket.close(
+                    code=status.WS_1002_PROTOCOL_ERROR,
+                    reason=f"Expected sequence number {self.expected_seq}, got {seq}.",
+                )
+                return
+            self.expected_seq += 1
+            try:
+                readings = parse_frame(frame)
+            except FrameError as e:
+                await self.websocket.send_json(
+                    {"type": "error", "seq": seq, "detail": str(e)}
+                )
+                readings = _EMPTY
+            await self.queue.put((seq, readings))
+
+    async def _commit(self):
+        while True:
+            batch = [await self.queue.get()]
+            while (
+                len(batch) < settings.INGEST_WS_MAX_BATCH_FRAMES
+                and not self.queue.empty()
+            ):
+                batch.append(self.queue.get_nowait())
+
+            started = time.perf_counter()
+            with INGEST_WS_COMMIT_SECONDS.time():
+                rejected_by_seq = await asyncio.to_thread(
+                    _commit_frames, self.gateway_id, batch
+                )
+            self._adjust_window(time.perf_counter() - started)
+
+            for seq, rejected in rejected_by_seq.items():
+                await self.websocket.send_json(
+                    {"type": "rejected", "seq": seq, "readings": rejected}
+                )
+            await self.websocket.send_json(
+                {"type": "ack", "seq": batch[-1][0], "window": self.window}
+            )
+
+    def _adjust_window(self, commit_seconds: float):
+        if commit_seconds * 1000 > settings.INGEST_WS_SLOW_COMMIT_MS:
+            self.window = max(self.window // 2, 1)
+        else:
+            self.window = min(self.window + 1, self.max_window)
+
+
+@router.websocket("/ws")
+async def gateway_socket(websocket: WebSocket):
+    """
+    Long-lived ingestion channel for sensor gateways.
+
+    1. The gateway sends `{"type": "hello", "gateway_id": ..., "token": ...}` and
+       receives `{"type": "welcome", "last_acked": n, "window": w}`.
+    2. It then streams binary messages, each a CBOR `[seq, frame]` where `frame` is
+       a binary ingestion frame and `seq` counts up from `last_acked + 1`.
+    3. The server replies with cumulative `{"type": "ack", "seq": n, "window": w}`
+       once every frame up to `n` is committed, and the gateway keeps at most `w`
+       frames unacknowledged. Rejected readings and unparseable frames are reported
+       with `rejected` and `error` messages; they are still acknowledged.
+
+    After a reconnect the gateway resends everything after `last_acked`; frames that
+    were already committed are skipped. A new connection from a gateway closes its
+    previous one.
+    """
+    await websocket.accept()
+    try:
+        hello = await websocket.receive_json()
+    except (WebSocketDisconnect, ValueError):
+        return
+    gateway_id = hello.get("gateway_id") if isinstance(hello, dict) else None
+    if not authenticate_gateway(gateway_id, hello.get("token") if gateway_id else None):
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Authentication failed."
+        )
+        return
+
+    for other in [s for s in _sessions if s.gateway_id == gateway_id]:
+        logger.info("Gateway reconnected", extra={"gateway_id": gateway_id})
+        await other.supersede()
+
+    last_seq = await asyncio.to_thread(_last_committed_seq, gateway_id)
+    session = GatewaySession(websocket, gateway_id, last_seq)
+    await websocket.send_json(
+        {"type": "welcome", "last_acked": last_seq, "window": session.window}
+    )
+    logger.info("Gateway connected", extra={"gateway_id": gateway_id})
+    _sessions.add(session)
+    try:
+        await session.run()
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.exception("Gateway session failed", extra={"gateway_id": gateway_id})
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        _sessions.discard(session)
+        logger.info("Gateway disconnected", extra={"gateway_id": gateway_id})
@@ -0,0 +1,64 @@
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from src.services.occupancy.index import occupancy_index
+
+
+class LocationAssets(BaseModel):
+    location: str
+    count: int
+    asset_ids: List[UUID]
+
+
+class AssetLocation(BaseModel):
+    asset_id: UUID
+    location: Optional[str]
+
+
+router = APIRouter()
+
+
+def _require_ready():
+    if not occupancy_index.ready:
+        raise HTTPException(
+            status_code=503, detail="The occupancy index is loading; retry shortly."
+        )
+
+
+@router.get(
+    "/{location_name}/assets",
+    response_model=LocationAssets,
+    summary="List the Assets at a Location Right Now",
+)
+def list_assets_at_location(location_name: str):
+    """
+    Served from the in-memory occupancy index, which follows every committed state
+    change; released assets are not listed anywhere.
+    """
+    _require_ready()
+    asset_ids = occupancy_index.assets_at(location_name)
+    if asset_ids is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown location '{location_name}'. Choose one of: "
+            f"{', '.join(occupancy_index.locations())}.",
+        )
+    return LocationAssets(
+        location=location_name, count=len(asset_ids), asset_ids=asset_ids
+    )
+
+
+@router.get(
+    "/by-asset/{asset_id}",
+    response_model=AssetLocation,
+    summary="Find the Location of an Asset",
+)
+def get_asset_location(asset_id: UUID):
+    """The location an asset is at; `null` if it is released or unknown."""
+    _require_ready()
+    return AssetLocation(
+        asset_id=asset_id, location=occupancy_index.location_of(str(asset_id))
+    )
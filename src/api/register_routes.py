@@ -1,4 +1,9 @@
 from fastapi import APIRouter
+from src.api.assets.controller import router as assets_router
+from src.api.export.controller import router as export_router
+from src.api.ingest.controller import router as ingest_router
+from src.api.ingest.gateway import router as gateway_router
+from src.api.locations.controller import router as locations_router
 from src.api.simulation.controller import router as simulation_router
 
 api_router = APIRouter()
@@ -7,3 +12,12 @@ api_router = APIRouter()
 api_router.include_router(
     simulation_router, prefix="/simulation", tags=["Simulation Endpoints"]
 )
+api_router.include_router(ingest_router, prefix="/ingest", tags=["Ingestion Endpoints"])
+api_router.include_router(
+    gateway_router, prefix="/ingest", tags=["Ingestion Endpoints"]
+)
+api_router.include_router(export_router, prefix="/export", tags=["Export Endpoints"])
+api_router.include_router(
+    locations_router, prefix="/locations", tags=["Location Endpoints"]
+)
+api_router.include_router(assets_router, prefix="/assets", tags=["Asset Endpoints"])
@@ -1,16 +1,28 @@
 import datetime
+import time
 from enum import Enum
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Request, Response
 from pydantic import BaseModel, Field
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
 
+from src.api.ingest.admission import admitted
+from src.configs.core import settings
 from src.database.core import get_db  # Corrected import path
-from src.database.entities.sensor import Sensor
-from src.database.entities.assets import Asset
 from src.database.entities.asset_tracking import AssetTracking
+from src.services.ingest.coalescer import BurstCoalescer, coalesce_key
+from src.services.ingest.health import sensor_health
+from src.services.ingest.payload import merge_details, split_row
+from src.services.ingest.registry import ingest_registry
+from src.services.ingest.write_behind import write_behind_buffer
+from src.services.metrics.collectors import (
+    INGEST_COALESCED_READS_TOTAL,
+    INGEST_REQUEST_SECONDS,
+)
 
 
 class SensorName(str, Enum):
@@ -37,6 +49,7 @@ class AssetTrackingCreate(BaseModel):
     event_type: str
     details: Optional[Dict[str, Any]] = None
     timestamp: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    idempotency_key: Optional[str] = Field(None, max_length=64)
 
 
 # --- Schema for returning a created tracking event ---
@@ -48,6 +61,8 @@ class AssetTrackingInDB(BaseModel):
     event_type: str
     details: Optional[Dict[str, Any]]
     timestamp: datetime.datetime
+    repeat_count: int = 1
+    last_seen_at: Optional[datetime.datetime] = None
 
     class Config:
         orm_mode = True  # Allows the model to be created from a SQLAlchemy object
@@ -55,6 +70,92 @@ class AssetTrackingInDB(BaseModel):
 
 router = APIRouter()
 
+coalescer = (
+    BurstCoalescer(
+        settings.INGEST_DEBOUNCE_WINDOWS_MS, maxsize=settings.INGEST_COALESCE_CACHE_SIZE
+    )
+    if settings.INGEST_COALESCE_ENABLED
+    else None
+)
+
+
+def _in_db(db_event: AssetTracking) -> AssetTrackingInDB:
+    """The stored row as the client sent it, with its typed payload fields merged."""
+    return AssetTrackingInDB(
+        id=db_event.id,
+        asset_id=db_event.asset_id,
+        sensor_id=db_event.sensor_id,
+        event_type=db_event.event_type,
+        details=merge_details(db_event),
+        timestamp=db_event.timestamp,
+        repeat_count=db_event.repeat_count,
+        last_seen_at=db_event.last_seen_at,
+    )
+
+
+def _record_repeat(
+    db: Session, row_id: int, seen_at: datetime.datetime
+) -> Optional[AssetTracking]:
+    """
+    Folds a repeated read into the row of its burst. Rows the daemon has already
+    linked to a state change are left alone, so the caller inserts a new row instead.
+    """
+    stmt = (
+        update(AssetTracking)
+        .where(AssetTracking.id == row_id, AssetTracking.state_change_id.is_(None))
+        .values(
+            repeat_count=AssetTracking.repeat_count + 1,
+            last_seen_at=seen_at,
+        )
+        .returning(AssetTracking)
+        .execution_options(synchronize_session=False)
+    )
+    db_event = db.scalars(stmt).first()
+    db.commit()
+    return db_event
+
+
+def _accept_write_behind(
+    event: AssetTrackingCreate, sensor_type: str, body: Dict[str, Any]
+) -> AssetTrackingInDB:
+    """
+    Durably logs the event for the write-behind flusher and acknowledges it with
+    the id it will be committed under. Retries and burst repeats are resolved
+    against the coalescer's caches, since the row may not be in the database yet.
+    """
+    idempotency_key = event.idempotency_key
+    if coalescer and idempotency_key:
+        known_id = coalescer.lookup_idempotency_key(idempotency_key)
+        if known_id is not None:
+            return AssetTrackingInDB(id=known_id, **event.dict())
+
+    read_key = None
+    now = time.monotonic()
+    if coalescer:
+        subject = event.asset_id or body.get("custodian_id")
+        read_key = coalesce_key(
+            event.sensor_id, subject, event.event_type, event.details
+        )
+        burst = coalescer.extend(read_key, sensor_type, now)
+        if burst is not None:
+            repeat_of, reads = burst
+            write_behind_buffer.append_repeat(repeat_of, event.timestamp, reads)
+            if idempotency_key:
+                # A retry must not count as another read of the burst.
+                coalescer.remember_idempotency_key(idempotency_key, repeat_of)
+            INGEST_COALESCED_READS_TOTAL.labels(sensor_type).inc()
+            return AssetTrackingInDB(
+                id=repeat_of, last_seen_at=event.timestamp, **event.dict()
+            )
+
+    row_id = write_behind_buffer.ids.next_id()
+    write_behind_buffer.append_insert(split_row({"id": row_id, **event.dict()}))
+    if coalescer:
+        coalescer.remember(read_key, sensor_type, row_id, now)
+        if idempotency_key:
+            coalescer.remember_idempotency_key(idempotency_key, row_id)
+    return AssetTrackingInDB(id=row_id, **event.dict())
+
 
 @router.post(
     "/trigger/{sensor_name}",
@@ -64,6 +165,8 @@ router = APIRouter()
 )
 def trigger_sensor_event(
     sensor_name: SensorName,  # Dropdown from Enum
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     body: Dict[str, Any] = Body(
         ...,
@@ -72,6 +175,7 @@ def trigger_sensor_event(
             "details": {"direction": "out"},
         },
     ),
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     Simulates an event from a specific sensor, chosen from a dropdown list.
@@ -83,73 +187,161 @@ def trigger_sensor_event(
     - **RFID Sensors**: Must include `asset_serial_number`.
     - **Biometric Sensors**: Must include `custodian_id`.
     - **Environmental Sensors**: Must include `details` with readings.
-    """
-    # 1. DYNAMIC VALIDATION: Get the sensor from the database
-    sensor_in_db = db.query(Sensor).filter(Sensor.name == sensor_name.value).first()
-    if not sensor_in_db:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Sensor '{sensor_name.value}' not found in the database. The API Enum may be out of date.",
-        )
 
-    asset_in_db = None
-    event_type = ""
-    asset_serial_value = body.get("asset_serial_number")
+    Identical reads from the same sensor for the same asset within the sensor type's
+    debounce window are coalesced into the existing row (its `repeat_count` and
+    `last_seen_at` are updated). Retries carrying the same `Idempotency-Key` header
+    (or `idempotency_key` body field) return the originally created row.
 
-    # 2. CONTEXT-AWARE VALIDATION: Check body based on sensor type
-    if sensor_in_db.sensor_type in ("RFID_GATE", "SMART_SHOWCASE", "NFC_READER"):
-        if not asset_serial_value:
-            raise HTTPException(
-                status_code=422,
-                detail="This event type requires an 'asset_serial_number' in the body.",
-            )
+    With write-behind ingestion enabled, the event is acknowledged with `202 Accepted`
+    as soon as it is durable in the local ingest log; it reaches `asset_tracking`
+    with the returned id on the next group commit.
 
-        # Validate the asset serial number
-        asset_in_db = (
-            db.query(Asset).filter(Asset.serial_number == asset_serial_value).first()
-        )
-        if not asset_in_db:
+    Each sensor and gateway (`X-Gateway-Id` with its `X-Gateway-Token`, or else the
+    client address) is rate limited, and custody sensor types are served ahead of
+    environmental readings under load. A shed request gets `429 Too Many Requests` with `Retry-After`.
+    """
+    started = time.perf_counter()
+    sensor_type = "UNKNOWN"
+    try:
+        # 1. DYNAMIC VALIDATION: Get the sensor from the database
+        sensor_in_db = ingest_registry.sensor_by_name(db, sensor_name.value)
+        if not sensor_in_db:
             raise HTTPException(
                 status_code=404,
-                detail=f"Asset with serial number '{asset_serial_value}' not found.",
+                detail=f"Sensor '{sensor_name.value}' not found in the database. The API Enum may be out of date.",
             )
-
-        event_type = f"{sensor_in_db.sensor_type}_SCAN"
-
-    elif sensor_in_db.sensor_type == "BIOMETRIC_SCANNER":
-        if "custodian_id" not in body:
+        sensor_type = sensor_in_db.sensor_type
+        if sensor_health.in_maintenance(sensor_in_db):
             raise HTTPException(
-                status_code=422,
-                detail="This event type requires a 'custodian_id' in the body.",
+                status_code=409,
+                detail=f"Sensor '{sensor_name.value}' is in MAINTENANCE; its events are not accepted.",
             )
-        event_type = (
-            "BIOMETRIC_SUCCESS"
-            if body.get("scan_successful", True)
-            else "BIOMETRIC_FAILURE"
-        )
 
-    elif sensor_in_db.sensor_type == "ENVIRONMENTAL":
-        if "details" not in body:
-            raise HTTPException(
-                status_code=422,
-                detail="Environmental sensors require a 'details' object with readings.",
+        # Shed the request here, before it reaches the database, if the sensor,
+        # its gateway or the ingestion path as a whole is over its limit.
+        with admitted(request, sensor=str(sensor_in_db.id), sensor_type=sensor_type):
+            sensor_health.beat([sensor_in_db.id])
+            asset_in_db = None
+            event_type = ""
+            asset_serial_value = body.get("asset_serial_number")
+
+            # 2. CONTEXT-AWARE VALIDATION: Check body based on sensor type
+            if sensor_type in ("RFID_GATE", "SMART_SHOWCASE", "NFC_READER"):
+                if not asset_serial_value:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="This event type requires an 'asset_serial_number' in the body.",
+                    )
+
+                # Validate the asset serial number
+                asset_in_db = ingest_registry.asset_by_serial(db, asset_serial_value)
+                if not asset_in_db:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Asset with serial number '{asset_serial_value}' not found.",
+                    )
+
+                event_type = f"{sensor_type}_SCAN"
+
+            elif sensor_type == "BIOMETRIC_SCANNER":
+                if "custodian_id" not in body:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="This event type requires a 'custodian_id' in the body.",
+                    )
+                event_type = (
+                    "BIOMETRIC_SUCCESS"
+                    if body.get("scan_successful", True)
+                    else "BIOMETRIC_FAILURE"
+                )
+
+            elif sensor_type == "ENVIRONMENTAL":
+                if "details" not in body:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Environmental sensors require a 'details' object with readings.",
+                    )
+                event_type = "ENV_READING"
+
+            else:  # For CAMERA_MOTION, WEIGHT_PLATE, etc.
+                event_type = f"{sensor_type}_DETECTED"
+
+            # 3. CREATE THE ASSET TRACKING RECORD
+            event_to_create = AssetTrackingCreate(
+                sensor_id=sensor_in_db.id,
+                asset_id=asset_in_db.id if asset_in_db else None,
+                event_type=event_type,
+                details=body.get("details"),
+                idempotency_key=idempotency_key_header or body.get("idempotency_key"),
             )
-        event_type = "ENV_READING"
+            idempotency_key = event_to_create.idempotency_key
 
-    else:  # For CAMERA_MOTION, WEIGHT_PLATE, etc.
-        event_type = f"{sensor_in_db.sensor_type}_DETECTED"
+            # 4. COALESCE RETRIES AND SENSOR BURSTS INTO EXISTING ROWS
+            if write_behind_buffer:
+                response.status_code = 202
+                return _accept_write_behind(event_to_create, sensor_type, body)
 
-    # 3. CREATE THE ASSET TRACKING RECORD
-    event_to_create = AssetTrackingCreate(
-        sensor_id=sensor_in_db.id,
-        asset_id=asset_in_db.id if asset_in_db else None,
-        event_type=event_type,
-        details=body.get("details"),
-    )
+            if coalescer and idempotency_key:
+                known_id = coalescer.lookup_idempotency_key(idempotency_key)
+                if known_id is not None:
+                    existing = db.get(AssetTracking, known_id)
+                    if existing is not None:
+                        return _in_db(existing)
 
-    db_event = AssetTracking(**event_to_create.dict())
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+            read_key = None
+            now = time.monotonic()
+            if coalescer:
+                subject = asset_in_db.id if asset_in_db else body.get("custodian_id")
+                read_key = coalesce_key(
+                    sensor_in_db.id, subject, event_type, event_to_create.details
+                )
+                repeat_of = coalescer.lookup(read_key, sensor_type, now)
+                if repeat_of is not None:
+                    db_event = _record_repeat(db, repeat_of, event_to_create.timestamp)
+                    if db_event is not None:
+                        coalescer.remember(
+                            read_key,
+                            sensor_type,
+                            db_event.id,
+                            now,
+                            db_event.repeat_count,
+                        )
+                        if idempotency_key:
+                            # A retry must not count as another read of the burst.
+                            coalescer.remember_idempotency_key(
+                                idempotency_key, db_event.id
+                            )
+                        INGEST_COALESCED_READS_TOTAL.labels(sensor_type).inc()
+                        return _in_db(db_event)
+                    coalescer.forget(read_key)
 
-    return db_event
+            db_event = AssetTracking(**split_row(event_to_create.dict()))
+            db.add(db_event)
+            try:
+                db.commit()
+            except IntegrityError:
+                # A concurrent retry with the same idempotency key won the insert.
+                db.rollback()
+                if not idempotency_key:
+                    raise
+                db_event = (
+                    db.query(AssetTracking)
+                    .filter(AssetTracking.idempotency_key == idempotency_key)
+                    .one_or_none()
+                )
+                if db_event is None:
+                    raise  # Not the key, e.g. a foreign key violation.
+                return _in_db(db_event)
+            db.refresh(db_event)
+
+            if coalescer:
+                coalescer.remember(read_key, sensor_type, db_event.id, now)
+                if idempotency_key:
+                    coalescer.remember_idempotency_key(idempotency_key, db_event.id)
+
+            return _in_db(db_event)
+    finally:
+        INGEST_REQUEST_SECONDS.labels(sensor_type).observe(
+            time.perf_counter() - started
+        )
@@ -1,12 +1,226 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from src.configs.core import settings
+from src.services.metrics.collectors import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_READS_ROUTED_TOTAL,
+    DB_REPLICA_LAG_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(
+    url: str,
+    pool_name: str,
+    pool_size: int,
+    max_overflow: int,
+    connect_args: Optional[Dict[str, Any]] = None,
+):
+    db_engine = create_engine(
+        url,
+        connect_args=connect_args or {},
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    )
+    pool = db_engine.pool
+    DB_POOL_SIZE.labels(pool_name).set_function(pool.size)
+    DB_POOL_CHECKED_OUT.labels(pool_name).set_function(pool.checkedout)
+    DB_POOL_OVERFLOW.labels(pool_name).set_function(lambda: max(pool.overflow(), 0))
+    return db_engine
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+engine = _create_engine(
+    settings.DATABASE_URL,
+    "primary",
+    settings.DB_POOL_SIZE,
+    settings.DB_MAX_OVERFLOW,
+)
+replica_engines = [
+    _create_engine(
+        url,
+        f"replica{index}",
+        settings.DB_REPLICA_POOL_SIZE,
+        settings.DB_REPLICA_MAX_OVERFLOW,
+        connect_args={"connect_timeout": settings.DB_REPLICA_CONNECT_TIMEOUT_SECONDS},
+    )
+    for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# The replay timestamp is that of the last transaction replayed; NULL if none has
+# been since the replica started.
+_REPLICA_STATUS_SQL = text(
+    """
+    SELECT
+        pg_last_wal_replay_lsn()::text,
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    """
+)
+
+
+def parse_lsn(lsn: str) -> int:
+    """Turns a Postgres LSN such as '16/B374D848' into a comparable integer."""
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReadRouter:
+    """
+    Picks the engine a read-intent session runs on. Replicas are used round-robin
+    while their replay lag is at most `max_lag_seconds`; a replica that is further
+    behind, or cannot be reached, is skipped and reads fall back to the primary.
+
+    Callers that must see their own writes pass the primary's WAL position after
+    the write (`min_lsn`); only replicas that have replayed past it qualify.
+
+    Replica status is checked every `check_interval` seconds by a background
+    thread, started with the first routed read, so routing a session costs no
+    round trip and never waits on an unreachable replica. A replica is caught up if
+    it has replayed the WAL the primary had written when the check started; if
+    not, it lags by the age of the last transaction it replayed, which keeps
+    growing while its WAL receiver is disconnected. The age of the check itself is
+    added to that lag, so a status that stopped updating stops qualifying.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        max_lag_seconds: float,
+        check_interval: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        # index -> (checked at, lag or None if unknown, replayed LSN)
+        self._status: Dict[int, Tuple[float, Optional[float], int]] = {}
+        self._order = itertools.cycle(range(len(replicas)))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        for index in range(len(replicas)):
+            DB_REPLICA_LAG_SECONDS.labels(f"replica{index}").set_function(
+                lambda index=index: self._cached_lag(index)
+            )
+
+    def engine_for_read(self, min_lsn: Optional[str] = None) -> Engine:
+        if not self.replicas:
+            DB_READS_ROUTED_TOTAL.labels("primary").inc()
+            return self.primary
+        self._ensure_checker()
+        wanted = parse_lsn(min_lsn) if min_lsn else 0
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                index = next(self._order)
+            checked_at, lag, replay_lsn = self._status.get(index, (0.0, None, 0))
+            if (
+                lag is not None
+                and lag + (now - checked_at) <= self.max_lag_seconds
+                and replay_lsn >= wanted
+            ):
+                DB_READS_ROUTED_TOTAL.labels("replica").inc()
+                return self.replicas[index]
+        DB_READS_ROUTED_TOTAL.labels("primary").inc()
+        return self.primary
+
+    def primary_lsn(self) -> str:
+        """The primary's current WAL position, for a later `min_lsn`."""
+        with self.primary.connect() as conn:
+            return conn.scalar(text("SELECT pg_current_wal_lsn()::text"))
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def check_replicas(self):
+        """Measures every replica's lag against the primary's current WAL position."""
+        try:
+            primary_lsn = parse_lsn(self.primary_lsn())
+        except Exception as e:
+            logger.warning(
+                "Cannot read the primary's WAL position: %s",
+                e,
+                extra={"rate_limited": True},
+            )
+            primary_lsn = None
+        for index in range(len(self.replicas)):
+            self._status[index] = (time.monotonic(), *self._check(index, primary_lsn))
+
+    # --- Internals ---
+
+    def _cached_lag(self, index: int) -> float:
+        status = self._status.get(index)
+        return status[1] if status and status[1] is not None else float("nan")
+
+    def _check(
+        self, index: int, primary_lsn: Optional[int]
+    ) -> Tuple[Optional[float], int]:
+        try:
+            with self.replicas[index].connect() as conn:
+                lsn, replay_age = conn.execute(_REPLICA_STATUS_SQL).one()
+        except Exception as e:
+            logger.warning(
+                "Replica %d is unavailable: %s", index, e, extra={"rate_limited": True}
+            )
+            return None, 0
+        replay_lsn = parse_lsn(lsn) if lsn else 0
+        if primary_lsn is not None and replay_lsn >= primary_lsn:
+            return 0.0, replay_lsn
+        if primary_lsn is None or replay_age is None:
+            # Behind, or not known to be caught up, by an unknown amount.
+            return None, replay_lsn
+        return max(float(replay_age), 0.0), replay_lsn
+
+    def _ensure_checker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._checker, name="replica-status", daemon=True
+            )
+            self._thread.start()
+
+    def _checker(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.check_replicas()
+            except Exception:
+                logger.exception(
+                    "Replica status check failed.", extra={"rate_limited": True}
+                )
+            self._stop.wait(max(self.check_interval - (time.monotonic() - started), 0))
+
+
+read_router = ReadRouter(
+    engine,
+    replica_engines,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -14,3 +228,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Like `get_db`, for endpoints that only read; may be served by a replica."""
+    db = SessionLocal(bind=read_router.engine_for_read())
+    try:
+        yield db
+    finally:
+        db.close()
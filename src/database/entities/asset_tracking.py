@@ -1,4 +1,13 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    func,
+)
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 from src.database.core import Base
@@ -15,7 +24,30 @@ class AssetTracking(Base):
     )
     event_type = Column(String(100), nullable=False)
     timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Known payload fields have typed columns; `details` holds the rest. See
+    # `src/services/ingest/payload.py` for how a payload is split and merged.
     details = Column(JSONB)
+    direction = Column(String(10), nullable=True)
+    location_name = Column(String(50), nullable=True)
+    location_from = Column(String(50), nullable=True)
+    location_to = Column(String(50), nullable=True)
+    action = Column(String(50), nullable=True)
+    custodian_id = Column(UUID(as_uuid=True), nullable=True)
+    custodian_name = Column(String(255), nullable=True)
+    showcase_status = Column(String(20), nullable=True)
+    current_weight_kg = Column(Float, nullable=True)
+    temperature_c = Column(Float, nullable=True)
+    humidity_pct = Column(Float, nullable=True)
     state_change_id = Column(
         UUID(as_uuid=True), ForeignKey("state_changes.id"), nullable=True
     )
+    # Sensor bursts are coalesced at ingest: `timestamp` is the first read of the
+    # burst, `last_seen_at` the last one, and `repeat_count` how many reads it holds.
+    repeat_count = Column(Integer, nullable=False, server_default="1")
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+    idempotency_key = Column(String(64), nullable=True, unique=True)
+    # Insert time, the watermark of incremental exports; ids are reserved before
+    # commit, so they commit out of order.
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Identity, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM
 from sqlalchemy.sql import func
 
@@ -22,6 +22,8 @@ class Asset(Base):
         UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4()
     )
     serial_number = Column(String(255), nullable=False, unique=True, index=True)
+    # Compact id used by the binary ingestion protocol.
+    short_id = Column(Integer, Identity(), nullable=False, unique=True)
     name = Column(String(255), nullable=False)
     description = Column(Text)
     attributes = Column(JSONB)
@@ -35,5 +37,8 @@ class Asset(Base):
     )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
-        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
     )
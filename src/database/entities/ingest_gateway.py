@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+
+from src.database.core import Base
+
+
+class IngestGateway(Base):
+    """
+    The last frame sequence number committed for each WebSocket sensor gateway, so
+    a gateway that reconnects resumes after it and resent frames are not stored twice.
+    """
+
+    __tablename__ = "ingest_gateways"
+    gateway_id = Column(String(100), primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, server_default="0")
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
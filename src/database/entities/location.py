@@ -1,3 +1,5 @@
+import enum
+
 from sqlalchemy import Column, Text
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.sql import func
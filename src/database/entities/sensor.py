@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, Identity, Integer, String, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.sql import func
 
@@ -29,6 +29,8 @@ class Sensor(Base):
         UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4()
     )
     name = Column(String(100), nullable=False, unique=True)
+    # Compact id used by the binary ingestion protocol.
+    short_id = Column(Integer, Identity(), nullable=False, unique=True)
     sensor_type = Column(
         ENUM(SensorTypeEnum, name="sensor_type_enum", create_type=False), nullable=False
     )
@@ -41,3 +43,5 @@ class Sensor(Base):
         server_default="ONLINE",
     )
     installed_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Latest sighting flushed by the sensor health table.
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, ENUM
+from sqlalchemy.sql import func
+
+from src.database.core import Base
+from src.database.entities.sensor import SensorStatusEnum
+
+
+class SensorStatusLog(Base):
+    """
+    One row per sensor status change, so uptime can be read from the transitions
+    instead of from individual heartbeats.
+    """
+
+    __tablename__ = "sensor_status_log"
+    id = Column(BigInteger, primary_key=True)
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id"), nullable=False)
+    status = Column(
+        ENUM(SensorStatusEnum, name="sensor_status_enum", create_type=False),
+        nullable=False,
+    )
+    changed_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
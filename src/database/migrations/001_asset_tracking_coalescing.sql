@@ -0,0 +1,9 @@
+-- Sensor-burst coalescing at ingest.
+-- Duplicate reads within a debounce window are collapsed into one asset_tracking row.
+ALTER TABLE public.asset_tracking
+    ADD COLUMN IF NOT EXISTS repeat_count integer NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS last_seen_at timestamp with time zone,
+    ADD COLUMN IF NOT EXISTS idempotency_key varchar(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS asset_tracking_idempotency_key_key
+    ON public.asset_tracking (idempotency_key);
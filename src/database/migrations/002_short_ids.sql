@@ -0,0 +1,9 @@
+-- Compact integer ids for sensors and assets, used by the binary ingestion
+-- protocol so frames do not carry names, serial numbers or UUIDs.
+ALTER TABLE public.sensors
+    ADD COLUMN IF NOT EXISTS short_id integer GENERATED BY DEFAULT AS IDENTITY;
+ALTER TABLE public.assets
+    ADD COLUMN IF NOT EXISTS short_id integer GENERATED BY DEFAULT AS IDENTITY;
+
+CREATE UNIQUE INDEX IF NOT EXISTS sensors_short_id_key ON public.sensors (short_id);
+CREATE UNIQUE INDEX IF NOT EXISTS assets_short_id_key ON public.assets (short_id);
@@ -0,0 +1,7 @@
+-- Per-gateway resume point for the WebSocket ingestion channel. last_seq is updated
+-- in the same transaction as the readings it acknowledges.
+CREATE TABLE IF NOT EXISTS public.ingest_gateways (
+    gateway_id varchar(100) PRIMARY KEY,
+    last_seq bigint NOT NULL DEFAULT 0,
+    updated_at timestamp with time zone DEFAULT now()
+);
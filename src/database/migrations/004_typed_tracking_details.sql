@@ -0,0 +1,68 @@
+-- Typed columns for the known fields of tracking event payloads. `details` keeps
+-- only the keys without a column (see src/services/ingest/payload.py; the rules
+-- below must match its `_fits`, so a merged payload hashes as before).
+ALTER TABLE public.asset_tracking
+    ADD COLUMN IF NOT EXISTS direction varchar(10),
+    ADD COLUMN IF NOT EXISTS location_name varchar(50),
+    ADD COLUMN IF NOT EXISTS location_from varchar(50),
+    ADD COLUMN IF NOT EXISTS location_to varchar(50),
+    ADD COLUMN IF NOT EXISTS action varchar(50),
+    ADD COLUMN IF NOT EXISTS custodian_id uuid,
+    ADD COLUMN IF NOT EXISTS custodian_name varchar(255),
+    ADD COLUMN IF NOT EXISTS showcase_status varchar(20),
+    ADD COLUMN IF NOT EXISTS current_weight_kg double precision,
+    ADD COLUMN IF NOT EXISTS temperature_c double precision,
+    ADD COLUMN IF NOT EXISTS humidity_pct double precision;
+
+-- Moves existing payloads into the columns in batches of 50,000 ids, committing
+-- after each, so the backfill never holds long locks. Run it outside a transaction
+-- block (e.g. psql without --single-transaction); it can be re-run safely.
+DO $$
+DECLARE
+    batch_start bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM public.asset_tracking;
+    WHILE batch_start < max_id LOOP
+        UPDATE public.asset_tracking SET
+            direction = CASE WHEN jsonb_typeof(details -> 'direction') = 'string' AND length(details ->> 'direction') <= 10
+                THEN details ->> 'direction' ELSE direction END,
+            location_name = CASE WHEN jsonb_typeof(details -> 'location_name') = 'string' AND length(details ->> 'location_name') <= 50
+                THEN details ->> 'location_name' ELSE location_name END,
+            location_from = CASE WHEN jsonb_typeof(details -> 'location_from') = 'string' AND length(details ->> 'location_from') <= 50
+                THEN details ->> 'location_from' ELSE location_from END,
+            location_to = CASE WHEN jsonb_typeof(details -> 'location_to') = 'string' AND length(details ->> 'location_to') <= 50
+                THEN details ->> 'location_to' ELSE location_to END,
+            action = CASE WHEN jsonb_typeof(details -> 'action') = 'string' AND length(details ->> 'action') <= 50
+                THEN details ->> 'action' ELSE action END,
+            custodian_id = CASE WHEN details ->> 'custodian_id' ~ '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+                THEN (details ->> 'custodian_id')::uuid ELSE custodian_id END,
+            custodian_name = CASE WHEN jsonb_typeof(details -> 'custodian_name') = 'string' AND length(details ->> 'custodian_name') <= 255
+                THEN details ->> 'custodian_name' ELSE custodian_name END,
+            showcase_status = CASE WHEN jsonb_typeof(details -> 'showcase_status') = 'string' AND length(details ->> 'showcase_status') <= 20
+                THEN details ->> 'showcase_status' ELSE showcase_status END,
+            current_weight_kg = CASE WHEN jsonb_typeof(details -> 'current_weight_kg') = 'number' AND details ->> 'current_weight_kg' ~ '^-?[0-9]+\.[0-9]+$'
+                THEN (details ->> 'current_weight_kg')::float8 ELSE current_weight_kg END,
+            temperature_c = CASE WHEN jsonb_typeof(details -> 'temperature_c') = 'number' AND details ->> 'temperature_c' ~ '^-?[0-9]+\.[0-9]+$'
+                THEN (details ->> 'temperature_c')::float8 ELSE temperature_c END,
+            humidity_pct = CASE WHEN jsonb_typeof(details -> 'humidity_pct') = 'number' AND details ->> 'humidity_pct' ~ '^-?[0-9]+\.[0-9]+$'
+                THEN (details ->> 'humidity_pct')::float8 ELSE humidity_pct END,
+            details = details - array_remove(ARRAY[
+                CASE WHEN jsonb_typeof(details -> 'direction') = 'string' AND length(details ->> 'direction') <= 10 THEN 'direction' END,
+                CASE WHEN jsonb_typeof(details -> 'location_name') = 'string' AND length(details ->> 'location_name') <= 50 THEN 'location_name' END,
+                CASE WHEN jsonb_typeof(details -> 'location_from') = 'string' AND length(details ->> 'location_from') <= 50 THEN 'location_from' END,
+                CASE WHEN jsonb_typeof(details -> 'location_to') = 'string' AND length(details ->> 'location_to') <= 50 THEN 'location_to' END,
+                CASE WHEN jsonb_typeof(details -> 'action') = 'string' AND length(details ->> 'action') <= 50 THEN 'action' END,
+                CASE WHEN details ->> 'custodian_id' ~ '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN 'custodian_id' END,
+                CASE WHEN jsonb_typeof(details -> 'custodian_name') = 'string' AND length(details ->> 'custodian_name') <= 255 THEN 'custodian_name' END,
+                CASE WHEN jsonb_typeof(details -> 'showcase_status') = 'string' AND length(details ->> 'showcase_status') <= 20 THEN 'showcase_status' END,
+                CASE WHEN jsonb_typeof(details -> 'current_weight_kg') = 'number' AND details ->> 'current_weight_kg' ~ '^-?[0-9]+\.[0-9]+$' THEN 'current_weight_kg' END,
+                CASE WHEN jsonb_typeof(details -> 'temperature_c') = 'number' AND details ->> 'temperature_c' ~ '^-?[0-9]+\.[0-9]+$' THEN 'temperature_c' END,
+                CASE WHEN jsonb_typeof(details -> 'humidity_pct') = 'number' AND details ->> 'humidity_pct' ~ '^-?[0-9]+\.[0-9]+$' THEN 'humidity_pct' END
+            ], NULL)
+        WHERE id > batch_start AND id <= batch_start + 50000
+            AND details ?| ARRAY['direction', 'location_name', 'location_from', 'location_to', 'action', 'custodian_id', 'custodian_name', 'showcase_status', 'current_weight_kg', 'temperature_c', 'humidity_pct'];
+        batch_start := batch_start + 50000;
+        COMMIT;
+    END LOOP;
+END $$;
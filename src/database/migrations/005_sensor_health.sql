@@ -0,0 +1,14 @@
+-- Sensor liveness (see src/services/ingest/health.py). last_seen_at is the latest
+-- flushed sighting of a sensor; each automatic status change is logged once.
+ALTER TABLE public.sensors
+    ADD COLUMN IF NOT EXISTS last_seen_at timestamp with time zone;
+
+CREATE TABLE IF NOT EXISTS public.sensor_status_log (
+    id bigserial PRIMARY KEY,
+    sensor_id uuid NOT NULL REFERENCES public.sensors (id),
+    status sensor_status_enum NOT NULL,
+    changed_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS sensor_status_log_sensor_id_changed_at_idx
+    ON public.sensor_status_log (sensor_id, changed_at);
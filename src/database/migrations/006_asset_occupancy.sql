@@ -0,0 +1,23 @@
+-- Publishes every change of an asset's location or status on the asset_occupancy
+-- channel, as 'asset_id,location_id,status', for the API's occupancy index (see
+-- src/services/occupancy/index.py). NOTIFY is delivered when the transaction
+-- commits, so listeners only ever see committed state changes.
+CREATE OR REPLACE FUNCTION public.notify_asset_occupancy() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('asset_occupancy', OLD.id::text || ',,DELETED');
+    ELSE
+        PERFORM pg_notify(
+            'asset_occupancy',
+            NEW.id::text || ',' || NEW.current_location_id::text || ',' || NEW.current_status::text
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS assets_notify_occupancy ON public.assets;
+CREATE TRIGGER assets_notify_occupancy
+    AFTER INSERT OR DELETE OR UPDATE OF current_location_id, current_status
+    ON public.assets
+    FOR EACH ROW EXECUTE FUNCTION public.notify_asset_occupancy();
@@ -0,0 +1,19 @@
+-- Indexes for catalogue search (see src/services/assets/search.py). Built
+-- CONCURRENTLY so the catalogue stays writable; run outside a transaction block.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- attributes @> '{"origin": "Mogok"}'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS assets_attributes_idx
+    ON public.assets USING gin (attributes jsonb_path_ops);
+
+-- name / description ILIKE '%ruby%'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS assets_name_trgm_idx
+    ON public.assets USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS assets_description_trgm_idx
+    ON public.assets USING gin (description gin_trgm_ops);
+
+-- Status and location filters, in the keyset order of the results.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS assets_current_status_serial_number_idx
+    ON public.assets (current_status, serial_number);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS assets_current_location_id_serial_number_idx
+    ON public.assets (current_location_id, serial_number);
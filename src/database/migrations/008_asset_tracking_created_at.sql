@@ -0,0 +1,9 @@
+-- Insert time of tracking events, the watermark of incremental history exports
+-- (see src/services/export/history.py). now() is stable, so existing rows get the
+-- time of the migration without a table rewrite. The index is built CONCURRENTLY;
+-- run this outside a transaction block.
+ALTER TABLE public.asset_tracking
+    ADD COLUMN IF NOT EXISTS created_at timestamptz NOT NULL DEFAULT now();
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_asset_tracking_created_at
+    ON public.asset_tracking (created_at);
@@ -0,0 +1,5 @@
+-- Keyset order of the ledger audit (see src/services/aegis/audit.py), which pages
+-- state changes by (created_at, id). Built CONCURRENTLY; run this outside a
+-- transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_state_changes_created_at_id
+    ON public.state_changes (created_at, id);
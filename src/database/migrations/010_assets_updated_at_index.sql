@@ -0,0 +1,5 @@
+-- The daemon's incremental refresh fetches the assets updated since its last
+-- cycle (see get_assets_state_changed_since in src/services/aegis/database.py).
+-- Built CONCURRENTLY; run this outside a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assets_updated_at
+    ON public.assets (updated_at);
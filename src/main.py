@@ -1,6 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from src.api.register_routes import api_router
 from src.configs.core import settings
+from src.database.core import read_router
+from src.services.ingest.health import sensor_health
+from src.services.ingest.write_behind import write_behind_buffer
+from src.services.occupancy.index import occupancy_index
+from src.services.metrics.core import CONTENT_TYPE_LATEST, registry
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
@@ -18,6 +23,49 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+def start_write_behind():
+    if write_behind_buffer:
+        write_behind_buffer.start()
+
+
+@app.on_event("shutdown")
+def stop_write_behind():
+    if write_behind_buffer:
+        write_behind_buffer.stop()
+
+
+@app.on_event("startup")
+def start_sensor_health():
+    sensor_health.start()
+
+
+@app.on_event("shutdown")
+def stop_sensor_health():
+    sensor_health.stop()
+
+
+@app.on_event("startup")
+def start_occupancy_index():
+    occupancy_index.start()
+
+
+@app.on_event("shutdown")
+def stop_occupancy_index():
+    occupancy_index.stop()
+
+
+@app.on_event("shutdown")
+def stop_read_router():
+    read_router.stop()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Aegis APIs"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Exposes the process metrics in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE_LATEST)
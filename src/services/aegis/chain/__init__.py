@@ -0,0 +1,24 @@
+import importlib
+from typing import Type
+
+from src.services.aegis.chain.base import ChainBackend
+
+# Backends are imported only when selected, so e.g. a dry run never pays for
+# importing pycardano, and Ogmios support does not require blockfrost.
+BACKENDS = {
+    "dry_run": "src.services.aegis.chain.dry_run:DryRunBackend",
+    "emulator": "src.services.aegis.chain.emulator:EmulatorBackend",
+    "blockfrost": "src.services.aegis.chain.blockfrost:BlockfrostBackend",
+    "ogmios": "src.services.aegis.chain.ogmios:OgmiosBackend",
+}
+
+
+def load_backend(name: str) -> Type[ChainBackend]:
+    """Imports and returns the chain backend class registered under `name`."""
+    try:
+        module_path, class_name = BACKENDS[name].split(":")
+    except KeyError:
+        raise ValueError(
+            f"Unknown chain backend '{name}'. Choose one of: {', '.join(BACKENDS)}."
+        ) from None
+    return getattr(importlib.import_module(module_path), class_name)
@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# --- Constants ---
+METADATA_KEY = 1337
+
+
+def state_change_metadata(
+    asset_id: str, event_type: str, log_bundle_hash: str, timestamp: datetime
+) -> Dict[str, Any]:
+    """The transaction metadata recorded under METADATA_KEY for a state change."""
+    return {
+        "asset_id": str(asset_id),
+        "event": event_type,
+        "log_hash": log_bundle_hash,
+        "timestamp_utc": timestamp.isoformat().replace("+00:00", "Z"),
+    }
+
+
+class ChainBackend(ABC):
+    """
+    Where the daemon records state changes. Implementations are selected by
+    `config.CHAIN_BACKEND` and loaded lazily through `load_backend`.
+    """
+
+    @classmethod
+    @abstractmethod
+    def from_config(cls, config) -> "ChainBackend":
+        """Builds the backend from the daemon's `config` module."""
+
+    @abstractmethod
+    async def record_state_change(
+        self, asset_id: str, event_type: str, log_bundle_hash: str, timestamp: datetime
+    ) -> str:
+        """
+        Records the state change on-chain and returns its transaction id once it is
+        confirmed, or an empty string if the backend rejected it.
+        """
+
+    async def fetch_state_change_metadata(
+        self, tx_ids: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Looks up the METADATA_KEY payload of many transactions. A tx id maps to None
+        if the chain has no such transaction; ids the backend cannot look up at all
+        are left out.
+        """
+        return {}
+
+    async def close(self):
+        """Releases connections held by the backend."""
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from blockfrost import ApiError
+from pycardano import BlockFrostChainContext, ChainContext, Network
+
+from src.services.aegis.chain.base import METADATA_KEY
+from src.services.aegis.chain.cardano import CardanoBackend, utxo_pool_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BlockfrostBackend(CardanoBackend):
+    """Submits through the Blockfrost HTTP API and polls it for confirmations."""
+
+    rejection_errors = (ApiError,)
+
+    def __init__(
+        self,
+        base_url: str,
+        project_id: str,
+        payment_skey_path: str,
+        payment_vkey_path: str,
+        utxo_pool_settings: Optional[dict] = None,
+        poll_interval: float = 15,
+        metadata_concurrency: int = 8,
+    ):
+        self.base_url = base_url
+        self.metadata_concurrency = metadata_concurrency
+        self.project_id = project_id
+        self.poll_interval = poll_interval
+        super().__init__(
+            payment_skey_path,
+            payment_vkey_path,
+            network=(
+                Network.TESTNET
+                if "preview" in base_url or "preprod" in base_url
+                else Network.MAINNET
+            ),
+            utxo_pool_settings=utxo_pool_settings,
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "BlockfrostBackend":
+        return cls(
+            base_url=config.CARDANO_BASE_URL,
+            project_id=config.BLOCKFROST_PROJECT_ID,
+            payment_skey_path=config.WALLET_SKEY_PATH,
+            payment_vkey_path=config.WALLET_VKEY_PATH,
+            utxo_pool_settings=utxo_pool_settings(config),
+        )
+
+    def _create_context(self) -> ChainContext:
+        return BlockFrostChainContext(self.project_id, base_url=self.base_url)
+
+    async def wait_for_tx_confirmation(self, tx_hash: str, timeout: int = 300):
+        """
+        Waits for a transaction to be confirmed on the blockchain by repeatedly querying Blockfrost.
+        """
+        context = self._get_context()
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            try:
+                # The .transaction() method is synchronous, so it runs off the loop.
+                await asyncio.to_thread(context.api.transaction, tx_hash)
+                logger.info("Transaction confirmed on-chain: %s", tx_hash)
+                return
+            except ApiError as e:
+                if e.status_code == 404:
+                    logger.debug(
+                        "Transaction not yet confirmed, waiting...",
+                        extra={"rate_limited": True},
+                    )
+                    await asyncio.sleep(self.poll_interval)
+                else:
+                    raise
+        raise TimeoutError(
+            f"Transaction {tx_hash} was not confirmed within {timeout} seconds."
+        )
+
+    async def fetch_state_change_metadata(
+        self, tx_ids: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Blockfrost has no batch lookup, so requests run a few at a time."""
+        api = self._get_context().api
+        semaphore = asyncio.Semaphore(self.metadata_concurrency)
+
+        async def fetch(tx_id: str):
+            async with semaphore:
+                try:
+                    labels = await asyncio.to_thread(
+                        api.transaction_metadata, tx_id, return_type="json"
+                    )
+                except ApiError as e:
+                    if e.status_code == 404:
+                        return tx_id, None
+                    raise
+            for label in labels:
+                if str(label["label"]) == str(METADATA_KEY):
+                    return tx_id, label["json_metadata"]
+            return tx_id, {}
+
+        return dict(await asyncio.gather(*(fetch(tx_id) for tx_id in tx_ids)))
@@ -0,0 +1,203 @@
+import json
+import logging
+from datetime import datetime
+import time
+import asyncio
+from abc import abstractmethod
+from typing import Optional, Tuple, Type
+
+from pycardano import (
+    ChainContext,
+    Transaction,
+    TransactionBuilder,
+    Address,
+    PaymentSigningKey,
+    PaymentVerificationKey,
+    AuxiliaryData,
+    Metadata,
+    Network,
+)
+from pycardano.metadata import AlonzoMetadata
+
+from src.services.aegis.chain.base import (
+    METADATA_KEY,
+    ChainBackend,
+    state_change_metadata,
+)
+from src.services.aegis.utxo_pool import UtxoPool
+from src.services.metrics.collectors import (
+    CHAIN_CONFIRMATION_SECONDS,
+    CHAIN_SUBMIT_SECONDS,
+    UTXO_POOL_AVAILABLE,
+    UTXO_POOL_IN_FLIGHT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def utxo_pool_settings(config) -> Optional[dict]:
+    """The UtxoPool sizing arguments from the daemon config, if the pool is enabled."""
+    if not config.UTXO_POOL_ENABLED:
+        return None
+    return {
+        "utxo_lovelace": config.UTXO_POOL_UTXO_LOVELACE,
+        "target_size": config.UTXO_POOL_TARGET_SIZE,
+        "low_water": config.UTXO_POOL_LOW_WATER,
+        "min_lovelace": config.UTXO_POOL_MIN_LOVELACE,
+    }
+
+
+class CardanoBackend(ChainBackend):
+    """
+    Builds, signs and submits real Cardano transactions with pycardano. Subclasses
+    provide the chain context to build against and how confirmations are observed.
+    """
+
+    # Errors from the chain provider that reject a single transaction; the state
+    # change is reported as failed instead of crashing the cycle.
+    rejection_errors: Tuple[Type[BaseException], ...] = ()
+
+    def __init__(
+        self,
+        payment_skey_path: str,
+        payment_vkey_path: str,
+        network: Network = Network.TESTNET,
+        utxo_pool_settings: Optional[dict] = None,
+    ):
+        """
+        Passing `utxo_pool_settings` (the UtxoPool sizing arguments) gives every
+        in-flight transaction its own input UTxO, so submissions can run concurrently.
+        """
+        try:
+            self.network = network
+            self._context: Optional[ChainContext] = None
+            self.utxo_pool_settings = utxo_pool_settings
+            self.utxo_pool: Optional[UtxoPool] = None
+
+            self.payment_skey = PaymentSigningKey.load(payment_skey_path)
+            self.payment_vkey = PaymentVerificationKey.load(payment_vkey_path)
+            self.address = Address(self.payment_vkey.hash(), network=self.network)
+
+            logger.info(
+                "Blockchain service initialized",
+                extra={
+                    "network": str(self.network),
+                    "address": str(self.address),
+                    "backend": type(self).__name__,
+                },
+            )
+        except Exception:
+            logger.exception("FATAL: Could not initialize the chain backend.")
+            raise
+
+    @abstractmethod
+    def _create_context(self) -> ChainContext:
+        """The pycardano chain context transactions are built against."""
+
+    @abstractmethod
+    async def wait_for_tx_confirmation(self, tx_hash: str, timeout: int = 300):
+        """Returns once `tx_hash` is on-chain; raises TimeoutError otherwise."""
+
+    async def _submit(self, context: ChainContext, signed_tx: Transaction) -> str:
+        """Submits a signed transaction. The default goes through the chain context."""
+        tx_hash = await asyncio.to_thread(context.submit_tx, signed_tx.to_cbor())
+        return str(tx_hash)
+
+    async def record_state_change(
+        self, asset_id: str, event_type: str, log_bundle_hash: str, timestamp: datetime
+    ) -> str:
+        """
+        Constructs, signs, and submits a Cardano transaction with state change data in its metadata.
+        """
+        metadata_payload = state_change_metadata(
+            asset_id, event_type, log_bundle_hash, timestamp
+        )
+
+        logger.debug(
+            "Preparing to record state change on Cardano",
+            extra={"metadata": json.dumps(metadata_payload)},
+        )
+
+        context = self._get_context()
+        pool = self._get_utxo_pool(context)
+        utxo = await pool.acquire() if pool else None
+        submitted = False
+        try:
+            submit_started = time.perf_counter()
+            # Building and signing block, so they run off the event loop and
+            # concurrent submissions overlap.
+            signed_tx = await asyncio.to_thread(
+                self._build_and_sign, context, metadata_payload, utxo
+            )
+            tx_hash = await self._submit(context, signed_tx)
+            submitted = True
+            if pool:
+                pool.mark_submitted(utxo)
+            CHAIN_SUBMIT_SECONDS.observe(time.perf_counter() - submit_started)
+            logger.info("Transaction submitted, awaiting confirmation: %s", tx_hash)
+
+            with CHAIN_CONFIRMATION_SECONDS.time():
+                await self.wait_for_tx_confirmation(tx_hash)
+
+            if pool:
+                await pool.confirm(
+                    utxo, tx_hash, list(signed_tx.transaction_body.outputs)
+                )
+                utxo = None
+            return tx_hash
+
+        except self.rejection_errors as e:
+            logger.error(
+                "Chain provider rejected the transaction: %s",
+                e,
+                extra={"rate_limited": True},
+            )
+            return ""
+        except Exception:
+            logger.exception("Failed to build or submit transaction.")
+            raise
+        finally:
+            if pool and utxo is not None:
+                if submitted:
+                    await pool.forget(utxo)
+                else:
+                    await pool.release(utxo)
+            if pool:
+                UTXO_POOL_AVAILABLE.set(pool.available)
+                UTXO_POOL_IN_FLIGHT.set(pool.in_flight)
+
+    def _build_and_sign(
+        self, context: ChainContext, metadata_payload: dict, utxo
+    ) -> Transaction:
+        auxiliary_data = AuxiliaryData(
+            AlonzoMetadata(metadata=Metadata({METADATA_KEY: metadata_payload}))
+        )
+
+        builder = TransactionBuilder(context)
+        if utxo is not None:
+            # Spend only the leased UTxO so parallel transactions never collide.
+            builder.add_input(utxo)
+        else:
+            builder.add_input_address(self.address)
+        builder.auxiliary_data = auxiliary_data
+
+        return builder.build_and_sign(
+            signing_keys=[self.payment_skey], change_address=self.address
+        )
+
+    def _get_utxo_pool(self, context: ChainContext) -> Optional[UtxoPool]:
+        if self.utxo_pool is None and self.utxo_pool_settings:
+            self.utxo_pool = UtxoPool(
+                context,
+                self.address,
+                self.payment_skey,
+                wait_for_confirmation=self.wait_for_tx_confirmation,
+                **self.utxo_pool_settings,
+            )
+        return self.utxo_pool
+
+    def _get_context(self) -> ChainContext:
+        """Creates the chain context once and reuses it for every submission."""
+        if self._context is None:
+            self._context = self._create_context()
+        return self._context
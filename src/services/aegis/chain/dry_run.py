@@ -0,0 +1,36 @@
+import json
+import logging
+import uuid
+from datetime import datetime
+
+from src.services.aegis.chain.base import ChainBackend, state_change_metadata
+
+logger = logging.getLogger(__name__)
+
+
+class DryRunBackend(ChainBackend):
+    """Builds nothing and sends nothing; every state change gets a fake TX ID."""
+
+    def __init__(self):
+        logger.warning(
+            "BLOCKCHAIN DRY RUN MODE IS ACTIVE: no real transactions will be sent."
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "DryRunBackend":
+        return cls()
+
+    async def record_state_change(
+        self, asset_id: str, event_type: str, log_bundle_hash: str, timestamp: datetime
+    ) -> str:
+        metadata_payload = state_change_metadata(
+            asset_id, event_type, log_bundle_hash, timestamp
+        )
+        logger.debug(
+            "Preparing to record state change on Cardano",
+            extra={"metadata": json.dumps(metadata_payload)},
+        )
+        # A random suffix keeps ids unique even for submissions in the same second.
+        fake_tx_id = f"dry_run_tx_{uuid.uuid4().hex}"
+        logger.debug("[DRY RUN] Returning fake TX ID %s", fake_tx_id)
+        return fake_tx_id
@@ -0,0 +1,77 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from pycardano import ChainContext, Network
+
+from src.services.aegis.chain.base import METADATA_KEY
+from src.services.aegis.chain.cardano import CardanoBackend, utxo_pool_settings
+from src.services.aegis.ledger_emulator import LocalLedgerContext
+
+logger = logging.getLogger(__name__)
+
+
+class EmulatorBackend(CardanoBackend):
+    """
+    Builds and signs real transactions but submits them to the in-process
+    LocalLedgerContext, so the full chain path runs without a network.
+    """
+
+    def __init__(
+        self,
+        payment_skey_path: str,
+        payment_vkey_path: str,
+        ledger: Optional[LocalLedgerContext] = None,
+        utxo_pool_settings: Optional[dict] = None,
+        genesis_lovelace: int = 0,
+        genesis_utxos: int = 1,
+    ):
+        self.ledger = ledger or LocalLedgerContext()
+        super().__init__(
+            payment_skey_path,
+            payment_vkey_path,
+            network=Network.TESTNET,
+            utxo_pool_settings=utxo_pool_settings,
+        )
+        if genesis_lovelace and not self.ledger.utxos(self.address):
+            self.ledger.fund(self.address, genesis_lovelace, count=genesis_utxos)
+
+    @classmethod
+    def from_config(cls, config) -> "EmulatorBackend":
+        return cls(
+            payment_skey_path=config.WALLET_SKEY_PATH,
+            payment_vkey_path=config.WALLET_VKEY_PATH,
+            ledger=LocalLedgerContext(
+                db_path=config.EMULATOR_DB_PATH,
+                block_time=config.EMULATOR_BLOCK_TIME_SECONDS,
+                confirmation_latency=config.EMULATOR_CONFIRMATION_LATENCY_SECONDS,
+            ),
+            utxo_pool_settings=utxo_pool_settings(config),
+            genesis_lovelace=config.EMULATOR_GENESIS_LOVELACE,
+            genesis_utxos=config.EMULATOR_GENESIS_UTXOS,
+        )
+
+    def _create_context(self) -> ChainContext:
+        return self.ledger
+
+    async def wait_for_tx_confirmation(self, tx_hash: str, timeout: int = 300):
+        """Polls the emulator at a fraction of its block time, on the ledger's clock."""
+        clock = self.ledger.clock
+        start_time = clock.time()
+        poll = max(self.ledger.block_time / 10, 0.01)
+        while clock.time() - start_time < timeout:
+            if self.ledger.is_confirmed(tx_hash):
+                logger.info("Transaction confirmed on-chain: %s", tx_hash)
+                return
+            await clock.sleep(poll)
+        raise TimeoutError(
+            f"Transaction {tx_hash} was not confirmed within {timeout} seconds."
+        )
+
+    async def fetch_state_change_metadata(
+        self, tx_ids: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        found = {}
+        for tx_id in tx_ids:
+            metadata = self.ledger.transaction_metadata(tx_id)
+            found[tx_id] = None if metadata is None else metadata.get(METADATA_KEY)
+        return found
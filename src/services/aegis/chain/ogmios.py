@@ -0,0 +1,286 @@
+import asyncio
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import websockets
+from pycardano import ChainContext, Network, Transaction
+from pycardano.backend.ogmios_v6 import OgmiosV6ChainContext
+
+from src.services.aegis.chain.cardano import CardanoBackend, utxo_pool_settings
+
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff after the websocket drops, in seconds.
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+_NEXT_BLOCK_ID = "nextBlock"
+
+
+class OgmiosError(Exception):
+    """A JSON-RPC error returned by Ogmios, e.g. a rejected transaction."""
+
+    def __init__(self, method: str, error: Dict[str, Any]):
+        self.code = error.get("code")
+        self.data = error.get("data")
+        super().__init__(f"{method} failed ({self.code}): {error.get('message')}")
+
+
+class OgmiosClient:
+    """
+    One persistent websocket to Ogmios (v6 JSON-RPC) that carries both transaction
+    submission and chain-sync.
+
+    Chain-sync starts at the current tip and keeps `pipeline` `nextBlock` requests
+    outstanding, so Ogmios pushes each new block as soon as the node adopts it. Every
+    transaction id in a block resolves its waiter; ids of the last `recent_size`
+    confirmed transactions are remembered so a late waiter resolves immediately.
+    If the socket drops, the client reconnects and checks the waiters it missed by
+    querying their first output, which our transactions never spend before they
+    are confirmed.
+    """
+
+    def __init__(self, url: str, pipeline: int = 10, recent_size: int = 10_000):
+        self.url = url
+        self.pipeline = pipeline
+        self.recent_size = recent_size
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._requests: Dict[int, "asyncio.Future"] = {}
+        self._waiters: Dict[str, "asyncio.Future"] = {}
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, timeout: float = 30):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(
+                f"Could not connect to Ogmios at {self.url}."
+            ) from None
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def request(self, method: str, params: Optional[Dict] = None) -> Any:
+        await self.start()
+        return await self._call(method, params)
+
+    async def submit(self, cbor_hex: str) -> str:
+        result = await self.request(
+            "submitTransaction", {"transaction": {"cbor": cbor_hex}}
+        )
+        return result["transaction"]["id"]
+
+    def expect(self, tx_id: str) -> "asyncio.Future":
+        """A future that resolves when `tx_id` appears in a block."""
+        future = self._waiters.get(tx_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            if tx_id in self._recent:
+                future.set_result(None)
+            else:
+                self._waiters[tx_id] = future
+        return future
+
+    def forget(self, tx_id: str):
+        self._waiters.pop(tx_id, None)
+
+    # --- Connection ---
+
+    async def _send(self, method: str, params: Optional[Dict], request_id: Any):
+        message = {"jsonrpc": "2.0", "method": method, "id": request_id}
+        if params is not None:
+            message["params"] = params
+        await self._ws.send(json.dumps(message))
+
+    async def _run(self):
+        backoff = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    self._ws = ws
+                    reader = asyncio.get_running_loop().create_task(self._read())
+                    try:
+                        await self._start_chain_sync()
+                        self._connected.set()
+                        backoff = RECONNECT_MIN_SECONDS
+                        await self._recheck_waiters()
+                        logger.info("Connected to Ogmios at %s", self.url)
+                        await reader
+                    finally:
+                        reader.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    "Ogmios connection lost (%s); reconnecting in %ss.",
+                    e,
+                    backoff,
+                    extra={"rate_limited": True},
+                )
+            finally:
+                self._connected.clear()
+                self._ws = None
+                self._fail_requests()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    async def _call(self, method: str, params: Optional[Dict] = None) -> Any:
+        """Sends a request without waiting for the connection to be ready."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        try:
+            await self._send(method, params, request_id)
+            return await future
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def _start_chain_sync(self):
+        tip = await self._call("queryNetwork/tip")
+        await self._call("findIntersection", {"points": [tip]})
+        for _ in range(self.pipeline):
+            await self._send("nextBlock", None, _NEXT_BLOCK_ID)
+
+    async def _recheck_waiters(self):
+        for tx_id in list(self._waiters):
+            utxos = await self._call(
+                "queryLedgerState/utxo",
+                {"outputReferences": [{"transaction": {"id": tx_id}, "index": 0}]},
+            )
+            if utxos:
+                self._confirmed(tx_id)
+
+    async def _read(self):
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                request_id = message.get("id")
+                if request_id == _NEXT_BLOCK_ID:
+                    self._on_next_block(message)
+                    await self._send("nextBlock", None, _NEXT_BLOCK_ID)
+                    continue
+                future = self._requests.get(request_id)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(
+                        OgmiosError(message.get("method", "?"), message["error"])
+                    )
+                else:
+                    future.set_result(message.get("result"))
+        finally:
+            self._fail_requests()
+
+    def _fail_requests(self):
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Ogmios disconnected."))
+
+    def _on_next_block(self, message: Dict[str, Any]):
+        result = message.get("result") or {}
+        # Rollbacks only move the cursor; a rolled-back transaction that was already
+        # reported stays reported, as with Blockfrost polling.
+        if result.get("direction") != "forward":
+            return
+        for tx in result.get("block", {}).get("transactions", []):
+            self._confirmed(tx["id"])
+
+    def _confirmed(self, tx_id: str):
+        self._recent[tx_id] = None
+        if len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+        future = self._waiters.pop(tx_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+
+class OgmiosBackend(CardanoBackend):
+    """
+    Submits over a persistent Ogmios websocket and is told about confirmations as
+    blocks arrive, instead of polling an HTTP API. UTxOs and protocol parameters
+    for building transactions come from pycardano's Ogmios chain context.
+    """
+
+    rejection_errors = (OgmiosError,)
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        payment_skey_path: str,
+        payment_vkey_path: str,
+        secure: bool = False,
+        network: Network = Network.TESTNET,
+        utxo_pool_settings: Optional[dict] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.secure = secure
+        scheme = "wss" if secure else "ws"
+        self.client = OgmiosClient(f"{scheme}://{host}:{port}")
+        super().__init__(
+            payment_skey_path,
+            payment_vkey_path,
+            network=network,
+            utxo_pool_settings=utxo_pool_settings,
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "OgmiosBackend":
+        return cls(
+            host=config.OGMIOS_HOST,
+            port=config.OGMIOS_PORT,
+            secure=config.OGMIOS_SECURE,
+            payment_skey_path=config.WALLET_SKEY_PATH,
+            payment_vkey_path=config.WALLET_VKEY_PATH,
+            network=(
+                Network.MAINNET
+                if config.CARDANO_NETWORK == "mainnet"
+                else Network.TESTNET
+            ),
+            utxo_pool_settings=utxo_pool_settings(config),
+        )
+
+    def _create_context(self) -> ChainContext:
+        return OgmiosV6ChainContext(
+            self.host, self.port, secure=self.secure, network=self.network
+        )
+
+    async def _submit(self, context: ChainContext, signed_tx: Transaction) -> str:
+        # Watch for the id before submitting, so a fast block cannot be missed.
+        tx_id = str(signed_tx.id)
+        await self.client.start()
+        self.client.expect(tx_id)
+        try:
+            return await self.client.submit(signed_tx.to_cbor_hex())
+        except Exception:
+            self.client.forget(tx_id)
+            raise
+
+    async def wait_for_tx_confirmation(self, tx_hash: str, timeout: int = 300):
+        await self.client.start()
+        try:
+            await asyncio.wait_for(asyncio.shield(self.client.expect(tx_hash)), timeout)
+        except asyncio.TimeoutError:
+            self.client.forget(tx_hash)
+            raise TimeoutError(
+                f"Transaction {tx_hash} was not confirmed within {timeout} seconds."
+            ) from None
+        logger.info("Transaction confirmed on-chain: %s", tx_hash)
+
+    async def close(self):
+        await self.client.close()
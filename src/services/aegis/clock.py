@@ -0,0 +1,58 @@
+"""
+The daemon's source of time.
+
+Components that decide anything by time (the daemon loop, the working set and its
+event-time stage, the anomaly processor, the ledger emulator) read it from a
+`Clock` they are given rather than from `time` or `datetime` directly, so a
+`VirtualClock` can run them through hours of simulated time in milliseconds (see
+`src/services/simulation/scenario.py`).
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class Clock:
+    """Real time."""
+
+    def now(self) -> datetime:
+        """The current time, timezone-aware in UTC."""
+        return datetime.now(timezone.utc)
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Time that only moves when advanced; sleeping advances it instantly."""
+
+    def __init__(self, start: datetime):
+        self._start = start
+        self._elapsed = 0.0
+
+    def now(self) -> datetime:
+        return self._start + timedelta(seconds=self._elapsed)
+
+    def time(self) -> float:
+        return self._start.timestamp() + self._elapsed
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def advance(self, seconds: float):
+        self._elapsed += seconds
+
+    async def sleep(self, seconds: float):
+        self.advance(seconds)
+        # Still yield, so other tasks run as they would during a real sleep.
+        await asyncio.sleep(0)
+
+
+system_clock = Clock()
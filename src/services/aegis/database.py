@@ -1,33 +1,151 @@
-import os
+import logging
+import uuid
 from contextlib import contextmanager
-from typing import List, Dict, Any, Generator
-from sqlalchemy import create_engine, func
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Generator, NamedTuple, Optional, Tuple
+from sqlalchemy import Text, cast, func, insert, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker, Session, subqueryload
 from sqlalchemy.exc import SQLAlchemyError
 
+from src.database.core import engine, read_router
 from src.database.entities.assets import Asset, AssetStatusEnum
 from src.database.entities.asset_tracking import AssetTracking
+from src.database.entities.custodian import Custodian
+from src.database.entities.incident import Incident
+from src.database.entities.location import Location
+from src.database.entities.sensor import Sensor
 from src.database.entities.state_change import StateChange, StateChangeEventEnum
+from src.services.ingest.payload import merge_details
+from src.services.metrics.collectors import DB_QUERY_SECONDS, STATE_CHANGES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class PendingStateChange(NamedTuple):
+    """A state change recorded on-chain and waiting for its database commit."""
+
+    asset_id: Any
+    event_type: str
+    timestamp: Any
+    log_bundle_hash: str
+    on_chain_tx_id: str
+    event_ids_to_link: List[int]
+    new_asset_status: str
+    # The sensor that completed the sequence; the asset moves to its location.
+    final_sensor_id: Optional[Any] = None
+
+
+class StateChangeCommitError(Exception):
+    """
+    None of a batch of on-chain state changes could be written to the database.
+    `pending` still needs its database write; matching or submitting it again would
+    record it on-chain twice.
+    """
+
+    def __init__(self, pending: List[PendingStateChange]):
+        super().__init__(f"Could not commit any of {len(pending)} state changes.")
+        self.pending = pending
+
+
+# Typed tracking event columns that `tracking_event_dict` exposes to processors.
+LOCATION_FIELDS = ("direction", "location_name", "location_from", "location_to")
+
+
+def tracking_event_dict(event) -> Dict[str, Any]:
+    """
+    The shape processors work with, and that `log_bundle_hash` is computed over.
+    Accepts an `AssetTracking` object or a row with the same columns.
+
+    The location fields processors match on are read from their typed columns,
+    falling back to `details` for rows stored before the columns existed.
+    """
+    rest = event.details or {}
+    return {
+        "id": event.id,
+        "asset_id": event.asset_id,
+        "sensor_id": event.sensor_id,
+        "event_type": event.event_type,
+        "details": merge_details(event),
+        "timestamp": event.timestamp.isoformat(),
+        **{
+            field: getattr(event, field) or rest.get(field) for field in LOCATION_FIELDS
+        },
+    }
+
+
+# Each tracking event is linked to the state change at the same array position.
+_LINK_EVENTS_SQL = text(
+    """
+    UPDATE asset_tracking AS t
+    SET state_change_id = l.state_change_id
+    FROM unnest(CAST(:event_ids AS bigint[]), CAST(:state_change_ids AS uuid[]))
+        AS l(event_id, state_change_id)
+    WHERE t.id = l.event_id
+    """
+)
+
+_UPDATE_ASSETS_SQL = text(
+    """
+    UPDATE assets AS a
+    SET current_status = CAST(u.status AS asset_status_enum),
+        current_location_id = COALESCE(s.location_id, a.current_location_id),
+        updated_at = now()
+    FROM unnest(
+            CAST(:asset_ids AS uuid[]),
+            CAST(:statuses AS text[]),
+            CAST(:sensor_ids AS uuid[])
+        ) AS u(asset_id, status, sensor_id)
+        LEFT JOIN sensors AS s ON s.id = u.sensor_id
+    WHERE a.id = u.asset_id
+    """
+)
+
+_LINKED_EVENT_IDS_SQL = text(
+    """
+    SELECT id FROM asset_tracking
+    WHERE id = ANY(CAST(:ids AS bigint[])) AND state_change_id IS NOT NULL
+    """
+)
 
 
 class DatabaseService:
     def __init__(self):
-        db_url = os.getenv("DATABASE_URL")
-        self.engine = create_engine(db_url)
+        # Shares the tuned primary and replica pools of `src.database.core`.
+        self.engine = engine
+        self.read_router = read_router
         self.SessionFactory = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
-        print("Database service initialized with SQLAlchemy.")
+        # The primary's WAL position after our last write; reads on a replica
+        # must have replayed past it, so the daemon never sees its own work undone.
+        self._last_write_lsn: Optional[str] = None
+        logger.info(
+            "Database service initialized with SQLAlchemy.",
+            extra={"replicas": len(self.read_router.replicas)},
+        )
 
     @contextmanager
-    def session_scope(self) -> Generator[Session, None, None]:
-        """Provide a transactional scope around a series of operations."""
-        session = self.SessionFactory()
+    def session_scope(self, read_only: bool = False) -> Generator[Session, None, None]:
+        """
+        Provide a transactional scope around a series of operations. Read-only scopes
+        may run on a replica that has caught up with this service's last write.
+        """
+        if read_only:
+            session = self.SessionFactory(
+                bind=self.read_router.engine_for_read(self._last_write_lsn)
+            )
+        else:
+            session = self.SessionFactory()
         try:
             yield session
             session.commit()
         except SQLAlchemyError as e:
-            print(f"DB Error: Transaction failed and rolled back. Error: {e}")
+            logger.error(
+                "Transaction failed and rolled back: %s",
+                e,
+                extra={"rate_limited": True},
+            )
             session.rollback()
             raise
         finally:
@@ -38,61 +156,280 @@ class DatabaseService:
         Fetches the current state of all assets not yet released, including the
         timestamp of their most recent state change.
         """
-        print("DB: Fetching active asset states via SQLAlchemy...")
-        with self.session_scope() as session:
-            # Create a subquery to find the latest timestamp for each asset
-            latest_sc_subq = (
-                session.query(
-                    StateChange.asset_id,
-                    func.max(StateChange.timestamp).label("last_state_change_ts"),
-                )
-                .group_by(StateChange.asset_id)
-                .subquery()
+        logger.debug("Fetching active asset states")
+        query_timer = DB_QUERY_SECONDS.labels("get_active_assets_state")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            return self._asset_states(
+                session, Asset.current_status != AssetStatusEnum.RELEASED
             )
 
-            # Join the Asset table with the subquery
-            results = (
-                session.query(Asset, latest_sc_subq.c.last_state_change_ts)
-                .outerjoin(latest_sc_subq, Asset.id == latest_sc_subq.c.asset_id)
-                .filter(Asset.current_status != AssetStatusEnum.RELEASED)
-                .all()
-            )
+    def get_assets_state_changed_since(
+        self, since: datetime
+    ) -> Tuple[List[Dict[str, Any]], datetime]:
+        """
+        Fetches the state of every asset updated at or after `since`, released ones
+        included, and the database time to pass as `since` next time.
+        """
+        query_timer = DB_QUERY_SECONDS.labels("get_assets_state_changed_since")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            now = session.scalar(select(func.now()))
+            return self._asset_states(session, Asset.updated_at >= since), now
 
-            # Format the results into the dictionary structure the processors expect
-            asset_states = [
-                {
-                    "id": asset.id,
-                    "current_status": asset.current_status.value,  # Return the string value of the enum
-                    "last_state_change_ts": ts.isoformat() if ts else None,
-                }
-                for asset, ts in results
-            ]
-            return asset_states
+    def _asset_states(self, session: Session, criterion) -> List[Dict[str, Any]]:
+        # The latest state change of each matching asset only, looked up through
+        # the state_changes.asset_id index, so a few changed assets cost a few
+        # lookups rather than an aggregate over the whole ledger.
+        last_state_change_ts = (
+            select(func.max(StateChange.timestamp))
+            .where(StateChange.asset_id == Asset.id)
+            .correlate(Asset)
+            .scalar_subquery()
+        )
+        results = session.query(Asset, last_state_change_ts).filter(criterion).all()
+
+        # Format the results into the dictionary structure the processors expect
+        return [
+            {
+                "id": asset.id,
+                "current_status": asset.current_status.value,  # Return the string value of the enum
+                "last_state_change_ts": ts.isoformat() if ts else None,
+            }
+            for asset, ts in results
+        ]
 
-    def get_unprocessed_tracking_events(self) -> List[Dict[str, Any]]:
+    def get_unprocessed_tracking_events(
+        self, since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Fetches all asset_tracking events that have not been linked to a state change.
+        Fetches all asset_tracking events that have not been linked to a state change,
+        optionally only those with a timestamp after `since`.
         """
-        print("DB: Fetching unprocessed tracking events via SQLAlchemy...")
-        with self.session_scope() as session:
+        logger.debug("Fetching unprocessed tracking events")
+        query_timer = DB_QUERY_SECONDS.labels("get_unprocessed_tracking_events")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            query = session.query(AssetTracking).filter(
+                AssetTracking.state_change_id.is_(None)
+            )
+            if since is not None:
+                query = query.filter(AssetTracking.timestamp > since)
+            events = query.order_by(AssetTracking.timestamp.asc()).all()
+            # Convert ORM objects to dictionaries
+            return [tracking_event_dict(event) for event in events]
+
+    def get_refresh_watermarks(self) -> Tuple[datetime, int]:
+        """The database time and the highest tracking event id, read together."""
+        with self.session_scope(read_only=True) as session:
+            now, max_id = session.execute(
+                select(func.now(), func.coalesce(func.max(AssetTracking.id), 0))
+            ).one()
+            return now, max_id
+
+    def get_tracking_events_after(self, after_id: int) -> List[Dict[str, Any]]:
+        """Unprocessed tracking events with an id above `after_id`, by id."""
+        query_timer = DB_QUERY_SECONDS.labels("get_tracking_events_after")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
             events = (
                 session.query(AssetTracking)
-                .filter(AssetTracking.state_change_id.is_(None))
-                .order_by(AssetTracking.timestamp.asc())
+                .filter(
+                    AssetTracking.id > after_id,
+                    AssetTracking.state_change_id.is_(None),
+                )
+                .order_by(AssetTracking.id)
                 .all()
             )
-            # Convert ORM objects to dictionaries
+            return [tracking_event_dict(event) for event in events]
+
+    def get_linked_event_ids(self, event_ids: List[int]) -> List[int]:
+        """The subset of `event_ids` that is already linked to a state change."""
+        if not event_ids:
+            return []
+        query_timer = DB_QUERY_SECONDS.labels("get_linked_event_ids")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            return session.scalars(_LINKED_EVENT_IDS_SQL, {"ids": event_ids}).all()
+
+    def get_state_changes_page(
+        self,
+        after: Optional[Tuple[datetime, uuid.UUID]],
+        limit: int,
+        settle_seconds: float,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetches up to `limit` state changes ordered by `(created_at, id)`, starting
+        after the pair `after`, each with its linked tracking events. Keyset
+        pagination keeps every page an index range scan however far into the ledger
+        it is. State changes created in the last `settle_seconds` are left out: a
+        transaction still open may commit one with an earlier `created_at`, which
+        a checkpoint past it would skip.
+        """
+        query_timer = DB_QUERY_SECONDS.labels("get_state_changes_page")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            query = (
+                session.query(StateChange)
+                .filter(
+                    StateChange.created_at
+                    < text("now() - make_interval(secs => :settle)").bindparams(
+                        settle=settle_seconds
+                    )
+                )
+                .order_by(StateChange.created_at, StateChange.id)
+            )
+            if after is not None:
+                query = query.filter(
+                    tuple_(StateChange.created_at, StateChange.id) > tuple_(*after)
+                )
+            state_changes = query.limit(limit).all()
+            if not state_changes:
+                return []
+
+            events_by_state_change = {sc.id: [] for sc in state_changes}
+            events = session.query(AssetTracking).filter(
+                AssetTracking.state_change_id.in_(list(events_by_state_change))
+            )
+            for event in events:
+                events_by_state_change[event.state_change_id].append(
+                    tracking_event_dict(event)
+                )
             return [
                 {
-                    "id": event.id,
-                    "asset_id": event.asset_id,
-                    "event_type": event.event_type,
-                    "details": event.details,
-                    "timestamp": event.timestamp.isoformat(),
+                    "id": sc.id,
+                    "asset_id": sc.asset_id,
+                    "event_type": sc.event_type.value,
+                    "timestamp": sc.timestamp,
+                    "log_bundle_hash": sc.log_bundle_hash,
+                    "on_chain_tx_id": sc.on_chain_tx_id,
+                    "created_at": sc.created_at,
+                    "events": events_by_state_change[sc.id],
                 }
-                for event in events
+                for sc in state_changes
             ]
 
+    def commit_state_changes(
+        self, pending: List[PendingStateChange]
+    ) -> Tuple[List[Tuple[uuid.UUID, PendingStateChange]], List[PendingStateChange]]:
+        """
+        Commits every state change of a cycle in one transaction with a fixed number
+        of statements: a multi-row INSERT ... RETURNING for the state changes, and
+        one set-based UPDATE each for the linked tracking events and the assets.
+
+        If the batch fails, each state change is retried on its own so one bad row
+        cannot discard the rest of the cycle's on-chain records. Returns the
+        committed state changes with their new ids, and those that failed, which are
+        on-chain and must be retried as they are. Raises `StateChangeCommitError` if
+        none could be committed.
+        """
+        if not pending:
+            return [], []
+        committed = []
+        failed = []
+        try:
+            committed = list(zip(self._commit_state_change_batch(pending), pending))
+        except SQLAlchemyError as e:
+            if len(pending) > 1:
+                logger.warning(
+                    "Bulk state change commit failed; retrying %d individually.",
+                    len(pending),
+                )
+                for state_change in pending:
+                    try:
+                        (state_change_id,) = self._commit_state_change_batch(
+                            [state_change]
+                        )
+                        committed.append((state_change_id, state_change))
+                    except SQLAlchemyError as single_error:
+                        e = single_error
+                        failed.append(state_change)
+            else:
+                failed = list(pending)
+            for state_change in failed:
+                logger.error(
+                    "Could not commit on-chain state change",
+                    extra={
+                        "event_type": state_change.event_type,
+                        "asset_id": str(state_change.asset_id),
+                        "on_chain_tx_id": state_change.on_chain_tx_id,
+                    },
+                )
+            if not committed:
+                raise StateChangeCommitError(failed) from e
+
+        if committed and self.read_router.replicas:
+            self._last_write_lsn = self.read_router.primary_lsn()
+
+        for _, state_change in committed:
+            STATE_CHANGES_TOTAL.labels(state_change.event_type).inc()
+            logger.info(
+                "Committed state change",
+                extra={
+                    "event_type": state_change.event_type,
+                    "asset_id": str(state_change.asset_id),
+                },
+            )
+        return committed, failed
+
+    def _commit_state_change_batch(
+        self, pending: List[PendingStateChange]
+    ) -> List[uuid.UUID]:
+        query_timer = DB_QUERY_SECONDS.labels("commit_state_changes")
+        with query_timer.time(), self.session_scope() as session:
+            # 1. Insert all state changes as one multi-row INSERT. Ids are assigned
+            # here so each event and asset row can be matched to its state change.
+            state_change_ids = [uuid.uuid4() for _ in pending]
+            inserted = session.scalars(
+                insert(StateChange)
+                .values(
+                    [
+                        {
+                            "id": state_change_id,
+                            "asset_id": sc.asset_id,
+                            "event_type": StateChangeEventEnum(sc.event_type),
+                            "timestamp": sc.timestamp,
+                            "log_bundle_hash": sc.log_bundle_hash,
+                            "on_chain_tx_id": sc.on_chain_tx_id,
+                        }
+                        for sc, state_change_id in zip(pending, state_change_ids)
+                    ]
+                )
+                .returning(StateChange.id)
+            ).all()
+            if len(inserted) != len(pending):
+                raise SQLAlchemyError(
+                    f"Inserted {len(inserted)} of {len(pending)} state changes."
+                )
+
+            # 2. Link the tracking events; an event bundled twice keeps the latest
+            links: Dict[int, str] = {}
+            for sc, state_change_id in zip(pending, state_change_ids):
+                for event_id in sc.event_ids_to_link:
+                    links[event_id] = str(state_change_id)
+            if links:
+                session.execute(
+                    _LINK_EVENTS_SQL,
+                    {
+                        "event_ids": list(links.keys()),
+                        "state_change_ids": list(links.values()),
+                    },
+                )
+
+            # 3. Move each asset to the status of its last state change this cycle
+            latest: Dict[str, PendingStateChange] = {}
+            for sc in pending:
+                latest[str(sc.asset_id)] = sc
+            session.execute(
+                _UPDATE_ASSETS_SQL,
+                {
+                    "asset_ids": list(latest.keys()),
+                    "statuses": [
+                        AssetStatusEnum(sc.new_asset_status).value
+                        for sc in latest.values()
+                    ],
+                    "sensor_ids": [
+                        str(sc.final_sensor_id) if sc.final_sensor_id else None
+                        for sc in latest.values()
+                    ],
+                },
+            )
+        return state_change_ids
+
     def create_state_change_and_link_events(
         self,
         asset_id: str,
@@ -102,42 +439,209 @@ class DatabaseService:
         on_chain_tx_id: str,
         event_ids_to_link: List[int],
         new_asset_status: str,
+        final_sensor_id: Optional[Any] = None,
     ):
+        """Commits a single state change; see `commit_state_changes`."""
+        self.commit_state_changes(
+            [
+                PendingStateChange(
+                    asset_id=asset_id,
+                    event_type=event_type,
+                    timestamp=timestamp,
+                    log_bundle_hash=log_bundle_hash,
+                    on_chain_tx_id=on_chain_tx_id,
+                    event_ids_to_link=event_ids_to_link,
+                    new_asset_status=new_asset_status,
+                    final_sensor_id=final_sensor_id,
+                )
+            ]
+        )
+
+    # --- Incidents ---
+
+    def get_state_changes_without_incident(
+        self, event_types: List[str], limit: int
+    ) -> List[Tuple[uuid.UUID, str]]:
+        """State changes of `event_types` that no incident has been written for."""
+        query_timer = DB_QUERY_SECONDS.labels("get_state_changes_without_incident")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            rows = (
+                session.query(StateChange.id, StateChange.event_type)
+                .outerjoin(Incident, Incident.state_change_id == StateChange.id)
+                .filter(
+                    StateChange.event_type.in_(
+                        [StateChangeEventEnum(t) for t in event_types]
+                    ),
+                    Incident.id.is_(None),
+                )
+                .order_by(StateChange.timestamp.desc())
+                .limit(limit)
+                .all()
+            )
+            return [(state_change_id, event.value) for state_change_id, event in rows]
+
+    def get_incident_context(
+        self, state_change_id: uuid.UUID, window: timedelta, max_events: int
+    ) -> Optional[Dict[str, Any]]:
         """
-        A transactional function using SQLAlchemy to create a state change,
-        update tracking events, and update the asset's status.
+        Everything an incident report is written from: the state change, the asset,
+        its tracking events within `window` of the state change, the sensors involved
+        or at the asset's location, and the asset's chain of state changes with the
+        custodians authenticated for each.
         """
-        print("\n" + "=" * 50)
-        print("DB: SQLAlchemy Transaction Start - Creating New State Change")
-
-        with self.session_scope() as session:
-            # 1. Fetch the parent asset
-            asset_to_update = session.query(Asset).filter(Asset.id == asset_id).one()
-
-            # 2. Create the new StateChange record
-            new_state_change = StateChange(
-                asset_id=asset_id,
-                event_type=StateChangeEventEnum(event_type),
-                timestamp=timestamp,
-                log_bundle_hash=log_bundle_hash,
-                on_chain_tx_id=on_chain_tx_id,
+        query_timer = DB_QUERY_SECONDS.labels("get_incident_context")
+        with query_timer.time(), self.session_scope(read_only=True) as session:
+            state_change = session.get(StateChange, state_change_id)
+            if state_change is None:
+                return None
+            asset = session.get(Asset, state_change.asset_id)
+            locations = {
+                location.id: location.name.value for location in session.query(Location)
+            }
+
+            events = (
+                session.query(AssetTracking, Sensor)
+                .join(Sensor, Sensor.id == AssetTracking.sensor_id)
+                .filter(
+                    AssetTracking.asset_id == asset.id,
+                    AssetTracking.timestamp.between(
+                        state_change.timestamp - window,
+                        state_change.timestamp + window,
+                    ),
+                )
+                .order_by(AssetTracking.timestamp.desc())
+                .limit(max_events)
+                .all()
+            )
+            events.reverse()
+            triggering_event_id = next(
+                (
+                    event.id
+                    for event, _ in reversed(events)
+                    if event.timestamp <= state_change.timestamp
+                ),
+                events[0][0].id if events else None,
             )
-            session.add(new_state_change)
+            if triggering_event_id is None:
+                triggering_event_id = session.scalar(
+                    select(func.max(AssetTracking.id)).where(
+                        AssetTracking.asset_id == asset.id
+                    )
+                )
 
-            # 3. Find and link the asset_tracking records
-            if event_ids_to_link:
-                events_to_link = (
-                    session.query(AssetTracking)
-                    .filter(AssetTracking.id.in_(event_ids_to_link))
-                    .all()
+            sensor_ids = {sensor.id for _, sensor in events}
+            sensors = session.query(Sensor).filter(
+                or_(
+                    Sensor.id.in_(sensor_ids),
+                    Sensor.location_id == asset.current_location_id,
                 )
-                for event in events_to_link:
-                    event.state_change = new_state_change
+            )
 
-            # 4. Update the asset's current_status
-            asset_to_update.current_status = AssetStatusEnum(new_asset_status)
+            history = (
+                session.query(StateChange)
+                .filter(
+                    StateChange.asset_id == asset.id,
+                    StateChange.timestamp <= state_change.timestamp,
+                )
+                .order_by(StateChange.timestamp.desc())
+                .limit(max_events)
+                .all()
+            )
+            history.reverse()
+            custodian_ids = {}
+            for linked_state_change_id, custodian_id in session.query(
+                AssetTracking.state_change_id,
+                func.coalesce(
+                    cast(AssetTracking.custodian_id, Text),
+                    AssetTracking.details["custodian_id"].astext,
+                ),
+            ).filter(
+                AssetTracking.state_change_id.in_([sc.id for sc in history]),
+                or_(
+                    AssetTracking.custodian_id.isnot(None),
+                    AssetTracking.details.has_key("custodian_id"),
+                ),
+            ):
+                custodian_ids.setdefault(linked_state_change_id, []).append(
+                    custodian_id
+                )
+            custodian_names = {
+                str(custodian.id): custodian.name
+                for custodian in session.query(Custodian).filter(
+                    Custodian.id.in_({c for ids in custodian_ids.values() for c in ids})
+                )
+            }
 
-            print(f"  - Committing state change '{event_type}' for asset {asset_id}")
-            print("=" * 50 + "\n")
+            return {
+                "state_change": {
+                    "id": state_change.id,
+                    "event_type": state_change.event_type.value,
+                    "timestamp": state_change.timestamp,
+                    "on_chain_tx_id": state_change.on_chain_tx_id,
+                },
+                "asset": {
+                    "id": asset.id,
+                    "serial_number": asset.serial_number,
+                    "name": asset.name,
+                    "status": asset.current_status.value,
+                    "location": locations.get(asset.current_location_id),
+                },
+                "triggering_asset_tracking_id": triggering_event_id,
+                "events": [
+                    {
+                        "id": event.id,
+                        "timestamp": event.timestamp,
+                        "event_type": event.event_type,
+                        "sensor": sensor.name,
+                        "location": locations.get(sensor.location_id),
+                        "details": merge_details(event),
+                    }
+                    for event, sensor in events
+                ],
+                "sensors": [
+                    {
+                        "name": sensor.name,
+                        "sensor_type": sensor.sensor_type.value,
+                        "status": sensor.status.value,
+                        "location": locations.get(sensor.location_id),
+                    }
+                    for sensor in sensors
+                ],
+                "custody_chain": [
+                    {
+                        "event_type": sc.event_type.value,
+                        "timestamp": sc.timestamp,
+                        "on_chain_tx_id": sc.on_chain_tx_id,
+                        "custodians": [
+                            custodian_names.get(c, c)
+                            for c in custodian_ids.get(sc.id, [])
+                        ],
+                    }
+                    for sc in history
+                ],
+            }
 
-        print("DB: SQLAlchemy transaction committed successfully.")
+    def save_incident(
+        self,
+        state_change_id: uuid.UUID,
+        triggering_asset_tracking_id: int,
+        analysis_report: str,
+        manager_plan: str,
+        client_email: str,
+    ) -> bool:
+        """Writes the incident; False if the state change already has one."""
+        query_timer = DB_QUERY_SECONDS.labels("save_incident")
+        with query_timer.time(), self.session_scope() as session:
+            inserted = session.scalar(
+                pg_insert(Incident)
+                .values(
+                    state_change_id=state_change_id,
+                    triggering_asset_tracking_id=triggering_asset_tracking_id,
+                    analysis_report=analysis_report,
+                    manager_plan=manager_plan,
+                    client_email=client_email,
+                )
+                .on_conflict_do_nothing(index_elements=[Incident.state_change_id])
+                .returning(Incident.id)
+            )
+            return inserted is not None
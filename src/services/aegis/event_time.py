@@ -0,0 +1,254 @@
+"""
+Event-time ordering for the sequence matcher.
+
+Tracking events reach the database out of order: gateways batch, retry and
+reconnect, and sensor clocks are not in step. `_check_for_sequence` needs a
+sequence to be contiguous in event-time order, so a late event that lands between
+two events the matcher already saw must be put in its place before matching.
+
+`EventTimeStage` holds new events in a bounded reordering buffer and releases them
+in (timestamp, id) order once the watermark has passed them. Each sensor's
+watermark is the latest event time it has sent minus the allowed lateness; the
+stage's watermark is the lowest of them, ignoring sensors that have been idle for
+longer than the idle timeout so a silent sensor does not stall the others.
+
+Released events join their asset's tail: the events that could still start or
+complete a sequence. An asset is handed to the matcher only when its tail changed,
+and after an unsuccessful match the tail is cut to the last `tail_length` events,
+so each event is matched against a bounded window instead of being rescanned
+every cycle. Events arriving behind the watermark are merged into their asset's
+tail if the tail still reaches back that far, and are dropped (left unlinked and
+counted) otherwise.
+"""
+
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.services.aegis.database import PendingStateChange
+from src.services.metrics.collectors import (
+    EVENT_REORDER_BUFFERED,
+    EVENTS_LATE_TOTAL,
+    EVENTS_FORCED_RELEASE_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _event_time(event: Dict[str, Any]) -> datetime:
+    return datetime.fromisoformat(event["timestamp"])
+
+
+def _order_key(event: Dict[str, Any]) -> Tuple[datetime, int]:
+    return _event_time(event), event["id"]
+
+
+class EventTimeStage:
+    def __init__(
+        self,
+        allowed_lateness: timedelta,
+        idle_timeout: timedelta,
+        max_buffered: int,
+        tail_length: int,
+        max_span: timedelta,
+    ):
+        self.allowed_lateness = allowed_lateness
+        self.idle_timeout = idle_timeout
+        self.max_buffered = max_buffered
+        self.tail_length = tail_length
+        self.max_span = max_span
+        self._buffer: List[Tuple[datetime, int, Dict[str, Any]]] = []
+        # sensor_id -> (latest event time, wall time the sensor was last heard from)
+        self._sensors: Dict[Any, Tuple[datetime, datetime]] = {}
+        self.released_until: Optional[datetime] = None
+        self.tails: Dict[str, List[Dict[str, Any]]] = {}
+        # Assets whose tail changed since it was last matched, and those handed out
+        # by the last `release` and waiting for `settle`.
+        self._dirty: Set[str] = set()
+        self._evaluated: Set[str] = set()
+        EVENT_REORDER_BUFFERED.set_function(lambda: len(self._buffer))
+
+    @property
+    def held(self) -> int:
+        """Events buffered or waiting in a tail, i.e. not yet settled."""
+        return len(self._buffer) + sum(len(tail) for tail in self.tails.values())
+
+    def event_ids(self) -> List[int]:
+        return [entry[1] for entry in self._buffer] + [
+            event["id"] for tail in self.tails.values() for event in tail
+        ]
+
+    def add(self, event: Dict[str, Any], now: datetime):
+        """Buffers a new event, or handles it as late if it is behind the watermark."""
+        event_time = _event_time(event)
+        sensor_id = event["sensor_id"]
+        latest, _ = self._sensors.get(sensor_id, (event_time, now))
+        self._sensors[sensor_id] = (max(latest, event_time), now)
+
+        if self.released_until is None or event_time > self.released_until:
+            heapq.heappush(self._buffer, (event_time, event["id"], event))
+            return
+
+        asset_id = str(event["asset_id"])
+        tail = self.tails.get(asset_id)
+        if tail and _order_key(tail[0]) <= (event_time, event["id"]):
+            tail.append(event)
+            tail.sort(key=_order_key)
+            self._dirty.add(asset_id)
+            EVENTS_LATE_TOTAL.labels("merged").inc()
+        else:
+            EVENTS_LATE_TOTAL.labels("dropped").inc()
+            logger.warning(
+                "Dropped tracking event %s: %s is behind the watermark %s.",
+                event["id"],
+                event["timestamp"],
+                self.released_until.isoformat(),
+                extra={"rate_limited": True},
+            )
+
+    def touch(self, asset_id: Any):
+        """Re-evaluates an asset's tail next cycle, e.g. after its status changed."""
+        if str(asset_id) in self.tails:
+            self._dirty.add(str(asset_id))
+
+    def watermark(self, now: datetime) -> datetime:
+        """Event time up to which no more events are expected."""
+        cutoff = now - self.idle_timeout
+        for sensor_id, (_, heard_at) in list(self._sensors.items()):
+            if heard_at < cutoff:
+                del self._sensors[sensor_id]
+        return (
+            min((latest for latest, _ in self._sensors.values()), default=now)
+            - self.allowed_lateness
+        )
+
+    def release(self, now: datetime) -> List[Dict[str, Any]]:
+        """
+        Moves every event the watermark has passed into its asset's tail, and returns
+        the tails that changed since they were last matched, in event-time order.
+        """
+        # Tails handed out last time but never settled (the cycle failed) go again.
+        self._dirty |= self._evaluated
+        watermark = self.watermark(now)
+        while self._buffer and (
+            self._buffer[0][0] <= watermark or len(self._buffer) > self.max_buffered
+        ):
+            event_time, _, event = heapq.heappop(self._buffer)
+            if event_time > watermark:
+                EVENTS_FORCED_RELEASE_TOTAL.inc()
+            if self.released_until is None or event_time > self.released_until:
+                self.released_until = event_time
+            if event["asset_id"] is None:
+                continue  # Only asset events take part in sequences.
+            asset_id = str(event["asset_id"])
+            self.tails.setdefault(asset_id, []).append(event)
+            self._dirty.add(asset_id)
+        if self.released_until is None or watermark > self.released_until:
+            self.released_until = watermark
+
+        candidates = [
+            event for asset_id in self._dirty for event in self.tails[asset_id]
+        ]
+        self._evaluated, self._dirty = self._dirty, set()
+        return candidates
+
+    def settle(self, state_changes: List[PendingStateChange]):
+        """
+        Updates the tails handed out by `release` with the matcher's outcome, the
+        state changes it recorded on-chain. An asset that changed state keeps the
+        events after its match and is evaluated again under its new status; any
+        other evaluated tail is cut to its last `tail_length` events, since a
+        sequence must be contiguous.
+        """
+        matched: Dict[str, Set[int]] = {}
+        for state_change in state_changes:
+            matched.setdefault(str(state_change.asset_id), set()).update(
+                state_change.event_ids_to_link
+            )
+        for asset_id in self._evaluated:
+            tail = self.tails.get(asset_id)
+            if not tail:
+                continue
+            linked = matched.get(asset_id)
+            if linked:
+                last = max(i for i, e in enumerate(tail) if e["id"] in linked)
+                tail[:] = [e for e in tail[last + 1 :] if e["id"] not in linked]
+                self._dirty.add(asset_id)
+            else:
+                del tail[: max(len(tail) - self.tail_length, 0)]
+        self._evaluated = set()
+        self._expire()
+
+    def discard(self, event_ids: Iterable[int]):
+        """Forgets events that are already linked to a state change."""
+        event_ids = set(event_ids)
+        if not event_ids:
+            return
+        self._buffer = [entry for entry in self._buffer if entry[1] not in event_ids]
+        heapq.heapify(self._buffer)
+        for tail in self.tails.values():
+            tail[:] = [event for event in tail if event["id"] not in event_ids]
+
+    def reload(self, events: List[Dict[str, Any]], now: datetime):
+        """
+        Rebuilds the tails and buffer from the database's unprocessed events, e.g.
+        on a full resync. Events the watermark has passed go back into their tails,
+        which are all evaluated again; the rest are buffered.
+        """
+        self._buffer = []
+        self.tails = {}
+        for event in sorted(events, key=_order_key):
+            if self.released_until is not None and _event_time(event) <= (
+                self.released_until
+            ):
+                if event["asset_id"] is not None:
+                    self.tails.setdefault(str(event["asset_id"]), []).append(event)
+            else:
+                self.add(event, now)
+        self._dirty = set(self.tails)
+        self._expire()
+
+    def resume_from(self) -> Optional[datetime]:
+        """Unprocessed events older than this can no longer be part of a match."""
+        if self.released_until is None:
+            return None
+        return self.released_until - self.max_span
+
+    def _expire(self):
+        horizon = self.resume_from()
+        for asset_id, tail in list(self.tails.items()):
+            if horizon is not None:
+                tail[:] = [e for e in tail if _event_time(e) > horizon]
+            if not tail:
+                del self.tails[asset_id]
+                self._dirty.discard(asset_id)
+
+    # --- Snapshots ---
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "released_until": self.released_until,
+            "sensors": [
+                [sensor_id, latest, heard_at]
+                for sensor_id, (latest, heard_at) in self._sensors.items()
+            ],
+            "buffer": [event for _, _, event in self._buffer],
+            "tails": [event for tail in self.tails.values() for event in tail],
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self.released_until = state["released_until"]
+        self._sensors = {
+            sensor_id: (latest, heard_at)
+            for sensor_id, latest, heard_at in state["sensors"]
+        }
+        self._buffer = [
+            (_event_time(event), event["id"], event) for event in state["buffer"]
+        ]
+        heapq.heapify(self._buffer)
+        self.tails = {}
+        for event in state["tails"]:
+            self.tails.setdefault(str(event["asset_id"]), []).append(event)
+        # The snapshot does not say which tails were waiting to be matched again.
+        self._dirty = set(self.tails)
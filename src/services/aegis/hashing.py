@@ -0,0 +1,21 @@
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from src.services.aegis import config
+
+
+def calculate_bundle_hash(events: List[Dict[str, Any]]) -> str:
+    """
+    Calculates the SHA-256 `log_bundle_hash` of a list of event dictionaries, over
+    the fields in `config.HASHED_EVENT_FIELDS`. Events are shaped as the daemon
+    reads them: `timestamp` as an ISO string and `details` as loaded from JSONB.
+    """
+    hashed_events = [
+        {field: event.get(field) for field in config.HASHED_EVENT_FIELDS}
+        for event in events
+    ]
+    bundle_string = "".join(
+        sorted([json.dumps(event, default=str) for event in hashed_events])
+    )
+    return hashlib.sha256(bundle_string.encode()).hexdigest()
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Set, Tuple
+
+from src.services.aegis import config
+from src.services.aegis.database import DatabaseService
+from src.services.metrics.collectors import (
+    INCIDENT_BUILD_SECONDS,
+    INCIDENT_JOBS_TOTAL,
+    INCIDENT_QUEUE_DEPTH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_ts(ts) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S %Z").strip()
+
+
+def render_incident(context: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Writes the analysis report, manager plan and client email for an incident."""
+    state_change = context["state_change"]
+    asset = context["asset"]
+    event_type = state_change["event_type"]
+    when = _format_ts(state_change["timestamp"])
+
+    lines = [
+        f"{event_type} on {asset['name']} ({asset['serial_number']}) at {when}.",
+        f"Asset status: {asset['status']}; last known location: {asset['location']}.",
+        f"On-chain record: {state_change['on_chain_tx_id']}",
+        "",
+        "Custody chain:",
+    ]
+    for link in context["custody_chain"]:
+        custodians = ", ".join(link["custodians"]) or "no custodian authenticated"
+        lines.append(
+            f"  {_format_ts(link['timestamp'])}  {link['event_type']:<22} {custodians}"
+        )
+    lines += ["", "Tracking events around the breach:"]
+    for event in context["events"]:
+        details = json.dumps(event["details"], default=str) if event["details"] else ""
+        lines.append(
+            f"  {_format_ts(event['timestamp'])}  {event['event_type']:<22} "
+            f"{event['sensor']} @ {event['location']} {details}".rstrip()
+        )
+    if not context["events"]:
+        lines.append("  none")
+    lines += ["", "Sensors:"]
+    for sensor in context["sensors"]:
+        lines.append(
+            f"  {sensor['name']:<16} {sensor['sensor_type']:<18} "
+            f"{sensor['status']:<12} {sensor['location']}"
+        )
+    analysis_report = "\n".join(lines)
+
+    unhealthy = [s["name"] for s in context["sensors"] if s["status"] != "ONLINE"]
+    custodians = sorted(
+        {c for link in context["custody_chain"] for c in link["custodians"]}
+    )
+    plan = [
+        f"1. Lock down {asset['location']} and confirm the physical position of "
+        f"{asset['serial_number']}.",
+        "2. Interview the custodians on record: "
+        + (", ".join(custodians) if custodians else "none authenticated")
+        + ".",
+        "3. Review camera and access logs for the window in the analysis report.",
+    ]
+    if unhealthy:
+        plan.append(
+            f"{len(plan) + 1}. Inspect sensors that were not online: "
+            + ", ".join(unhealthy)
+            + "."
+        )
+    plan.append(
+        f"{len(plan) + 1}. Release the asset from FLAGGED_ANOMALY only after "
+        "sign-off, and notify the client."
+    )
+    manager_plan = "\n".join(plan)
+
+    client_email = (
+        f"Subject: Security notice for {asset['name']} ({asset['serial_number']})\n\n"
+        "Dear Client,\n\n"
+        f"At {when} our monitoring system raised a {event_type.replace('_', ' ').lower()} "
+        f"for {asset['name']}. The asset has been placed under review and our security "
+        "team is verifying its custody chain. The event is recorded on the Cardano "
+        f"blockchain under transaction {state_change['on_chain_tx_id']}.\n\n"
+        "We will contact you as soon as the review is complete.\n\n"
+        "Kind regards,\nAegis Vault Security"
+    )
+    return analysis_report, manager_plan, client_email
+
+
+class IncidentWorkerPool:
+    """
+    Builds incident reports for breach state changes in the background, so the
+    daemon cycle only pays for a non-blocking enqueue.
+
+    Jobs are served most severe first and are deduplicated by state change while
+    queued or running; the database's unique `state_change_id` catches the rest.
+    When the queue is full a job is dropped rather than waiting, and a sweep for
+    breaches without an incident runs once the queue drains again.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        workers: int = config.INCIDENT_WORKERS,
+        queue_size: int = config.INCIDENT_QUEUE_SIZE,
+    ):
+        self.db = db_service
+        self.workers = workers
+        self.queue: "asyncio.PriorityQueue[Tuple[int, int, uuid.UUID]]" = (
+            asyncio.PriorityQueue(maxsize=queue_size)
+        )
+        self._order = itertools.count()
+        self._known: Set[uuid.UUID] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._sweep_needed = True
+        INCIDENT_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        """Stops the workers; unfinished jobs are picked up by the next sweep."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, state_change_id: uuid.UUID, event_type: str) -> bool:
+        """Queues an incident job without waiting. False if it was not queued."""
+        severity = config.INCIDENT_SEVERITY.get(event_type)
+        if severity is None:
+            return False
+        if state_change_id in self._known:
+            INCIDENT_JOBS_TOTAL.labels("duplicate").inc()
+            return False
+        try:
+            self.queue.put_nowait((severity, next(self._order), state_change_id))
+        except asyncio.QueueFull:
+            INCIDENT_JOBS_TOTAL.labels("dropped").inc()
+            logger.warning(
+                "Incident queue is full; job for %s deferred to the next sweep.",
+                state_change_id,
+                extra={"rate_limited": True},
+            )
+            self._sweep_needed = True
+            return False
+        self._known.add(state_change_id)
+        return True
+
+    async def _work(self):
+        while True:
+            _, _, state_change_id = await self.queue.get()
+            try:
+                with INCIDENT_BUILD_SECONDS.time():
+                    outcome = await asyncio.to_thread(self._build, state_change_id)
+            except Exception:
+                logger.exception("Failed to build incident for %s", state_change_id)
+                outcome = "failed"
+                self._sweep_needed = True
+            finally:
+                self._known.discard(state_change_id)
+                self.queue.task_done()
+            INCIDENT_JOBS_TOTAL.labels(outcome).inc()
+
+    def _build(self, state_change_id: uuid.UUID) -> str:
+        context = self.db.get_incident_context(
+            state_change_id,
+            window=timedelta(minutes=config.INCIDENT_CONTEXT_WINDOW_MINUTES),
+            max_events=config.INCIDENT_CONTEXT_MAX_EVENTS,
+        )
+        if context is None or context["triggering_asset_tracking_id"] is None:
+            # An incident must reference a tracking event; an asset that never
+            # produced one cannot have an incident row.
+            logger.warning(
+                "No tracking event to attach an incident for %s to.", state_change_id
+            )
+            return "skipped"
+        analysis_report, manager_plan, client_email = render_incident(context)
+        written = self.db.save_incident(
+            state_change_id,
+            context["triggering_asset_tracking_id"],
+            analysis_report,
+            manager_plan,
+            client_email,
+        )
+        if written:
+            logger.info(
+                "Incident report written",
+                extra={"state_change_id": str(state_change_id)},
+            )
+        return "written" if written else "duplicate"
+
+    async def _sweep(self):
+        """Queues breaches that have no incident, at start and after drops."""
+        while True:
+            if self._sweep_needed and self.queue.empty():
+                self._sweep_needed = False
+                try:
+                    missing = await asyncio.to_thread(
+                        self.db.get_state_changes_without_incident,
+                        list(config.INCIDENT_SEVERITY),
+                        self.queue.maxsize,
+                    )
+                except Exception:
+                    logger.exception("Incident sweep failed")
+                    self._sweep_needed = True
+                    missing = []
+                for state_change_id, event_type in missing:
+                    self.submit(state_change_id, event_type)
+                # A full page may mean more are missing than fit in the queue.
+                if len(missing) == self.queue.maxsize:
+                    self._sweep_needed = True
+            await asyncio.sleep(config.CYCLE_INTERVAL_SECONDS)
@@ -0,0 +1,347 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+from fractions import Fraction
+from typing import Dict, List, Optional, Set, Union
+
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+from pycardano import (
+    Address,
+    Network,
+    Transaction,
+    TransactionId,
+    TransactionInput,
+    TransactionOutput,
+    UTxO,
+    Value,
+    VerificationKeyHash,
+)
+from pycardano.backend.base import (
+    ALONZO_COINS_PER_UTXO_WORD,
+    ChainContext,
+    GenesisParameters,
+    ProtocolParameters,
+)
+from pycardano.exception import TransactionFailedException
+
+from src.services.aegis.clock import Clock, system_clock
+
+logger = logging.getLogger(__name__)
+
+# Preview-testnet protocol parameters, so fees and min-UTxO values computed against
+# the emulator match what the real network would charge.
+DEFAULT_PROTOCOL_PARAMETERS = ProtocolParameters(
+    min_fee_constant=155381,
+    min_fee_coefficient=44,
+    max_block_size=90112,
+    max_tx_size=16384,
+    max_block_header_size=1100,
+    key_deposit=2000000,
+    pool_deposit=500000000,
+    pool_influence=Fraction(3, 10),
+    monetary_expansion=Fraction(3, 1000),
+    treasury_expansion=Fraction(1, 5),
+    decentralization_param=Fraction(0),
+    extra_entropy="",
+    protocol_major_version=9,
+    protocol_minor_version=0,
+    min_utxo=1000000,
+    min_pool_cost=340000000,
+    price_mem=Fraction(577, 10000),
+    price_step=Fraction(721, 10000000),
+    max_tx_ex_mem=14000000,
+    max_tx_ex_steps=10000000000,
+    max_block_ex_mem=62000000,
+    max_block_ex_steps=20000000000,
+    max_val_size=5000,
+    collateral_percent=150,
+    max_collateral_inputs=3,
+    coins_per_utxo_word=ALONZO_COINS_PER_UTXO_WORD,
+    coins_per_utxo_byte=4310,
+    cost_models={},
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS utxos (
+    tx_hash TEXT NOT NULL,
+    output_index INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    output_cbor BLOB NOT NULL,
+    available_at REAL NOT NULL,
+    spent_by TEXT,
+    PRIMARY KEY (tx_hash, output_index)
+);
+CREATE INDEX IF NOT EXISTS utxos_address_idx ON utxos (address, spent_by);
+CREATE TABLE IF NOT EXISTS transactions (
+    tx_hash TEXT PRIMARY KEY,
+    tx_cbor BLOB NOT NULL,
+    submitted_at REAL NOT NULL,
+    included_at REAL NOT NULL,
+    block_number INTEGER NOT NULL
+);
+"""
+
+
+class LocalLedgerContext(ChainContext):
+    """
+    A deterministic, in-process Cardano ledger that pycardano can build, sign and
+    submit transactions against. The UTxO set lives in SQLite (":memory:" by
+    default, or a file to persist it between runs).
+
+    Submitted transactions are validated like the real ledger would for our use
+    case: every input must exist and be unspent, every signature must verify, and
+    inputs must balance outputs plus fee. A transaction is included in the next
+    block boundary (every `block_time` seconds) and reports as confirmed
+    `confirmation_latency` seconds after that. Its outputs become spendable once it
+    is included, and its hash is the real body hash, so it is unique by construction.
+    """
+
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        network: Network = Network.TESTNET,
+        block_time: float = 20.0,
+        confirmation_latency: float = 0.0,
+        protocol_param: ProtocolParameters = DEFAULT_PROTOCOL_PARAMETERS,
+        genesis_time: Optional[float] = None,
+        clock: Clock = system_clock,
+    ):
+        self.clock = clock
+        self._network = network
+        self.block_time = block_time
+        self.confirmation_latency = confirmation_latency
+        self._protocol_param = protocol_param
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)"
+        )
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'genesis_time'"
+        ).fetchone()
+        if row:
+            self.genesis_time = row[0]
+        else:
+            self.genesis_time = (
+                genesis_time if genesis_time is not None else self._now()
+            )
+            self._conn.execute(
+                "INSERT INTO meta VALUES ('genesis_time', ?)", (self.genesis_time,)
+            )
+        self._conn.commit()
+        self._genesis_param = GenesisParameters(
+            active_slots_coefficient=Fraction(1, 20),
+            update_quorum=5,
+            max_lovelace_supply=45000000000000000,
+            network_magic=2,
+            epoch_length=86400,
+            system_start=int(self.genesis_time),
+            slots_per_kes_period=129600,
+            slot_length=1,
+            max_kes_evolutions=62,
+            security_param=432,
+        )
+
+    def _now(self) -> float:
+        return self.clock.time()
+
+    # --- ChainContext interface ---
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        return self._protocol_param
+
+    @property
+    def genesis_param(self) -> GenesisParameters:
+        return self._genesis_param
+
+    @property
+    def network(self) -> Network:
+        return self._network
+
+    @property
+    def epoch(self) -> int:
+        return self.last_block_slot // self._genesis_param.epoch_length
+
+    @property
+    def last_block_slot(self) -> int:
+        elapsed = self._now() - self.genesis_time
+        last_block = math.floor(elapsed / self.block_time) * self.block_time
+        return int(last_block / self._genesis_param.slot_length)
+
+    def _utxos(self, address: str) -> List[UTxO]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tx_hash, output_index, output_cbor FROM utxos "
+                "WHERE address = ? AND spent_by IS NULL AND available_at <= ? "
+                "ORDER BY tx_hash, output_index",
+                (address, self._now()),
+            ).fetchall()
+        return [
+            UTxO(
+                TransactionInput(TransactionId.from_primitive(tx_hash), index),
+                TransactionOutput.from_cbor(output_cbor),
+            )
+            for tx_hash, index, output_cbor in rows
+        ]
+
+    def submit_tx_cbor(self, cbor: Union[bytes, str]) -> str:
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        tx = Transaction.from_cbor(cbor)
+        body = tx.transaction_body
+        tx_hash = str(tx.id)
+        now = self._now()
+
+        with self._lock:
+            if self._conn.execute(
+                "SELECT 1 FROM transactions WHERE tx_hash = ?", (tx_hash,)
+            ).fetchone():
+                raise TransactionFailedException(
+                    f"Transaction {tx_hash} already known."
+                )
+
+            consumed = Value(0)
+            required_signers = set(body.required_signers or [])
+            for tx_input in body.inputs:
+                row = self._conn.execute(
+                    "SELECT output_cbor, spent_by, available_at FROM utxos "
+                    "WHERE tx_hash = ? AND output_index = ?",
+                    (str(tx_input.transaction_id), tx_input.index),
+                ).fetchone()
+                if row is None or row[1] is not None or row[2] > now:
+                    raise TransactionFailedException(
+                        f"BadInputsUTxO: {tx_input.transaction_id}#{tx_input.index} "
+                        "is unknown, not yet on-chain or already spent."
+                    )
+                spent = TransactionOutput.from_cbor(row[0])
+                consumed += spent.amount
+                if isinstance(spent.address.payment_part, VerificationKeyHash):
+                    required_signers.add(spent.address.payment_part)
+
+            produced = Value(body.fee)
+            for output in body.outputs:
+                produced += output.amount
+            if consumed != produced:
+                raise TransactionFailedException(
+                    f"ValueNotConservedUTxO: consumed {consumed}, produced {produced}."
+                )
+
+            self._verify_signatures(tx, required_signers)
+
+            if body.ttl is not None and body.ttl < self.last_block_slot:
+                raise TransactionFailedException(f"ExpiredUTxO: ttl {body.ttl} passed.")
+
+            block_number = math.floor((now - self.genesis_time) / self.block_time) + 1
+            included_at = self.genesis_time + block_number * self.block_time
+
+            self._conn.executemany(
+                "UPDATE utxos SET spent_by = ? WHERE tx_hash = ? AND output_index = ?",
+                [(tx_hash, str(i.transaction_id), i.index) for i in body.inputs],
+            )
+            self._conn.executemany(
+                "INSERT INTO utxos VALUES (?, ?, ?, ?, ?, NULL)",
+                [
+                    (tx_hash, index, str(output.address), output.to_cbor(), included_at)
+                    for index, output in enumerate(body.outputs)
+                ],
+            )
+            self._conn.execute(
+                "INSERT INTO transactions VALUES (?, ?, ?, ?, ?)",
+                (tx_hash, cbor, now, included_at, block_number),
+            )
+            self._conn.commit()
+
+        logger.debug(
+            "Emulator accepted transaction",
+            extra={"tx_hash": tx_hash, "block": block_number},
+        )
+        return tx_hash
+
+    def _verify_signatures(
+        self, tx: Transaction, required_signers: Set[VerificationKeyHash]
+    ):
+        """
+        Every witness must sign the body, and every key whose signature the ledger
+        requires (the payment keys of the spent outputs and the body's
+        `required_signers`) must have a witness.
+        """
+        body_hash = tx.transaction_body.hash()
+        witnesses = tx.transaction_witness_set.vkey_witnesses or []
+        for witness in witnesses:
+            try:
+                VerifyKey(witness.vkey.payload).verify(body_hash, witness.signature)
+            except BadSignatureError:
+                raise TransactionFailedException("InvalidWitnessesUTXOW")
+        missing = required_signers - {witness.vkey.hash() for witness in witnesses}
+        if missing:
+            raise TransactionFailedException(
+                "MissingVKeyWitnessesUTXOW: "
+                + ", ".join(sorted(str(key_hash) for key_hash in missing))
+            )
+
+    # --- Emulator helpers ---
+
+    def fund(self, address: Union[str, Address], lovelace: int, count: int = 1):
+        """
+        Creates `count` genesis UTxOs of `lovelace` each for `address`. Hashes derive
+        from the address and the existing UTxO count, so a fresh ledger funded the
+        same way always has the same UTxO set.
+        """
+        address = str(address)
+        with self._lock:
+            (existing,) = self._conn.execute("SELECT COUNT(*) FROM utxos").fetchone()
+            genesis_hash = hashlib.blake2b(
+                f"genesis:{address}:{existing}".encode(), digest_size=32
+            ).hexdigest()
+            self._conn.executemany(
+                "INSERT INTO utxos VALUES (?, ?, ?, ?, ?, NULL)",
+                [
+                    (
+                        genesis_hash,
+                        index,
+                        address,
+                        TransactionOutput(
+                            Address.from_primitive(address), lovelace
+                        ).to_cbor(),
+                        self.genesis_time,
+                    )
+                    for index in range(count)
+                ],
+            )
+            self._conn.commit()
+
+    def is_confirmed(self, tx_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT included_at FROM transactions WHERE tx_hash = ?", (tx_hash,)
+            ).fetchone()
+        return row is not None and row[0] + self.confirmation_latency <= self._now()
+
+    def transaction_metadata(self, tx_hash: str) -> Optional[Dict]:
+        """Returns the transaction's metadata as a plain dict, like Blockfrost does."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tx_cbor FROM transactions WHERE tx_hash = ?", (tx_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        aux = Transaction.from_cbor(row[0]).auxiliary_data
+        if aux is None:
+            return {}
+        data = aux.data
+        return dict(getattr(data, "metadata", data))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (tx_count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM transactions"
+            ).fetchone()
+            (utxo_count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM utxos WHERE spent_by IS NULL"
+            ).fetchone()
+        return {"transactions": tx_count, "unspent_outputs": utxo_count}
@@ -0,0 +1,181 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.services.metrics.collectors import LOG_RECORDS_DROPPED_TOTAL
+
+# Attributes every LogRecord has; anything else on a record was passed via `extra=`
+# and is rendered as a structured field.
+_STANDARD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+# `extra=` keys that steer the pipeline instead of being logged.
+_CONTROL_ATTRS = {"sample", "rate_limited"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Renders a record plus its `extra=` fields either as `key=value` text or as one
+    JSON object per line, depending on `fmt`.
+    """
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            key: value
+            for key, value in record.__dict__.items()
+            if key not in _STANDARD_ATTRS and key not in _CONTROL_ATTRS
+        }
+        message = record.getMessage()
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+
+        if self.json:
+            payload = {
+                "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": message,
+                **fields,
+            }
+            return json.dumps(payload, default=str)
+
+        line = (
+            f"{self.formatTime(record, '%Y-%m-%d %H:%M:%S')} {record.levelname:<7} "
+            f"{record.name}: {message}"
+        )
+        extras = [f"{key}={value}" for key, value in fields.items() if key != "exc"]
+        if extras:
+            line += " | " + " ".join(extras)
+        if "exc" in fields:
+            line += "\n" + fields["exc"]
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records logged with `extra={"sample": rate}`.
+    Records without a sample rate always pass.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample", None)
+        return rate is None or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records per message template through every `interval`
+    seconds for records logged with `extra={"rate_limited": True}`. The first record
+    after a quiet period carries a `suppressed` count of what was dropped. Filters
+    run in the logging threads, so the windows are guarded by a lock.
+    """
+
+    def __init__(self, burst: int, interval: float):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "rate_limited", False):
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them and drops them when the queue is full,
+    so a slow stdout can never stall the daemon's hot path. Drops are counted in
+    `aegis_log_records_dropped_total`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED_TOTAL.inc()
+
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    queue_size: int = 10000,
+    rate_limit_burst: int = 5,
+    rate_limit_interval: float = 60.0,
+    logger_name: str = "src",
+) -> logging.Logger:
+    """
+    Routes every logger under `logger_name` through a bounded queue that a background
+    thread drains to stdout. Safe to call more than once; only the first call installs
+    the pipeline.
+    """
+    global _listener, _queue_handler
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(RateLimitFilter(rate_limit_burst, rate_limit_interval))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter(fmt))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    queue_handler.logger_name = logger_name
+    _queue_handler = queue_handler
+    return logger
+
+
+def shutdown_logging():
+    """Flushes whatever is still queued. Call before the process exits."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger(_queue_handler.logger_name).removeHandler(_queue_handler)
+        _queue_handler = None
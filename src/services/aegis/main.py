@@ -1,66 +1,273 @@
+import logging
 import os
-import time
-import traceback
+import signal
 import asyncio
+from datetime import timedelta
+from typing import List, Optional
 
 from src.services.aegis import config
-from src.services.aegis.database import DatabaseService
-from src.services.aegis.blockchain_service import BlockchainService
+from src.services.aegis.chain.base import ChainBackend
+from src.services.aegis.clock import Clock, system_clock
+from src.services.aegis.database import (
+    DatabaseService,
+    PendingStateChange,
+    StateChangeCommitError,
+)
+from src.services.aegis.event_time import EventTimeStage
+from src.services.aegis.incidents import IncidentWorkerPool
+from src.services.aegis.log import configure_logging, shutdown_logging
+from src.services.aegis.chain import load_backend
 from src.services.aegis.processors import EventProcessor, AnomalyProcessor
+from src.services.aegis.tracing import CycleProfiler, span, trace_cycle
+from src.services.aegis.working_set import WorkingSet
+from src.services.metrics.collectors import (
+    CYCLE_SECONDS,
+    LAST_CYCLE_TIMESTAMP,
+    UNPROCESSED_EVENTS,
+)
+from src.services.metrics.exporter import start_metrics_server
 from dotenv import find_dotenv, load_dotenv
 
 load_dotenv(find_dotenv())
 
+# Named explicitly: run with `python -m`, __name__ is "__main__", which is outside
+# the "src" logger tree configure_logging routes.
+logger = logging.getLogger("src.services.aegis.main")
+
 
 class Daemon:
-    def __init__(self):
-        print("Initializing Aegis State Machine Daemon...")
-        self.db_service = DatabaseService()
-        self.bc_service = BlockchainService(
-            base_url=config.CARDANO_BASE_URL,
-            project_id=config.BLOCKFROST_PROJECT_ID,
-            payment_skey_path=config.WALLET_SKEY_PATH,
-            payment_vkey_path=config.WALLET_VKEY_PATH,
-            dry_run=True,  # SAFE TESTING MODE: Set to False to send real transactions
+    def __init__(
+        self,
+        db_service: Optional[DatabaseService] = None,
+        bc_service: Optional[ChainBackend] = None,
+        clock: Clock = system_clock,
+        snapshot_path: Optional[str] = config.SNAPSHOT_PATH,
+    ):
+        """
+        The database and chain backend default to the configured ones. Everything
+        that decides by time reads `clock`. Without a `snapshot_path` the working
+        set is neither restored from nor written to a snapshot.
+        """
+        logger.info("Initializing Aegis State Machine Daemon...")
+        self.db_service = db_service or DatabaseService()
+        self.bc_service = bc_service or load_backend(config.CHAIN_BACKEND).from_config(
+            config
         )
+        self.clock = clock
+        self.snapshot_path = snapshot_path
         self.event_processor = EventProcessor(self.db_service, self.bc_service)
-        self.anomaly_processor = AnomalyProcessor(self.db_service, self.bc_service)
+        self.anomaly_processor = AnomalyProcessor(
+            self.db_service, self.bc_service, clock=clock
+        )
+        self.incident_pool = IncidentWorkerPool(self.db_service)
+        self.working_set = WorkingSet(
+            self.db_service,
+            clock=clock,
+            id_lookback=config.WORKING_SET_ID_LOOKBACK,
+            asset_lookback_seconds=config.WORKING_SET_ASSET_LOOKBACK_SECONDS,
+            stage=EventTimeStage(
+                allowed_lateness=timedelta(
+                    seconds=config.EVENT_ALLOWED_LATENESS_SECONDS
+                ),
+                idle_timeout=timedelta(seconds=config.EVENT_SENSOR_IDLE_SECONDS),
+                max_buffered=config.EVENT_REORDER_BUFFER_MAX,
+                # An unmatched tail only needs to hold the start of a sequence.
+                tail_length=max(
+                    len(sequence)
+                    for outcomes in config.EVENT_SEQUENCE_RULES.values()
+                    for sequence in outcomes.values()
+                )
+                - 1,
+                max_span=timedelta(minutes=config.EVENT_SEQUENCE_MAX_SPAN_MINUTES),
+            ),
+        )
+        self.profiler = CycleProfiler(
+            config.PROFILE_OUTPUT_DIR, trigger_file=config.PROFILE_TRIGGER_FILE
+        )
+        # On-chain state changes whose database write failed, retried as they are.
+        self.uncommitted: List[PendingStateChange] = []
+        self.cycle_number = 0
+        self.state_report_requested = False
+        self.last_state_report = 0.0
+        self.last_snapshot = clock.monotonic()
         self.running = True
 
     async def run_cycle(self):
         """Executes a single monitoring and processing cycle."""
-        print(f"\n--- Starting new cycle at {time.ctime()} ---")
+        self.cycle_number += 1
+        self.profiler.poll_trigger_file(config.PROFILE_CYCLES)
+        self.profiler.begin_cycle()
+
+        try:
+            with trace_cycle(self.cycle_number) as trace:
+                # Until these reach the database the assets' states are stale, so
+                # the cycle stops here if none of them can be written.
+                if self.uncommitted:
+                    with span("db.retry_state_changes"):
+                        self._commit_state_changes(self.uncommitted)
 
-        active_assets = self.db_service.get_active_assets_state()
-        unprocessed_events = self.db_service.get_unprocessed_tracking_events()
+                # Only what changed since the last cycle is read from the database.
+                with span("db.working_set"):
+                    loaded_at = self.working_set.loaded_at
+                    if (
+                        loaded_at is None
+                        or self.clock.monotonic() - loaded_at
+                        >= config.WORKING_SET_RESYNC_INTERVAL_SECONDS
+                    ):
+                        self.working_set.full_load()
+                        # Still unlinked in the database, but already on-chain.
+                        self.working_set.stage.discard(
+                            event_id
+                            for state_change in self.uncommitted
+                            for event_id in state_change.event_ids_to_link
+                        )
+                    else:
+                        self.working_set.refresh()
+                active_assets = self.working_set.active_assets()
+                unprocessed_events = self.working_set.candidate_events()
+                UNPROCESSED_EVENTS.set(self.working_set.stage.held)
 
-        await self.event_processor.process_events(active_assets, unprocessed_events)
-        await self.anomaly_processor.process_anomalies(active_assets)
+                with span("events.process"):
+                    pending = await self.event_processor.process_events(
+                        active_assets, unprocessed_events
+                    )
+                with span("anomalies.process"):
+                    pending += await self.anomaly_processor.process_anomalies(
+                        active_assets
+                    )
+                # Every state change of the cycle is committed in one transaction.
+                with span("db.commit_state_changes"):
+                    try:
+                        self._commit_state_changes(pending)
+                    finally:
+                        self.working_set.apply_matched(pending)
+
+                if self._snapshot_due():
+                    with span("snapshot"):
+                        self.working_set.write_snapshot(self.snapshot_path)
+
+                if self._state_report_due():
+                    with span("state_report"):
+                        self.event_processor.write_state_report(active_assets)
+        finally:
+            self.profiler.end_cycle()
+
+        CYCLE_SECONDS.observe(trace.total)
+        LAST_CYCLE_TIMESTAMP.set(self.clock.time())
+        logger.info(
+            "Cycle finished: %s assets=%d events=%d",
+            trace.summary(),
+            len(active_assets),
+            len(unprocessed_events),
+        )
 
-        print("--- Cycle finished ---")
+    def _commit_state_changes(self, pending: List[PendingStateChange]):
+        """
+        Commits on-chain state changes. Those the database did not take are kept in
+        `uncommitted` for the next cycle; re-raises if it took none.
+        """
+        try:
+            committed, self.uncommitted = self.db_service.commit_state_changes(pending)
+        except StateChangeCommitError as e:
+            self.uncommitted = e.pending
+            raise
+        # Incident reports are built by the worker pool, not in the cycle.
+        for state_change_id, state_change in committed:
+            self.incident_pool.submit(state_change_id, state_change.event_type)
+
+    def _state_report_due(self) -> bool:
+        """The full state report is written on an interval or when requested."""
+        trigger = config.STATE_REPORT_TRIGGER_FILE
+        if trigger and os.path.exists(trigger):
+            try:
+                os.remove(trigger)
+            except OSError:
+                pass
+            self.state_report_requested = True
+
+        interval = config.STATE_REPORT_INTERVAL_SECONDS
+        now = self.clock.monotonic()
+        if self.state_report_requested or (
+            interval and now - self.last_state_report >= interval
+        ):
+            self.state_report_requested = False
+            self.last_state_report = now
+            return True
+        return False
+
+    def _snapshot_due(self) -> bool:
+        interval = config.SNAPSHOT_INTERVAL_SECONDS
+        now = self.clock.monotonic()
+        if self.snapshot_path and interval and now - self.last_snapshot >= interval:
+            self.last_snapshot = now
+            return True
+        return False
+
+    def request_state_report(self):
+        self.state_report_requested = True
+
+    def _install_signal_handlers(self):
+        """
+        SIGUSR1 profiles the next PROFILE_CYCLES cycles and SIGUSR2 writes the state
+        report on the next cycle (neither is available on Windows).
+        """
+        if not hasattr(signal, "SIGUSR1"):
+            return
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(
+            signal.SIGUSR1, self.profiler.request, config.PROFILE_CYCLES
+        )
+        loop.add_signal_handler(signal.SIGUSR2, self.request_state_report)
 
     async def start(self):
         """Starts the main daemon loop."""
-        print("Daemon started. Press Ctrl+C to stop.")
+        logger.info("Daemon started. Press Ctrl+C to stop.")
+        if config.METRICS_ENABLED:
+            start_metrics_server(config.METRICS_PORT)
+        self._install_signal_handlers()
+        if self.snapshot_path:
+            try:
+                self.working_set.restore(
+                    self.snapshot_path,
+                    max_age_seconds=config.SNAPSHOT_MAX_AGE_SECONDS,
+                )
+            except Exception:
+                # The first cycle retries with a full load.
+                logger.exception("Could not restore the working set.")
+        self.incident_pool.start()
         while self.running:
             try:
                 await self.run_cycle()
-                await asyncio.sleep(config.CYCLE_INTERVAL_SECONDS)
+                await self.clock.sleep(config.CYCLE_INTERVAL_SECONDS)
             except KeyboardInterrupt:
                 self.stop()
-            except Exception as e:
-                print(f"An unexpected error occurred: {e}")
-                traceback.print_exc()
-                await asyncio.sleep(config.CYCLE_INTERVAL_SECONDS * 2)
+            except Exception:
+                logger.exception("An unexpected error occurred.")
+                await self.clock.sleep(config.CYCLE_INTERVAL_SECONDS * 2)
+        await self.incident_pool.stop()
+        if (
+            self.snapshot_path
+            and config.SNAPSHOT_INTERVAL_SECONDS
+            and self.working_set.loaded_at is not None
+        ):
+            self.working_set.write_snapshot(self.snapshot_path)
+        await self.bc_service.close()
 
     def stop(self):
         """Stops the daemon gracefully."""
-        print("\nStopping daemon...")
+        logger.info("Stopping daemon...")
         self.running = False
-        print("Daemon stopped.")
+        logger.info("Daemon stopped.")
 
 
 async def main():
+    configure_logging(
+        level=config.LOG_LEVEL,
+        fmt=config.LOG_FORMAT,
+        queue_size=config.LOG_QUEUE_SIZE,
+        rate_limit_burst=config.LOG_RATE_LIMIT_BURST,
+        rate_limit_interval=config.LOG_RATE_LIMIT_INTERVAL_SECONDS,
+    )
     daemon = Daemon()
     await daemon.start()
 
@@ -70,3 +277,5 @@ if __name__ == "__main__":
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\nDaemon terminated by user.")
+    finally:
+        shutdown_logging()
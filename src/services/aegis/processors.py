@@ -1,12 +1,46 @@
+import asyncio
 import hashlib
 import json
+import logging
 from datetime import datetime, timedelta
 from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from typing import Awaitable, List, Dict, Any, Optional
 
 from src.services.aegis import config
-from src.services.aegis.database import DatabaseService
-from src.services.aegis.blockchain_service import BlockchainService
+from src.services.aegis.database import DatabaseService, PendingStateChange
+from src.services.aegis.chain.base import ChainBackend
+from src.services.aegis.clock import Clock, system_clock
+from src.services.aegis.hashing import calculate_bundle_hash
+from src.services.aegis.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+async def _gather_recorded(
+    recordings: Dict[str, Awaitable[Any]], what: str
+) -> List[Any]:
+    """
+    Awaits the on-chain recordings of several assets concurrently and returns the
+    results of those that succeeded. A failure is logged rather than raised: the
+    others are already on-chain and must still reach the database commit, or the
+    next cycle would record them again.
+    """
+    results = await asyncio.gather(*recordings.values(), return_exceptions=True)
+    succeeded = []
+    for asset_id, result in zip(recordings, results):
+        if isinstance(result, Exception):
+            logger.error(
+                "Could not record %s for asset %s",
+                what,
+                asset_id,
+                exc_info=result,
+                extra={"rate_limited": True},
+            )
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            succeeded.append(result)
+    return succeeded
 
 
 class EventProcessor:
@@ -15,46 +49,53 @@ class EventProcessor:
     state changes based on the rules in `config.py`.
     """
 
-    def __init__(self, db_service: DatabaseService, bc_service: BlockchainService):
+    def __init__(self, db_service: DatabaseService, bc_service: ChainBackend):
         self.db = db_service
         self.bc = bc_service
         self.rules = config.EVENT_SEQUENCE_RULES
 
-    async def process_events(self, assets: List[Dict], events: List[Dict]):
+    def write_state_report(self, assets: List[Dict]):
         """
-        Main method to process all unprocessed events. Now asynchronous.
+        Logs the full AEGIS STATE REPORT, one line per active asset. This is too
+        expensive for every cycle, so the daemon calls it on an interval or on demand.
         """
-        # --- New Logging Section for Asset Status ---
-        print("\n--- AEGIS STATE REPORT ---")
+        moving_assets = []
+        stationary_assets = []
+        for asset in assets:
+            # Assets in a transient state are considered 'moving'
+            line = f"  -> ID: {asset['id']}, Status: {asset['current_status']}"
+            if asset["current_status"] in ("IN_TRANSIT_OUT", "IN_TRANSIT_IN"):
+                moving_assets.append(line)
+            else:
+                stationary_assets.append(line)
+
+        lines = ["--- AEGIS STATE REPORT ---"]
         if not assets:
-            print("No active assets found.")
+            lines.append("No active assets found.")
         else:
-            moving_assets = []
-            stationary_assets = []
-            for asset in assets:
-                # Assets in a transient state are considered 'moving'
-                if asset["current_status"] in ("IN_TRANSIT_OUT", "IN_TRANSIT_IN"):
-                    moving_assets.append(
-                        f"  -> ID: {asset['id']}, Status: {asset['current_status']}"
-                    )
-                else:
-                    stationary_assets.append(
-                        f"  -> ID: {asset['id']}, Status: {asset['current_status']}"
-                    )
-
-            print(f"Total Active Assets: {len(assets)}")
+            lines.append(f"Total Active Assets: {len(assets)}")
             if stationary_assets:
-                print("\nStationary Assets:")
-                for a in stationary_assets:
-                    print(a)
+                lines.append("Stationary Assets:")
+                lines.extend(stationary_assets)
             if moving_assets:
-                print("\nAssets in Transit:")
-                for a in moving_assets:
-                    print(a)
-        print("--------------------------\n")
+                lines.append("Assets in Transit:")
+                lines.extend(moving_assets)
+        lines.append("--------------------------")
+        # A single record keeps the report contiguous and costs one enqueue.
+        logger.info(
+            "\n".join(lines),
+            extra={"active": len(assets), "in_transit": len(moving_assets)},
+        )
 
+    async def process_events(
+        self, assets: List[Dict], events: List[Dict]
+    ) -> List[PendingStateChange]:
+        """
+        Main method to process all unprocessed events. Now asynchronous.
+        Returns the state changes recorded on-chain, for the daemon to commit in bulk.
+        """
         if not events:
-            return
+            return []
 
         events_by_asset = defaultdict(list)
         for event in events:
@@ -63,85 +104,122 @@ class EventProcessor:
 
         asset_map = {str(asset["id"]): asset for asset in assets}
 
-        for asset_id, asset_events in events_by_asset.items():
-            asset_info = asset_map.get(asset_id)
-            if not asset_info:
-                continue
-
-            current_status = asset_info["current_status"]
-            possible_outcomes = self.rules.get(current_status, {})
-
-            for new_state, required_sequence in possible_outcomes.items():
-                # This check will now correctly find sequences and handle bundling
-                await self._check_for_sequence(
+        # Assets are independent, so their state-change transactions are submitted
+        # concurrently; the UTxO pool gives each one its own inputs.
+        per_asset = await _gather_recorded(
+            {
+                asset_id: self._process_asset_events(
+                    asset_id, asset_events, asset_map[asset_id]
+                )
+                for asset_id, asset_events in events_by_asset.items()
+                if asset_id in asset_map
+            },
+            "state changes",
+        )
+        return [state_change for pending in per_asset for state_change in pending]
+
+    async def _process_asset_events(
+        self, asset_id: str, asset_events: List[Dict], asset_info: Dict
+    ) -> List[PendingStateChange]:
+        current_status = asset_info["current_status"]
+        possible_outcomes = self.rules.get(current_status, {})
+
+        pending = []
+        for new_state, required_sequence in possible_outcomes.items():
+            # This check will now correctly find sequences and handle bundling
+            try:
+                state_change = await self._check_for_sequence(
                     asset_id, asset_events, new_state, required_sequence
                 )
+            except Exception:
+                if not pending:
+                    raise
+                # Keep the state changes already on-chain for the commit.
+                logger.exception(
+                    "Could not record %s for asset %s",
+                    new_state,
+                    asset_id,
+                    extra={"rate_limited": True},
+                )
+                break
+            if state_change:
+                pending.append(state_change)
+        return pending
 
-    def _get_event_location(self, details: Dict[str, Any]) -> Optional[str]:
+    def _get_event_location(self, event: Dict[str, Any]) -> Optional[str]:
         """
         Contextually determines the most relevant location for an event.
         For movement events (like scans), the destination ('location_to') is prioritized.
         For static events (like auth), the specific location name is used.
         """
         # For movement events, the destination is the key piece of context.
-        if "direction" in details and details.get("direction") in ("EXIT", "ENTER"):
-            return details.get("location_to") or details.get("location_from")
+        if event.get("direction") in ("EXIT", "ENTER"):
+            return event.get("location_to") or event.get("location_from")
 
         # For all other events, use the specific location or fall back.
         return (
-            details.get("location_name")
-            or details.get("location_to")
-            or details.get("location_from")
+            event.get("location_name")
+            or event.get("location_to")
+            or event.get("location_from")
         )
 
     async def _check_for_sequence(
         self, asset_id, available_events, new_state, required_sequence
-    ):
+    ) -> Optional[PendingStateChange]:
         """
         Checks if the required sequence of events exists for an asset.
         This version correctly checks for a sub-sequence and bundles only the relevant events.
         """
+        len_req = len(required_sequence)
+        if not len_req:
+            return None  # Cannot match an empty sequence
+
+        with span("events.sequence_match"):
+            match_index = self._find_sequence(available_events, required_sequence)
+        if match_index is None:
+            return None
+
+        logger.info(
+            "Found valid event sequence for '%s' for asset %s", new_state, asset_id
+        )
+
+        # Bundle *only* the events that make up the matched sequence
+        event_bundle = available_events[match_index : match_index + len_req]
+
+        # After processing a sequence, we must stop to prevent double-processing.
+        return await self._trigger_state_change(asset_id, new_state, event_bundle)
+
+    def _find_sequence(self, available_events, required_sequence) -> Optional[int]:
+        """Returns the index at which `required_sequence` starts, if it is present."""
         # --- BUG FIX: Replaced simple 'or' logic with a context-aware function ---
         available_event_types = [
-            (e["event_type"], self._get_event_location(e.get("details", {})))
-            for e in available_events
+            (e["event_type"], self._get_event_location(e)) for e in available_events
         ]
 
         len_req = len(required_sequence)
-        if not len_req:
-            return  # Cannot match an empty sequence
-
         for i in range(len(available_event_types) - len_req + 1):
             # Check if the slice of available events matches the required sequence
             if available_event_types[i : i + len_req] == required_sequence:
-                print(
-                    f"PROCESSOR: Found valid event sequence for '{new_state}' for asset {asset_id}"
-                )
-
-                # Bundle *only* the events that make up the matched sequence
-                event_bundle = available_events[i : i + len_req]
-
-                await self._trigger_state_change(asset_id, new_state, event_bundle)
-
-                # After processing a sequence, we must stop to prevent double-processing.
-                return
+                return i
+        return None
 
     def _calculate_bundle_hash(self, events: List[Dict[str, Any]]) -> str:
         """Calculates a SHA-256 hash of a list of event dictionaries."""
-        bundle_string = "".join(
-            sorted([json.dumps(event, default=str) for event in events])
-        )
-        return hashlib.sha256(bundle_string.encode()).hexdigest()
+        return calculate_bundle_hash(events)
 
     async def _trigger_state_change(
         self, asset_id: str, new_state: str, event_bundle: List[Dict]
-    ):
-        """Orchestrates the creation of a new state change. Now asynchronous."""
+    ) -> Optional[PendingStateChange]:
+        """
+        Records a new state change on-chain. The database commit is deferred to the
+        end of the cycle, where all state changes are committed together.
+        """
         if not event_bundle:
-            print(
-                f"ERROR: Attempted to trigger state change for {asset_id} with an empty event bundle."
+            logger.error(
+                "Attempted to trigger state change for %s with an empty event bundle.",
+                asset_id,
             )
-            return
+            return None
 
         final_event = event_bundle[-1]
         timestamp = datetime.fromisoformat(final_event["timestamp"])
@@ -151,24 +229,27 @@ class EventProcessor:
 
         log_bundle_hash = self._calculate_bundle_hash(event_bundle)
 
-        on_chain_tx_id = await self.bc.record_state_change(
-            asset_id=asset_id,
-            event_type=new_state,
-            log_bundle_hash=log_bundle_hash,
-            timestamp=timestamp,
-        )
+        with span("chain.record_state_change"):
+            on_chain_tx_id = await self.bc.record_state_change(
+                asset_id=asset_id,
+                event_type=new_state,
+                log_bundle_hash=log_bundle_hash,
+                timestamp=timestamp,
+            )
 
         if not on_chain_tx_id:
-            print(
-                f"ERROR: Failed to get on-chain TX ID for '{new_state}' on asset {asset_id}. Aborting DB commit."
+            logger.error(
+                "Failed to get on-chain TX ID for '%s' on asset %s. Aborting DB commit.",
+                new_state,
+                asset_id,
             )
-            return
+            return None
 
         event_ids_to_link = [event["id"] for event in event_bundle]
         new_asset_status = config.NEXT_ASSET_STATUS_MAP[new_state]
 
         # --- CHANGE: Pass the final_sensor_id to the database service ---
-        self.db.create_state_change_and_link_events(
+        return PendingStateChange(
             asset_id=asset_id,
             event_type=new_state,
             timestamp=timestamp,
@@ -185,13 +266,23 @@ class AnomalyProcessor:
     Analyzes the current state of assets to find time-based anomalies.
     """
 
-    def __init__(self, db_service: DatabaseService, bc_service: BlockchainService):
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        bc_service: ChainBackend,
+        clock: Clock = system_clock,
+    ):
         self.db = db_service
         self.bc = bc_service
+        self.clock = clock
         self.transit_rules = config.TRANSIT_ANOMALY_RULES
 
-    async def process_anomalies(self, assets: List[Dict]):
-        """Checks for assets in transient state for too long. Now asynchronous."""
+    async def process_anomalies(self, assets: List[Dict]) -> List[PendingStateChange]:
+        """
+        Checks for assets in transient state for too long. Now asynchronous.
+        Returns the breaches recorded on-chain, for the daemon to commit in bulk.
+        """
+        breaches = {}
         for asset in assets:
             status = asset["current_status"]
             if status in ("IN_TRANSIT_OUT", "IN_TRANSIT_IN"):
@@ -200,22 +291,29 @@ class AnomalyProcessor:
                     continue
 
                 last_ts = datetime.fromisoformat(last_ts_str)
-                duration = datetime.now(last_ts.tzinfo) - last_ts
+                duration = self.clock.now() - last_ts
 
                 max_duration = timedelta(
                     minutes=self.transit_rules["max_duration_minutes"]
                 )
 
                 if duration > max_duration:
-                    print(f"ANOMALY: Asset {asset['id']} has exceeded transit time!")
-                    await self._trigger_anomaly_state_change(
+                    logger.warning(
+                        "ANOMALY: Asset %s has exceeded transit time!", asset["id"]
+                    )
+                    breaches[str(asset["id"])] = self._trigger_anomaly_state_change(
                         asset, "Transit Duration Exceeded"
                     )
 
-    async def _trigger_anomaly_state_change(self, asset: Dict, reason: str):
+        recorded = await _gather_recorded(breaches, "a transit breach")
+        return [breach for breach in recorded if breach]
+
+    async def _trigger_anomaly_state_change(
+        self, asset: Dict, reason: str
+    ) -> Optional[PendingStateChange]:
         """Orchestrates creation of a SECURITY_BREACH state change. Now asynchronous."""
         asset_id = asset["id"]
-        timestamp = datetime.now()
+        timestamp = self.clock.now()
         new_state = "SECURITY_BREACH"
 
         # Create a deterministic hash for the anomaly event
@@ -224,23 +322,26 @@ class AnomalyProcessor:
         ).encode()
         log_bundle_hash = hashlib.sha256(log_bundle_hash_input).hexdigest()
 
-        on_chain_tx_id = await self.bc.record_state_change(
-            asset_id=asset_id,
-            event_type=new_state,
-            log_bundle_hash=log_bundle_hash,
-            timestamp=timestamp,
-        )
+        with span("chain.record_state_change"):
+            on_chain_tx_id = await self.bc.record_state_change(
+                asset_id=asset_id,
+                event_type=new_state,
+                log_bundle_hash=log_bundle_hash,
+                timestamp=timestamp,
+            )
 
         if not on_chain_tx_id:
-            print(
-                f"ERROR: Failed to get on-chain TX ID for ANOMALY on asset {asset_id}. Aborting DB commit."
+            logger.error(
+                "Failed to get on-chain TX ID for ANOMALY on asset %s. Aborting DB commit.",
+                asset_id,
+                extra={"rate_limited": True},
             )
-            return
+            return None
 
         new_asset_status = config.NEXT_ASSET_STATUS_MAP[new_state]
 
         # Note: Anomalies don't link to prior events, as they are triggered by a lack of events.
-        self.db.create_state_change_and_link_events(
+        return PendingStateChange(
             asset_id=asset_id,
             event_type=new_state,
             timestamp=timestamp,
@@ -0,0 +1,145 @@
+import cProfile
+import logging
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from src.services.metrics.collectors import CYCLE_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["CycleTrace"]] = ContextVar(
+    "aegis_cycle_trace", default=None
+)
+
+
+class CycleTrace:
+    """
+    Collects named timing spans for a single daemon cycle and renders them as a
+    one-line summary. Spans with the same name are accumulated, so a span that runs
+    once per asset reports its total time and call count.
+    """
+
+    def __init__(self, cycle_number: int):
+        self.cycle_number = cycle_number
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.total = 0.0
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.durations[name] += elapsed
+            self.counts[name] += 1
+            CYCLE_PHASE_SECONDS.labels(name).observe(elapsed)
+
+    def finish(self) -> float:
+        self.total = time.perf_counter() - self.started
+        return self.total
+
+    def summary(self) -> str:
+        parts = [f"cycle={self.cycle_number}", f"total={self.total * 1000:.1f}ms"]
+        for name, duration in self.durations.items():
+            count = self.counts[name]
+            suffix = f"x{count}" if count > 1 else ""
+            parts.append(f"{name}={duration * 1000:.1f}ms{suffix}")
+        return " ".join(parts)
+
+
+@contextmanager
+def trace_cycle(cycle_number: int):
+    """Makes a new CycleTrace the current trace for the duration of one cycle."""
+    trace = CycleTrace(cycle_number)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times a block against the current cycle's trace. Outside of a traced cycle
+    (e.g. in the standalone blockchain test) it does nothing.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+class CycleProfiler:
+    """
+    Captures a cProfile of the next N daemon cycles on request and writes it to
+    `output_dir`, without restarting the daemon. Requests come from a signal handler
+    or from a trigger file that is polled once per cycle.
+    """
+
+    def __init__(self, output_dir: str, trigger_file: Optional[str] = None):
+        self.output_dir = output_dir
+        self.trigger_file = trigger_file
+        self.remaining_cycles = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiled_cycles = 0
+
+    def request(self, cycles: int):
+        """Profiles the next `cycles` cycles. Safe to call from a signal handler."""
+        self.remaining_cycles = max(self.remaining_cycles, cycles)
+
+    def poll_trigger_file(self, default_cycles: int):
+        """Turns the presence of the trigger file into a profiling request."""
+        if not self.trigger_file or not os.path.exists(self.trigger_file):
+            return
+        try:
+            with open(self.trigger_file) as f:
+                content = f.read().strip()
+            cycles = int(content) if content else default_cycles
+        except (OSError, ValueError):
+            cycles = default_cycles
+        try:
+            os.remove(self.trigger_file)
+        except OSError:
+            pass
+        logger.info("Trigger file found, profiling the next %d cycles.", cycles)
+        self.request(cycles)
+
+    def begin_cycle(self):
+        if self.remaining_cycles <= 0:
+            return
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profiled_cycles = 0
+        self._profile.enable()
+
+    def end_cycle(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._profiled_cycles += 1
+        self.remaining_cycles -= 1
+        if self.remaining_cycles <= 0:
+            self._dump()
+
+    def _dump(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir,
+            f"aegis-cycles-{time.strftime('%Y%m%d-%H%M%S')}-{self._profiled_cycles}.prof",
+        )
+        stats = pstats.Stats(self._profile)
+        stats.dump_stats(path)
+        logger.info("Wrote profile of %d cycles to %s", self._profiled_cycles, path)
+        self._profile = None
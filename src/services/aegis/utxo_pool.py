@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Set
+
+from pycardano import (
+    Address,
+    ChainContext,
+    PaymentSigningKey,
+    TransactionBuilder,
+    TransactionInput,
+    TransactionOutput,
+    UTxO,
+)
+
+logger = logging.getLogger(__name__)
+
+# Keeps a split transaction comfortably below the 16 KB max transaction size.
+MAX_OUTPUTS_PER_SPLIT = 100
+
+# After a refill finds nothing to split, background refills pause for this long.
+REFILL_RETRY_SECONDS = 60
+
+
+def _key(utxo: UTxO) -> str:
+    return f"{utxo.input.transaction_id}#{utxo.input.index}"
+
+
+class UtxoPool:
+    """
+    Keeps the wallet split into a pool of similar-sized UTxOs and leases each one to
+    exactly one in-flight transaction, so concurrent state-change transactions never
+    compete for the same inputs.
+
+    Wallet UTxOs are classified by size: outputs between `min_lovelace` and twice
+    `utxo_lovelace` are pool members, larger ones are the treasury that refills the
+    pool, and smaller ones are dust that gets swept into the next refill. When a
+    state-change transaction confirms, its change output goes straight back into the
+    pool. When fewer than `low_water` UTxOs are free, a split transaction turns
+    treasury and dust into `utxo_lovelace`-sized outputs until `target_size` is met.
+    """
+
+    def __init__(
+        self,
+        context: ChainContext,
+        address: Address,
+        signing_key: PaymentSigningKey,
+        wait_for_confirmation: Callable[[str], Awaitable[None]],
+        utxo_lovelace: int,
+        target_size: int,
+        low_water: int,
+        min_lovelace: int,
+    ):
+        self.context = context
+        self.address = address
+        self.signing_key = signing_key
+        self.wait_for_confirmation = wait_for_confirmation
+        self.utxo_lovelace = utxo_lovelace
+        self.target_size = target_size
+        self.low_water = low_water
+        self.min_lovelace = min_lovelace
+
+        self._available: Deque[UTxO] = deque()
+        self._leased: Set[str] = set()
+        # Inputs spent by submitted but unconfirmed transactions. Some backends keep
+        # listing them until the spending transaction is on-chain.
+        self._pending_spent: Set[str] = set()
+        self._condition = asyncio.Condition()
+        self._refill_task: "asyncio.Task | None" = None
+        self._last_empty_refill = 0.0
+        self._started = False
+
+    @property
+    def available(self) -> int:
+        return len(self._available)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._leased)
+
+    async def start(self):
+        """Loads pool-sized UTxOs from the chain and tops the pool up if needed."""
+        if self._started:
+            return
+        self._started = True
+        for utxo in await self._fetch_wallet_utxos():
+            if self._is_pool_sized(utxo):
+                self._available.append(utxo)
+        logger.info(
+            "UTxO pool loaded",
+            extra={"available": len(self._available), "target": self.target_size},
+        )
+        self._maybe_refill()
+
+    async def acquire(self, timeout: float = 300) -> UTxO:
+        """Leases a UTxO that no other in-flight transaction is using."""
+        await self.start()
+        attempted_refill = False
+        async with self._condition:
+            while not self._available:
+                if not self._refilling():
+                    if attempted_refill and not self._leased:
+                        raise RuntimeError(
+                            f"Wallet {self.address} has no spendable UTxOs to fill the pool."
+                        )
+                    self._maybe_refill(force=True)
+                    attempted_refill = True
+                await asyncio.wait_for(self._condition.wait(), timeout)
+            utxo = self._available.popleft()
+            self._leased.add(_key(utxo))
+        self._maybe_refill()
+        return utxo
+
+    async def release(self, utxo: UTxO):
+        """Returns a leased UTxO untouched, e.g. when building or submitting failed."""
+        async with self._condition:
+            self._leased.discard(_key(utxo))
+            self._available.appendleft(utxo)
+            self._condition.notify()
+
+    def mark_submitted(self, utxo: UTxO):
+        """The leased UTxO was spent by a transaction that is now in the mempool."""
+        self._pending_spent.add(_key(utxo))
+
+    async def confirm(self, utxo: UTxO, tx_hash: str, outputs: List[TransactionOutput]):
+        """
+        The transaction that spent `utxo` is on-chain; its change output (the only
+        output paying back to us) rejoins the pool if it is still large enough.
+        """
+        async with self._condition:
+            key = _key(utxo)
+            self._leased.discard(key)
+            self._pending_spent.discard(key)
+            for index, output in enumerate(outputs):
+                if output.address != self.address:
+                    continue
+                change = UTxO(TransactionInput.from_primitive([tx_hash, index]), output)
+                if self._is_pool_sized(change):
+                    self._available.append(change)
+                    self._condition.notify()
+        self._maybe_refill()
+
+    async def forget(self, utxo: UTxO):
+        """The transaction that spent `utxo` was submitted but never confirmed."""
+        async with self._condition:
+            key = _key(utxo)
+            self._leased.discard(key)
+            self._pending_spent.discard(key)
+            self._condition.notify_all()
+
+    # --- Refilling ---
+
+    def _refilling(self) -> bool:
+        return self._refill_task is not None and not self._refill_task.done()
+
+    def _maybe_refill(self, force: bool = False):
+        if len(self._available) >= self.low_water or self._refilling():
+            return
+        if (
+            not force
+            and time.monotonic() - self._last_empty_refill < REFILL_RETRY_SECONDS
+        ):
+            return
+        self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def _refill(self):
+        try:
+            missing = self.target_size - len(self._available) - len(self._leased)
+            if missing <= 0:
+                return
+            sources = [
+                utxo
+                for utxo in await self._fetch_wallet_utxos()
+                if not self._is_pool_sized(utxo)
+            ]
+            if not sources:
+                self._last_empty_refill = time.monotonic()
+                logger.warning(
+                    "UTxO pool is low but the wallet has no treasury UTxOs to split.",
+                    extra={"rate_limited": True, "available": len(self._available)},
+                )
+                return
+
+            tx_hash, outputs = await asyncio.to_thread(
+                self._build_and_submit_split, sources, missing
+            )
+            for utxo in sources:
+                self._pending_spent.add(_key(utxo))
+            logger.info(
+                "Submitted UTxO pool split transaction %s",
+                tx_hash,
+                extra={"outputs": missing},
+            )
+            await self.wait_for_confirmation(tx_hash)
+
+            async with self._condition:
+                for utxo in sources:
+                    self._pending_spent.discard(_key(utxo))
+                for index, output in enumerate(outputs):
+                    utxo = UTxO(
+                        TransactionInput.from_primitive([tx_hash, index]), output
+                    )
+                    if self._is_pool_sized(utxo):
+                        self._available.append(utxo)
+                self._condition.notify_all()
+        except Exception:
+            self._last_empty_refill = time.monotonic()
+            logger.exception("Failed to refill the UTxO pool.")
+        finally:
+            async with self._condition:
+                self._refill_task = None
+                self._condition.notify_all()
+
+    def _build_and_submit_split(self, sources: List[UTxO], missing: int):
+        """Splits treasury and dust UTxOs into `utxo_lovelace`-sized outputs."""
+        total = sum(utxo.output.amount.coin for utxo in sources)
+        # Leave headroom for the fee and a change output.
+        affordable = max((total - 2_000_000) // self.utxo_lovelace, 0)
+        count = min(missing, affordable, MAX_OUTPUTS_PER_SPLIT)
+        if count <= 0:
+            raise RuntimeError("Treasury UTxOs are too small to split into the pool.")
+
+        builder = TransactionBuilder(self.context)
+        for utxo in sources:
+            builder.add_input(utxo)
+        for _ in range(count):
+            builder.add_output(TransactionOutput(self.address, self.utxo_lovelace))
+        signed_tx = builder.build_and_sign(
+            signing_keys=[self.signing_key], change_address=self.address
+        )
+        tx_hash = str(self.context.submit_tx(signed_tx.to_cbor()))
+        return tx_hash, list(signed_tx.transaction_body.outputs)
+
+    # --- Helpers ---
+
+    async def _fetch_wallet_utxos(self) -> List[UTxO]:
+        utxos = await asyncio.to_thread(self.context.utxos, self.address)
+        in_pool = {_key(utxo) for utxo in self._available}
+        return [
+            utxo
+            for utxo in utxos
+            if not utxo.output.amount.multi_asset
+            and _key(utxo) not in self._leased
+            and _key(utxo) not in self._pending_spent
+            and _key(utxo) not in in_pool
+        ]
+
+    def _is_pool_sized(self, utxo: UTxO) -> bool:
+        coin = utxo.output.amount.coin
+        return self.min_lovelace <= coin <= 2 * self.utxo_lovelace
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "available": len(self._available),
+            "in_flight": len(self._leased),
+            "pending_spent": len(self._pending_spent),
+        }
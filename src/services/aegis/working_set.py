@@ -0,0 +1,198 @@
+"""
+The daemon's in-memory working set and its warm-restart snapshots.
+
+Instead of scanning every unprocessed event and aggregating every active asset each
+cycle, the daemon keeps both in memory and only reads what changed since its
+watermark: tracking events above the highest id it has seen, and assets updated
+since the database time of its last refresh. Both watermarks look back a little
+(`WORKING_SET_ID_LOOKBACK`, `WORKING_SET_ASSET_LOOKBACK_SECONDS`) because ids and
+`updated_at` are assigned before their transaction commits, so rows can become
+visible slightly out of order. New events go through the `EventTimeStage`, which
+hands them to the matcher in event-time order (see `event_time.py`).
+
+The working set is written to a CBOR snapshot between cycles. On startup the
+snapshot is loaded and caught up from its watermark, so a restart costs a few
+index range scans instead of the full rebuild. Anomaly deadlines follow from the
+assets' `last_state_change_ts`, and chain submissions never outlive a cycle, so
+neither needs its own entry in the snapshot.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import cbor2
+
+from src.services.aegis.clock import Clock, system_clock
+from src.services.aegis.database import DatabaseService, PendingStateChange
+from src.services.aegis.event_time import EventTimeStage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 3
+
+
+class WorkingSet:
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        id_lookback: int,
+        asset_lookback_seconds: float,
+        stage: EventTimeStage,
+        clock: Clock = system_clock,
+    ):
+        self.db = db_service
+        self.clock = clock
+        self.id_lookback = id_lookback
+        self.asset_lookback = timedelta(seconds=asset_lookback_seconds)
+        self.assets: Dict[Any, Dict[str, Any]] = {}
+        self.stage = stage
+        # Ids of events already handed to the stage, within the id lookback, so the
+        # lookback does not add them twice.
+        self._seen: Set[int] = set()
+        self.event_watermark = 0
+        self.asset_watermark: Optional[datetime] = None
+        # When the working set was last fully (re)built; None until it is.
+        self.loaded_at: Optional[float] = None
+
+    def full_load(self):
+        """Rebuilds the working set from scratch, as the daemon used to every cycle."""
+        # Taken first, so anything written during the load is caught up later.
+        now, max_event_id = self.db.get_refresh_watermarks()
+        assets = self.db.get_active_assets_state()
+        # Older unprocessed events can no longer be part of a match.
+        events = self.db.get_unprocessed_tracking_events(since=self.stage.resume_from())
+        self.assets = {asset["id"]: asset for asset in assets}
+        self.stage.reload(events, self.clock.now())
+        self._seen = {event["id"] for event in events}
+        self.event_watermark = max(
+            max(self._seen, default=0), max_event_id, self.event_watermark
+        )
+        self.asset_watermark = now
+        self.loaded_at = self.clock.monotonic()
+        logger.info(
+            "Working set loaded from the database",
+            extra={"assets": len(self.assets), "events": self.stage.held},
+        )
+
+    def refresh(self):
+        """Reads the tracking events and asset states that changed since last time."""
+        new_events = self.db.get_tracking_events_after(
+            max(self.event_watermark - self.id_lookback, 0)
+        )
+        now = self.clock.now()
+        for event in new_events:
+            if event["id"] not in self._seen:
+                self._seen.add(event["id"])
+                self.stage.add(event, now)
+        if new_events:
+            self.event_watermark = max(self.event_watermark, new_events[-1]["id"])
+        horizon = self.event_watermark - self.id_lookback
+        self._seen = {event_id for event_id in self._seen if event_id > horizon}
+
+        changed, now = self.db.get_assets_state_changed_since(
+            self.asset_watermark - self.asset_lookback
+        )
+        for asset in changed:
+            if asset["current_status"] == "RELEASED":
+                self.assets.pop(asset["id"], None)
+            else:
+                self.assets[asset["id"]] = asset
+            # Its held events may match a sequence of the new status.
+            self.stage.touch(asset["id"])
+        self.asset_watermark = now
+
+    def apply_matched(self, state_changes: List[PendingStateChange]):
+        """
+        Settles the events handed to the matcher this cycle with the state changes
+        it recorded on-chain, whether or not their database write succeeded.
+        """
+        self.stage.settle(state_changes)
+
+    def active_assets(self) -> List[Dict[str, Any]]:
+        return list(self.assets.values())
+
+    def candidate_events(self) -> List[Dict[str, Any]]:
+        """Events to match this cycle, in event-time order per asset."""
+        return self.stage.release(self.clock.now())
+
+    # --- Snapshots ---
+
+    def write_snapshot(self, path: str):
+        """Writes the working set atomically; a crash leaves the previous snapshot."""
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "written_at": self.clock.time(),
+            "event_watermark": self.event_watermark,
+            "asset_watermark": self.asset_watermark,
+            "assets": [
+                [a["id"], a["current_status"], a["last_state_change_ts"]]
+                for a in self.assets.values()
+            ],
+            "seen": list(self._seen),
+            "stage": self.stage.to_state(),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            cbor2.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def restore(self, path: str, max_age_seconds: float):
+        """
+        Loads the snapshot at `path` and catches it up with the database, or falls
+        back to a full load if there is no usable snapshot.
+        """
+        snapshot = self._read_snapshot(path, max_age_seconds)
+        if snapshot is None:
+            self.full_load()
+            return
+
+        self.assets = {
+            asset_id: {
+                "id": asset_id,
+                "current_status": status,
+                "last_state_change_ts": last_ts,
+            }
+            for asset_id, status, last_ts in snapshot["assets"]
+        }
+        self.stage.load_state(snapshot["stage"])
+        self._seen = set(snapshot["seen"])
+        self.event_watermark = snapshot["event_watermark"]
+        self.asset_watermark = snapshot["asset_watermark"]
+
+        # State changes committed after the snapshot was written linked some of its
+        # events; they are found by primary key rather than by rescanning.
+        self.stage.discard(self.db.get_linked_event_ids(self.stage.event_ids()))
+        self.refresh()
+        self.loaded_at = self.clock.monotonic()
+        logger.info(
+            "Working set restored from snapshot",
+            extra={
+                "assets": len(self.assets),
+                "events": self.stage.held,
+                "snapshot_age_seconds": round(
+                    self.clock.time() - snapshot["written_at"]
+                ),
+            },
+        )
+
+    def _read_snapshot(self, path: str, max_age_seconds: float) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                snapshot = cbor2.load(f)
+        except FileNotFoundError:
+            return None
+        except (cbor2.CBORDecodeError, OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+            return None
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != SNAPSHOT_VERSION
+        ):
+            logger.warning("Ignoring snapshot %s with an unknown version.", path)
+            return None
+        if self.clock.time() - snapshot["written_at"] > max_age_seconds:
+            logger.info("Snapshot %s is too old to catch up; doing a full load.", path)
+            return None
+        return snapshot
@@ -0,0 +1,309 @@
+"""
+Streaming bulk import of catalogued assets from CSV or NDJSON.
+
+The body is read as it arrives and cut into records (a CSV record may span lines
+inside quotes), which are validated `chunk_rows` at a time. Each chunk's valid rows
+are COPYed into a temporary staging table and upserted into `assets` on
+`serial_number` in one transaction, so memory holds one chunk whatever the file
+size. A chunk the database refuses for its data is split in halves and retried
+until the rows at fault are found, so one bad row never fails the rest. An
+existing asset only has its catalogue fields (name, description, attributes)
+updated; its location and status belong to the custody daemon. Rejected rows are
+reported by line number.
+
+CSV files have a header row naming the `IMPORT_COLUMNS` they carry; `attributes`
+is a JSON object in a single cell.
+"""
+
+import codecs
+import csv
+import io
+import json
+import logging
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import psycopg2
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from src.database.entities.assets import AssetStatusEnum
+from src.database.entities.location import LocationNameEnum
+from src.services.metrics.collectors import ASSET_IMPORT_ROWS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = (
+    "serial_number",
+    "name",
+    "description",
+    "attributes",
+    "location",
+    "current_status",
+)
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class AssetImportRow(BaseModel):
+    serial_number: str = Field(..., min_length=1, max_length=255)
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
+    # Only used for assets that do not exist yet.
+    location: LocationNameEnum = LocationNameEnum.VAULT
+    current_status: AssetStatusEnum = AssetStatusEnum.IN_VAULT
+
+
+class ImportReport(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    errors: List[Dict[str, Any]] = []
+
+
+_CREATE_STAGING_SQL = text(
+    """
+    CREATE TEMP TABLE asset_import (
+        serial_number varchar(255),
+        name varchar(255),
+        description text,
+        attributes jsonb,
+        current_location_id uuid,
+        current_status asset_status_enum
+    ) ON COMMIT DROP
+    """
+)
+
+_COPY_SQL = "COPY asset_import FROM STDIN WITH (FORMAT csv)"
+
+_UPSERT_SQL = text(
+    """
+    INSERT INTO assets (
+        serial_number, name, description, attributes, current_location_id,
+        current_status
+    )
+    SELECT serial_number, name, description, attributes, current_location_id,
+        current_status
+    FROM asset_import
+    ON CONFLICT (serial_number) DO UPDATE
+    SET name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        attributes = EXCLUDED.attributes,
+        updated_at = now()
+    RETURNING (xmax = 0) AS inserted
+    """
+)
+
+_LOCATION_IDS_SQL = text("SELECT name::text, id::text FROM locations")
+
+
+# --- Reading the body ---
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """The body's lines, decoded as they arrive; a leading BOM is dropped."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    `(line number, row dict)` per CSV record, keyed by the header row. A record
+    ends at the first line break outside quotes: quotes inside a quoted field are
+    doubled, so that is where its quotes balance.
+    """
+    header = None
+    record, start = "", 0
+    number = 0
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+        record += line
+        if record.count('"') % 2:
+            continue
+        (values,) = list(csv.reader([record])) or [[]]
+        record = ""
+        if not any(values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            unknown = set(header) - set(IMPORT_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown CSV columns: {', '.join(sorted(unknown))}.")
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(
+                f"Expected {len(header)} fields, found {len(values)}."
+            )
+            continue
+        row = {key: value for key, value in zip(header, values) if value != ""}
+        if "attributes" in row:
+            try:
+                row["attributes"] = json.loads(row["attributes"])
+            except ValueError:
+                yield start, ValueError("attributes is not valid JSON.")
+                continue
+        yield start, row
+    if record:
+        yield start, ValueError("Unterminated quoted field.")
+
+
+async def _ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, ValueError("Not valid JSON.")
+            continue
+        if not isinstance(row, dict):
+            yield number, ValueError("Each line must be a JSON object.")
+            continue
+        yield number, row
+
+
+# --- Loading ---
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}"
+            for e in error.errors()
+        )
+    return str(error)
+
+
+def _is_row_error(error: Exception) -> bool:
+    """Whether the database refused the rows themselves (not e.g. a lost connection)."""
+    # COPY raises the driver's own errors; the upsert wraps them in SQLAlchemy's.
+    return isinstance(
+        getattr(error, "orig", error), (psycopg2.DataError, psycopg2.IntegrityError)
+    )
+
+
+def load_chunk(
+    engine: Engine, rows: List[Tuple[AssetImportRow, str]]
+) -> Tuple[int, int]:
+    """
+    Upserts validated rows (each with its location id) through COPY into a staging
+    table. Returns how many assets were inserted and how many updated.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row, location_id in rows:
+        writer.writerow(
+            [
+                row.serial_number,
+                row.name,
+                row.description,
+                json.dumps(row.attributes) if row.attributes is not None else None,
+                location_id,
+                row.current_status.value,
+            ]
+        )
+    buffer.seek(0)
+    with engine.begin() as conn:
+        conn.execute(_CREATE_STAGING_SQL)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(_COPY_SQL, buffer)
+        inserted_flags = conn.execute(_UPSERT_SQL).scalars().all()
+    inserted = sum(1 for flag in inserted_flags if flag)
+    return inserted, len(inserted_flags) - inserted
+
+
+async def import_assets(
+    engine: Engine,
+    chunks: AsyncIterator[bytes],
+    import_format: ImportFormat,
+    chunk_rows: int,
+    max_errors: int,
+) -> ImportReport:
+    """
+    Imports the assets in a CSV or NDJSON body. Raises `ValueError` if the body
+    cannot be read at all (e.g. unknown CSV columns); anything wrong with a single
+    row is reported in `errors`, up to `max_errors` of them.
+    """
+    location_ids = await run_in_threadpool(_location_ids, engine)
+    report = ImportReport()
+
+    def reject(line: int, error: Exception):
+        report.rejected += 1
+        if len(report.errors) < max_errors:
+            report.errors.append({"line": line, "error": _error_message(error)})
+
+    async def flush(entries: List[Tuple[int, AssetImportRow, str]]):
+        try:
+            inserted, updated = await run_in_threadpool(
+                load_chunk, engine, [(row, loc) for _, row, loc in entries]
+            )
+        except Exception as e:
+            if _is_row_error(e) and len(entries) > 1:
+                middle = len(entries) // 2
+                await flush(entries[:middle])
+                await flush(entries[middle:])
+                return
+            if _is_row_error(e):
+                message = str(getattr(e, "orig", e)).splitlines()[0]
+                reject(entries[0][0], ValueError(f"Database error: {message}"))
+                return
+            logger.exception("Asset import chunk failed.")
+            for line, _, _ in entries:
+                reject(line, ValueError(f"Database error: {e.__class__.__name__}"))
+            return
+        report.inserted += inserted
+        report.updated += updated
+
+    records = (_csv_records if import_format == ImportFormat.CSV else _ndjson_records)(
+        _lines(chunks)
+    )
+    # Keyed by serial number: a later row for the same asset replaces an earlier
+    # one, since one statement cannot upsert the same row twice.
+    chunk: Dict[str, Tuple[int, AssetImportRow, str]] = {}
+    async for line, record in records:
+        if isinstance(record, Exception):
+            reject(line, record)
+            continue
+        try:
+            row = AssetImportRow(**record)
+        except ValidationError as e:
+            reject(line, e)
+            continue
+        location_id = location_ids.get(row.location.value)
+        if location_id is None:
+            reject(line, ValueError(f"Location {row.location.value} does not exist."))
+            continue
+        chunk[row.serial_number] = (line, row, location_id)
+        if len(chunk) >= chunk_rows:
+            await flush(list(chunk.values()))
+            chunk = {}
+    if chunk:
+        await flush(list(chunk.values()))
+
+    ASSET_IMPORT_ROWS_TOTAL.labels("inserted").inc(report.inserted)
+    ASSET_IMPORT_ROWS_TOTAL.labels("updated").inc(report.updated)
+    ASSET_IMPORT_ROWS_TOTAL.labels("rejected").inc(report.rejected)
+    return report
+
+
+def _location_ids(engine: Engine) -> Dict[str, str]:
+    with engine.connect() as conn:
+        return dict(conn.execute(_LOCATION_IDS_SQL).all())
@@ -0,0 +1,170 @@
+"""
+Catalogue search over assets, backed by the indexes of migration 007.
+
+- `text` matches a substring of the name or description, case-insensitively,
+  through trigram (pg_trgm) GIN indexes.
+- `attributes` matches assets whose attributes contain the given JSON object
+  (`@>`), through a `jsonb_path_ops` GIN index.
+- `attribute_min`/`attribute_max` bound numeric attributes. They are checked on
+  the rows the other filters leave, so combine them with at least one indexed filter
+  on a large catalogue.
+- `statuses` and `location` filter on custody state, with composite indexes that
+  also serve the result order.
+
+Results are ordered by `serial_number` and paged by keyset: `after` is the last
+serial number of the previous page, so every page costs the same however deep it
+is. Pages are cached per query for `ASSET_SEARCH_CACHE_TTL_SECONDS`; edits made
+through this process's API clear the cache, custody changes by the daemon show up
+when entries expire.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import Float, case, func, or_, select
+from sqlalchemy.orm import Session
+
+from src.configs.core import settings
+from src.database.entities.assets import Asset, AssetStatusEnum
+from src.database.entities.location import Location, LocationNameEnum
+from src.services.metrics.collectors import (
+    ASSET_SEARCH_CACHE_TOTAL,
+    ASSET_SEARCH_SECONDS,
+)
+
+
+class AssetSearch(NamedTuple):
+    text: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
+    attribute_min: Tuple[Tuple[str, float], ...] = ()
+    attribute_max: Tuple[Tuple[str, float], ...] = ()
+    statuses: Tuple[AssetStatusEnum, ...] = ()
+    location: Optional[LocationNameEnum] = None
+    after: Optional[str] = None
+    limit: int = 50
+
+    def cache_key(self) -> Hashable:
+        return (
+            self.text.lower() if self.text else None,
+            json.dumps(self.attributes, sort_keys=True) if self.attributes else None,
+            tuple(sorted(self.attribute_min)),
+            tuple(sorted(self.attribute_max)),
+            tuple(sorted(status.value for status in self.statuses)),
+            self.location,
+            self.after,
+            self.limit,
+        )
+
+
+class SearchPage(NamedTuple):
+    items: List[Dict[str, Any]]
+    next_after: Optional[str]
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _attribute_number(key: str):
+    """`attributes->key` as a number, or NULL if it is missing or not a number."""
+    return case(
+        (
+            func.jsonb_typeof(Asset.attributes.op("->")(key)) == "number",
+            Asset.attributes.op("->>")(key).cast(Float),
+        ),
+        else_=None,
+    )
+
+
+def search_query(search: AssetSearch):
+    query = select(
+        Asset.id,
+        Asset.serial_number,
+        Asset.name,
+        Asset.current_status,
+        Location.name.label("location"),
+        Asset.attributes,
+    ).outerjoin(Location, Location.id == Asset.current_location_id)
+    if search.text:
+        pattern = _like_pattern(search.text)
+        query = query.where(
+            or_(Asset.name.ilike(pattern), Asset.description.ilike(pattern))
+        )
+    if search.attributes:
+        query = query.where(Asset.attributes.contains(search.attributes))
+    for key, minimum in search.attribute_min:
+        query = query.where(_attribute_number(key) >= minimum)
+    for key, maximum in search.attribute_max:
+        query = query.where(_attribute_number(key) <= maximum)
+    if search.statuses:
+        query = query.where(Asset.current_status.in_(search.statuses))
+    if search.location is not None:
+        query = query.where(
+            Asset.current_location_id
+            == select(Location.id)
+            .where(Location.name == search.location)
+            .scalar_subquery()
+        )
+    if search.after is not None:
+        query = query.where(Asset.serial_number > search.after)
+    # One extra row tells whether there is a next page.
+    return query.order_by(Asset.serial_number).limit(search.limit + 1)
+
+
+class SearchCache:
+    """Recent result pages by normalised query."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._pages = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[SearchPage]:
+        with self._lock:
+            return self._pages.get(key)
+
+    def put(self, key: Hashable, page: SearchPage):
+        with self._lock:
+            self._pages[key] = page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+search_cache = SearchCache(
+    ttl=settings.ASSET_SEARCH_CACHE_TTL_SECONDS,
+    maxsize=settings.ASSET_SEARCH_CACHE_SIZE,
+)
+
+
+def search_assets(db: Session, search: AssetSearch) -> SearchPage:
+    key = search.cache_key()
+    page = search_cache.get(key)
+    if page is not None:
+        ASSET_SEARCH_CACHE_TOTAL.labels("hit").inc()
+        return page
+    ASSET_SEARCH_CACHE_TOTAL.labels("miss").inc()
+
+    with ASSET_SEARCH_SECONDS.time():
+        rows = db.execute(search_query(search)).all()
+    more = len(rows) > search.limit
+    rows = rows[: search.limit]
+    page = SearchPage(
+        items=[
+            {
+                "id": row.id,
+                "serial_number": row.serial_number,
+                "name": row.name,
+                "current_status": row.current_status,
+                "location": row.location,
+                "attributes": row.attributes,
+            }
+            for row in rows
+        ],
+        next_after=rows[-1].serial_number if more else None,
+    )
+    search_cache.put(key, page)
+    return page
@@ -0,0 +1,343 @@
+"""
+Streams `asset_tracking` and `state_changes` out of the database as Arrow record
+batches, for analysts.
+
+Rows are read through a server-side cursor on a read replica when one is healthy
+(see `read_router`), `batch_rows` at a time, so memory stays bounded by one batch
+whatever the time range. The payload of a tracking event is exported as the typed
+columns of `DETAIL_COLUMNS`, read from its typed `asset_tracking` columns or
+flattened from `details` in SQL; keys outside it, and values of the wrong JSON
+type, are kept as JSON text in `details_extra`, so nothing is lost and no row's
+JSON is parsed in Python.
+
+    python -m src.services.export.history [--start ISO] [--end ISO] [--full]
+
+writes one Parquet file per table under `EXPORT_DIR`. Without `--full` (or a time
+range) only rows added since the last export are written: rows of either table
+created after the last exported `created_at`. Ids are no watermark for
+`asset_tracking`: they are reserved in blocks before commit (see
+`src/services/ingest/write_behind.py`), so a lower id can commit after a higher one
+was exported. The watermarks are kept in `EXPORT_STATE_FILE`. `state_change_id` is
+the link as of the export; events linked later are not exported again.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Select, Text, column, literal_column, select, table, text
+
+from src.configs.core import settings
+from src.database.core import read_router
+from src.services.ingest.payload import TYPED_DETAIL_FIELDS
+from src.services.metrics.collectors import EXPORT_ROWS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("asset_tracking", "state_changes")
+
+# Known keys of tracking event `details` and the column type each is exported as.
+DETAIL_COLUMNS: Dict[str, pa.DataType] = {
+    "location_name": pa.string(),
+    "location_from": pa.string(),
+    "location_to": pa.string(),
+    "direction": pa.string(),
+    "action": pa.string(),
+    "custodian_id": pa.string(),
+    "custodian_name": pa.string(),
+    "showcase_status": pa.string(),
+    "asset_id_detected": pa.string(),
+    "current_weight_kg": pa.float64(),
+    "temperature_c": pa.float64(),
+    "humidity_pct": pa.float64(),
+}
+
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+SCHEMAS = {
+    "asset_tracking": pa.schema(
+        [
+            ("id", pa.int64()),
+            ("asset_id", pa.string()),
+            ("sensor_id", pa.string()),
+            ("event_type", pa.string()),
+            ("timestamp", _TIMESTAMP),
+            ("last_seen_at", _TIMESTAMP),
+            ("repeat_count", pa.int32()),
+            ("state_change_id", pa.string()),
+            *DETAIL_COLUMNS.items(),
+            ("details_extra", pa.string()),
+            ("created_at", _TIMESTAMP),
+        ]
+    ),
+    "state_changes": pa.schema(
+        [
+            ("id", pa.string()),
+            ("asset_id", pa.string()),
+            ("event_type", pa.string()),
+            ("timestamp", _TIMESTAMP),
+            ("log_bundle_hash", pa.string()),
+            ("on_chain_tx_id", pa.string()),
+            ("created_at", _TIMESTAMP),
+        ]
+    ),
+}
+
+_asset_tracking = table(
+    "asset_tracking",
+    column("id"),
+    column("asset_id"),
+    column("sensor_id"),
+    column("event_type"),
+    column("timestamp"),
+    column("last_seen_at"),
+    column("repeat_count"),
+    column("state_change_id"),
+    column("details"),
+    column("created_at"),
+)
+_state_changes = table(
+    "state_changes",
+    column("id"),
+    column("asset_id"),
+    column("event_type"),
+    column("timestamp"),
+    column("log_bundle_hash"),
+    column("on_chain_tx_id"),
+    column("created_at"),
+)
+
+
+def _json_detail(key: str, json_type: str, cast: str) -> str:
+    return (
+        f"CASE WHEN jsonb_typeof(details -> '{key}') = '{json_type}' "
+        f"THEN (details ->> '{key}')::{cast} END"
+    )
+
+
+def _detail_column(key: str, arrow_type: pa.DataType):
+    """
+    `details->key` as a typed SQL value, or NULL if it has another JSON type. Keys
+    with a typed `asset_tracking` column are read from it first.
+    """
+    json_type = "number" if pa.types.is_floating(arrow_type) else "string"
+    cast = "float8" if json_type == "number" else "text"
+    value = _json_detail(key, json_type, cast)
+    if key in TYPED_DETAIL_FIELDS:
+        value = f"COALESCE({key}::{cast}, {value})"
+    return literal_column(value).label(key)
+
+
+def _details_extra():
+    """The rest of `details`: unknown keys and known keys of an unexpected type."""
+    mistyped = " || ".join(
+        f"CASE WHEN jsonb_typeof(details -> '{key}') NOT IN ('{json_type}', 'null') "
+        f"THEN jsonb_build_object('{key}', details -> '{key}') "
+        "ELSE '{}'::jsonb END"
+        for key, json_type in (
+            (k, "number" if pa.types.is_floating(t) else "string")
+            for k, t in DETAIL_COLUMNS.items()
+        )
+    )
+    known = ", ".join(f"'{key}'" for key in DETAIL_COLUMNS)
+    return literal_column(
+        f"NULLIF(((details - ARRAY[{known}]) || {mistyped})::text, '{{}}')"
+    ).label("details_extra")
+
+
+def export_query(
+    table_name: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after: Optional[Any] = None,
+) -> Select:
+    """
+    Rows of `table_name` with `timestamp` in [start, end), and created after the
+    incremental watermark `after`, in watermark order. An int `after` for
+    `asset_tracking` is an id watermark saved before rows had `created_at`.
+
+    Without an `end`, rows created in the last `EXPORT_SETTLE_SECONDS` are left
+    out: a transaction that is still open may commit rows with an earlier
+    `created_at`, which the next incremental export would otherwise skip.
+    """
+    if table_name == "asset_tracking":
+        t = _asset_tracking
+        query = select(
+            t.c.id,
+            t.c.asset_id.cast(Text),
+            t.c.sensor_id.cast(Text),
+            t.c.event_type,
+            t.c.timestamp,
+            t.c.last_seen_at,
+            t.c.repeat_count,
+            t.c.state_change_id.cast(Text),
+            *(_detail_column(key, type_) for key, type_ in DETAIL_COLUMNS.items()),
+            _details_extra(),
+            t.c.created_at,
+        ).order_by(t.c.created_at, t.c.id)
+    elif table_name == "state_changes":
+        t = _state_changes
+        query = select(
+            t.c.id.cast(Text),
+            t.c.asset_id.cast(Text),
+            t.c.event_type.cast(Text),
+            t.c.timestamp,
+            t.c.log_bundle_hash,
+            t.c.on_chain_tx_id,
+            t.c.created_at,
+        ).order_by(t.c.created_at, t.c.id)
+    else:
+        raise ValueError(f"Unknown table '{table_name}'. Choose one of: {TABLES}.")
+
+    if start is not None:
+        query = query.where(t.c.timestamp >= start)
+    if end is not None:
+        query = query.where(t.c.timestamp < end)
+    else:
+        query = query.where(
+            t.c.created_at
+            < text("now() - make_interval(secs => :settle)").bindparams(
+                settle=settings.EXPORT_SETTLE_SECONDS
+            )
+        )
+    if isinstance(after, int) and table_name == "asset_tracking":
+        query = query.where(t.c.id > after)
+    elif after is not None:
+        query = query.where(t.c.created_at > after)
+    return query
+
+
+def stream_batches(
+    table_name: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after: Optional[Any] = None,
+    batch_rows: int = settings.EXPORT_BATCH_ROWS,
+) -> Iterator[pa.RecordBatch]:
+    """Yields the rows of `export_query` as record batches of up to `batch_rows`."""
+    schema = SCHEMAS[table_name]
+    query = export_query(table_name, start, end, after)
+    engine = read_router.engine_for_read()
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=batch_rows
+        ).execute(query)
+        for rows in result.partitions(batch_rows):
+            batch = pa.RecordBatch.from_arrays(
+                [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*rows), schema)
+                ],
+                schema=schema,
+            )
+            EXPORT_ROWS_TOTAL.labels(table_name).inc(batch.num_rows)
+            yield batch
+
+
+def _watermark(table_name: str, batch: pa.RecordBatch) -> Any:
+    """The incremental watermark after `batch`, i.e. its last row's `created_at`."""
+    return batch.column("created_at")[-1].as_py().isoformat()
+
+
+# --- Incremental Parquet export ---
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_parquet(
+    table_name: str,
+    out_dir: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    after: Optional[Any] = None,
+    batch_rows: int = settings.EXPORT_BATCH_ROWS,
+) -> Tuple[Optional[str], int, Any]:
+    """
+    Writes the rows of `export_query` to a new Parquet file under
+    `out_dir/table_name`, one row group per batch. Returns the file (None if there
+    were no rows), the row count and the watermark after the last row.
+    """
+    table_dir = os.path.join(out_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(table_dir, f"{table_name}-{stamp}.parquet")
+    tmp_path = f"{path}.tmp"
+
+    rows, watermark, writer = 0, after, None
+    try:
+        for batch in stream_batches(table_name, start, end, after, batch_rows):
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    tmp_path, SCHEMAS[table_name], compression="zstd"
+                )
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            watermark = _watermark(table_name, batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return None, 0, watermark
+    # Readers never see a half-written file.
+    os.replace(tmp_path, path)
+    return path, rows, watermark
+
+
+def main(args: argparse.Namespace) -> List[Tuple[str, Optional[str], int]]:
+    incremental = not (args.full or args.start or args.end)
+    state = load_state(settings.EXPORT_STATE_FILE) if incremental else {}
+    written = []
+    for table_name in args.tables:
+        after = state.get(table_name)
+        if isinstance(after, str):
+            after = datetime.datetime.fromisoformat(after)
+        path, rows, watermark = export_parquet(
+            table_name,
+            settings.EXPORT_DIR,
+            start=args.start,
+            end=args.end,
+            after=after,
+            batch_rows=args.batch_rows,
+        )
+        logger.info("Exported %d rows of %s to %s", rows, table_name, path)
+        written.append((table_name, path, rows))
+        if incremental and watermark is not None:
+            state[table_name] = watermark
+            save_state(settings.EXPORT_STATE_FILE, state)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export tracking and state-change history to Parquet."
+    )
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Export everything instead of only what is new since the last export.",
+    )
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES))
+    parser.add_argument("--batch-rows", type=int, default=settings.EXPORT_BATCH_ROWS)
+    logging.basicConfig(level=logging.INFO)
+    for table_name, path, rows in main(parser.parse_args()):
+        print(f"  {table_name:<16} {rows:>10} rows  {path or '-'}")
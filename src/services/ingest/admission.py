@@ -0,0 +1,247 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+from cachetools import TTLCache
+
+from src.configs.core import settings
+from src.database.core import engine
+from src.services.metrics.collectors import (
+    INGEST_ADMISSION_REJECTED_TOTAL,
+    INGEST_IN_FLIGHT,
+)
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RequestTooLarge(AdmissionRejected):
+    """The request costs more than its bucket can ever hold; retrying cannot help."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason, 0)
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `burst`. Not thread-safe by itself."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float, reserve: float = 0) -> float:
+        """
+        Takes `cost` tokens if that leaves at least `reserve`, and returns 0;
+        otherwise takes nothing and returns the seconds until it would succeed.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = cost + reserve - self.tokens
+        if missing <= 0:
+            self.tokens -= cost
+            return 0.0
+        return missing / self.rate
+
+
+class AdmissionController:
+    """
+    Decides whether an ingestion request is served or shed with a 429 before it
+    reaches the database.
+
+    - Every sensor and every gateway has a token bucket, so one faulty sensor or
+      misbehaving gateway cannot take more than its rate.
+    - At most `max_in_flight` requests are served at once, which is sized to the
+      database pool: a request beyond it would only queue for a connection.
+    - Priority sensor types (custody events) can use all of that capacity and all
+      of a gateway's bucket. Other types are limited to `normal_share` of both and
+      are shed first once the database pool is more than `normal_share` checked out.
+      A frame's priority and normal readings are charged separately, so a priority
+      reading gets its own readings through but never carries the rest along.
+    """
+
+    def __init__(
+        self,
+        sensor_rate: float,
+        sensor_burst: float,
+        gateway_rate: float,
+        gateway_burst: float,
+        max_in_flight: int,
+        priority_sensor_types: Iterable[str],
+        normal_share: float,
+        pool_usage: Callable[[], float],
+        maxsize: int = 100_000,
+    ):
+        self.sensor_rate = sensor_rate
+        self.sensor_burst = sensor_burst
+        self.gateway_rate = gateway_rate
+        self.gateway_burst = gateway_burst
+        self.max_in_flight = max_in_flight
+        self.priority_sensor_types = frozenset(priority_sensor_types)
+        self.normal_share = normal_share
+        self.pool_usage = pool_usage
+        # An idle bucket refills completely, so forgetting it changes nothing.
+        self._sensors = TTLCache(maxsize=maxsize, ttl=sensor_burst / sensor_rate)
+        self._gateways = TTLCache(maxsize=maxsize, ttl=gateway_burst / gateway_rate)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        INGEST_IN_FLIGHT.set_function(lambda: self._in_flight)
+
+    def is_priority(self, sensor_type: Optional[str]) -> bool:
+        return sensor_type in self.priority_sensor_types
+
+    @property
+    def max_normal_cost(self) -> float:
+        """The most normal readings a single request can ever be admitted with."""
+        return self.normal_share * self.gateway_burst
+
+    def acquire(
+        self,
+        gateway: str,
+        sensor: Optional[str] = None,
+        sensor_type: Optional[str] = None,
+        priority: Optional[bool] = None,
+        cost: int = 1,
+    ):
+        """
+        Charges `cost` tokens to the gateway (and one to the sensor, if given) and
+        takes a concurrency slot, to be given back with `release`. Raises
+        `AdmissionRejected` without waiting if the request is not admitted.
+        """
+        if priority is None:
+            priority = self.is_priority(sensor_type)
+        self.acquire_mixed(
+            gateway,
+            priority_cost=cost if priority else 0,
+            normal_cost=0 if priority else cost,
+            sensor=sensor,
+        )
+
+    def acquire_mixed(
+        self,
+        gateway: str,
+        priority_cost: int,
+        normal_cost: int,
+        sensor: Optional[str] = None,
+    ) -> bool:
+        """
+        Admits a request carrying `priority_cost` priority and `normal_cost` normal
+        readings, e.g. a frame, like `acquire`. Returns whether the normal readings
+        are admitted too; when they are over their share only the priority ones
+        are, and the caller must drop the rest. Raises `AdmissionRejected` if
+        nothing is admitted, and `RequestTooLarge` if the request could never be.
+        """
+        if (
+            priority_cost + normal_cost > self.gateway_burst
+            or normal_cost > self.max_normal_cost
+        ):
+            self._count_rejection("too_large", priority_cost)
+            raise RequestTooLarge("too_large")
+        now = time.monotonic()
+        try:
+            with self._lock:
+                if sensor is not None:
+                    wait = self._bucket(self._sensors, sensor, now).take(1, now)
+                    if wait:
+                        raise AdmissionRejected("sensor_rate", wait)
+                if normal_cost:
+                    try:
+                        self._admit(gateway, priority_cost, normal_cost, now)
+                        return True
+                    except AdmissionRejected as e:
+                        if not priority_cost:
+                            raise
+                        # Only the normal readings are shed.
+                        self._count_rejection(e.reason, 0)
+                self._admit(gateway, priority_cost, 0, now)
+                return False
+        except AdmissionRejected as e:
+            self._count_rejection(e.reason, priority_cost)
+            raise
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextmanager
+    def admit(self, gateway: str, **kwargs) -> Iterator[None]:
+        """`acquire` for the duration of the block."""
+        self.acquire(gateway, **kwargs)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def allow_sensor(self, sensor: str) -> bool:
+        """Charges one reading to a sensor's bucket, for readings inside a frame."""
+        now = time.monotonic()
+        with self._lock:
+            admitted = not self._bucket(self._sensors, sensor, now).take(1, now)
+        if not admitted:
+            INGEST_ADMISSION_REJECTED_TOTAL.labels("sensor_rate", "frame").inc()
+        return admitted
+
+    def _admit(self, gateway: str, priority_cost: int, normal_cost: int, now: float):
+        """Takes a slot and the gateway's tokens for the readings. Holds the lock."""
+        share = self.normal_share if normal_cost else 1.0
+        if self._in_flight >= self.max_in_flight * share:
+            raise AdmissionRejected("concurrency", 1)
+        if normal_cost and self.pool_usage() > share:
+            raise AdmissionRejected("database", 1)
+        # Normal readings must leave `reserve` tokens; priority ones may use them.
+        reserve = (1 - share) * self.gateway_burst
+        wait = self._bucket(self._gateways, gateway, now).take(
+            priority_cost + normal_cost, now, reserve=max(reserve - priority_cost, 0)
+        )
+        if wait:
+            raise AdmissionRejected("gateway_rate", wait)
+        self._in_flight += 1
+
+    def _count_rejection(self, reason: str, priority_cost: int):
+        INGEST_ADMISSION_REJECTED_TOTAL.labels(
+            reason, "priority" if priority_cost else "normal"
+        ).inc()
+
+    def _bucket(self, buckets: TTLCache, key: str, now: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if buckets is self._sensors:
+                bucket = TokenBucket(self.sensor_rate, self.sensor_burst, now)
+            else:
+                bucket = TokenBucket(self.gateway_rate, self.gateway_burst, now)
+        # Re-inserting refreshes the entry's TTL while the bucket is in use.
+        buckets[key] = bucket
+        return bucket
+
+
+def _pool_usage() -> float:
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return engine.pool.checkedout() / capacity if capacity else 0.0
+
+
+admission_controller = (
+    AdmissionController(
+        sensor_rate=settings.INGEST_SENSOR_RATE_PER_SECOND,
+        sensor_burst=settings.INGEST_SENSOR_BURST,
+        gateway_rate=settings.INGEST_GATEWAY_RATE_PER_SECOND,
+        gateway_burst=settings.INGEST_GATEWAY_BURST,
+        max_in_flight=settings.INGEST_MAX_IN_FLIGHT
+        or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        priority_sensor_types=settings.INGEST_PRIORITY_SENSOR_TYPES,
+        normal_share=settings.INGEST_NORMAL_PRIORITY_SHARE,
+        pool_usage=_pool_usage,
+    )
+    if settings.INGEST_ADMISSION_ENABLED
+    else None
+)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+
+def coalesce_key(
+    sensor_id: Any,
+    subject_id: Any,
+    event_type: str,
+    details: Optional[Dict[str, Any]],
+) -> Tuple[Hashable, ...]:
+    """
+    Identifies "the same read": one sensor seeing one asset (or custodian) with an
+    identical payload. A different weight or direction starts a new row.
+    """
+    payload = json.dumps(details or {}, sort_keys=True, default=str)
+    digest = hashlib.blake2b(payload.encode(), digest_size=8).digest()
+    return (str(sensor_id), str(subject_id), event_type, digest)
+
+
+class BurstCoalescer:
+    """
+    Remembers the row each recent sensor read was written to, so repeats that arrive
+    within the sensor type's debounce window can be folded into that row instead of
+    inserting a new one. The window slides: every repeat extends the burst.
+
+    Entries live in a bounded TTL cache, so memory stays flat regardless of how many
+    sensors and assets are active.
+    """
+
+    def __init__(self, windows_ms: Dict[str, int], maxsize: int = 100_000):
+        self.windows = {
+            sensor_type: window / 1000 for sensor_type, window in windows_ms.items()
+        }
+        ttl = max(self.windows.values(), default=0) or 1
+        self._reads = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._idempotency_keys = TTLCache(maxsize=maxsize, ttl=3600)
+        self._lock = threading.Lock()
+
+    def window_for(self, sensor_type: str) -> float:
+        return self.windows.get(sensor_type, 0)
+
+    def lookup(self, key: Tuple, sensor_type: str, now: float) -> Optional[int]:
+        """Returns the id of the row this read repeats, if its burst is still open."""
+        window = self.window_for(sensor_type)
+        if window <= 0:
+            return None
+        with self._lock:
+            entry = self._reads.get(key)
+        if entry is None:
+            return None
+        row_id, last_seen, _ = entry
+        return row_id if now - last_seen <= window else None
+
+    def extend(
+        self, key: Tuple, sensor_type: str, now: float
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Folds a read into its open burst, if there is one. Returns the burst's row id
+        and how many reads the row now holds; concurrent repeats each get their own
+        count, so it can be written as an absolute value.
+        """
+        window = self.window_for(sensor_type)
+        if window <= 0:
+            return None
+        with self._lock:
+            entry = self._reads.get(key)
+            if entry is None or now - entry[1] > window:
+                return None
+            row_id, _, reads = entry
+            self._reads[key] = (row_id, now, reads + 1)
+        return row_id, reads + 1
+
+    def remember(
+        self, key: Tuple, sensor_type: str, row_id: int, now: float, reads: int = 1
+    ):
+        if self.window_for(sensor_type) <= 0:
+            return
+        with self._lock:
+            self._reads[key] = (row_id, now, reads)
+
+    def forget(self, key: Tuple):
+        with self._lock:
+            self._reads.pop(key, None)
+
+    def lookup_idempotency_key(self, idempotency_key: str) -> Optional[int]:
+        with self._lock:
+            return self._idempotency_keys.get(idempotency_key)
+
+    def remember_idempotency_key(self, idempotency_key: str, row_id: int):
+        with self._lock:
+            self._idempotency_keys[idempotency_key] = row_id
@@ -0,0 +1,177 @@
+"""
+Binary ingestion frames for sensor gateways.
+
+A frame is one CBOR array carrying many readings; sensors and assets are referenced
+by their `short_id` instead of names, serial numbers or UUIDs:
+
+    [version, base_timestamp_ms, [reading, ...]]
+    reading = [sensor_short_id, asset_short_id | null, offset_ms, details | null]
+
+Each reading's timestamp is `base_timestamp_ms + offset_ms` (Unix epoch, UTC), so
+readings from one flush of a gateway cost a few bytes of time each.
+"""
+
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import cbor2
+
+from src.services.ingest.payload import split_details
+from src.services.ingest.registry import AssetInfo, SensorInfo
+
+FRAME_VERSION = 1
+CONTENT_TYPE = "application/cbor"
+
+# Sensor types whose readings must reference an asset.
+ASSET_SCAN_SENSOR_TYPES = ("RFID_GATE", "SMART_SHOWCASE", "NFC_READER")
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# The latest timestamp a datetime holds, in milliseconds since the epoch.
+_MAX_TIMESTAMP_MS = (
+    datetime.datetime.max.replace(tzinfo=datetime.timezone.utc) - _EPOCH
+) // datetime.timedelta(milliseconds=1)
+
+
+class FrameError(ValueError):
+    """The frame itself is malformed; none of its readings can be used."""
+
+
+class Reading(NamedTuple):
+    sensor: int
+    asset: Optional[int]
+    timestamp_ms: int
+    details: Optional[Dict[str, Any]]
+
+
+def encode_frame(readings: Iterable[Reading]) -> bytes:
+    """Packs readings into a frame, relative to the earliest timestamp."""
+    readings = list(readings)
+    base = min((r.timestamp_ms for r in readings), default=0)
+    return cbor2.dumps(
+        [
+            FRAME_VERSION,
+            base,
+            [[r.sensor, r.asset, r.timestamp_ms - base, r.details] for r in readings],
+        ]
+    )
+
+
+def decode_frame(payload: bytes) -> List[Reading]:
+    try:
+        frame = cbor2.loads(payload)
+    except (cbor2.CBORDecodeError, ValueError) as e:
+        raise FrameError(f"Payload is not valid CBOR: {e}") from None
+    return parse_frame(frame)
+
+
+def parse_frame(frame: Any) -> List[Reading]:
+    """Validates an already-decoded frame (e.g. one embedded in a larger message)."""
+    if not isinstance(frame, list) or len(frame) != 3:
+        raise FrameError("A frame must be [version, base_timestamp_ms, readings].")
+    version, base, readings = frame
+    if version != FRAME_VERSION:
+        raise FrameError(
+            f"Unsupported frame version {version!r}; expected {FRAME_VERSION}."
+        )
+    if not _is_int(base) or not isinstance(readings, list):
+        raise FrameError("A frame must be [version, base_timestamp_ms, readings].")
+    parsed = []
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, list) or len(reading) != 4:
+            raise FrameError(
+                "Each reading must be [sensor_short_id, asset_short_id, offset_ms, "
+                "details]."
+            )
+        sensor, asset, offset, details = reading
+        if not _is_int(sensor) or not (asset is None or _is_int(asset)):
+            raise FrameError(f"Reading {index}: short ids must be integers.")
+        if not _is_int(offset):
+            raise FrameError(f"Reading {index}: offset_ms must be an integer.")
+        if not 0 <= base + offset <= _MAX_TIMESTAMP_MS:
+            raise FrameError(f"Reading {index}: timestamp out of range.")
+        parsed.append(Reading(sensor, asset, base + offset, details))
+    return parsed
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _event_type(sensor_type: str, reading: Reading) -> str:
+    """The `asset_tracking.event_type` of a reading, mirroring the JSON endpoint."""
+    details = reading.details or {}
+    if sensor_type in ASSET_SCAN_SENSOR_TYPES:
+        if reading.asset is None:
+            raise ValueError("this sensor type requires an asset")
+        return f"{sensor_type}_SCAN"
+    if sensor_type == "BIOMETRIC_SCANNER":
+        if "custodian_id" not in details:
+            raise ValueError("biometric readings require details.custodian_id")
+        return (
+            "BIOMETRIC_SUCCESS"
+            if details.get("scan_successful", True)
+            else "BIOMETRIC_FAILURE"
+        )
+    if sensor_type == "ENVIRONMENTAL":
+        if not reading.details:
+            raise ValueError("environmental readings require details")
+        return "ENV_READING"
+    return f"{sensor_type}_DETECTED"
+
+
+def build_rows(
+    readings: List[Reading],
+    sensors: Dict[int, SensorInfo],
+    assets: Dict[int, AssetInfo],
+    allow: Optional[Callable[[SensorInfo], bool]] = None,
+    in_maintenance: Optional[Callable[[SensorInfo], bool]] = None,
+    shed: Optional[Callable[[SensorInfo], bool]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Turns decoded readings into `asset_tracking` rows. Readings that reference an
+    unknown sensor or asset, or lack what their sensor type needs, are returned as
+    rejections (`index` and `reason`) instead of failing the whole frame. So are
+    readings from a sensor `in_maintenance`, readings admission control `shed`,
+    and readings whose sensor `allow` (e.g. a rate limiter) turns down.
+    """
+    rows = []
+    rejected = []
+    for index, reading in enumerate(readings):
+        sensor = sensors.get(reading.sensor)
+        if sensor is None:
+            rejected.append({"index": index, "reason": "unknown sensor"})
+            continue
+        if in_maintenance is not None and in_maintenance(sensor):
+            rejected.append({"index": index, "reason": "sensor in maintenance"})
+            continue
+        if shed is not None and shed(sensor):
+            rejected.append({"index": index, "reason": "shed under load"})
+            continue
+        if allow is not None and not allow(sensor):
+            rejected.append({"index": index, "reason": "sensor rate limited"})
+            continue
+        asset = None
+        if reading.asset is not None:
+            asset = assets.get(reading.asset)
+            if asset is None:
+                rejected.append({"index": index, "reason": "unknown asset"})
+                continue
+        if reading.details is not None and not isinstance(reading.details, dict):
+            rejected.append({"index": index, "reason": "details must be a map"})
+            continue
+        try:
+            event_type = _event_type(sensor.sensor_type, reading)
+        except ValueError as e:
+            rejected.append({"index": index, "reason": str(e)})
+            continue
+        rows.append(
+            {
+                "asset_id": asset.id if asset else None,
+                "sensor_id": sensor.id,
+                "event_type": event_type,
+                **split_details(reading.details),
+                "timestamp": _EPOCH
+                + datetime.timedelta(milliseconds=reading.timestamp_ms),
+            }
+        )
+    return rows, rejected
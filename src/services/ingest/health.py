@@ -0,0 +1,195 @@
+import datetime
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import String, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.engine import Engine
+
+from src.configs.core import settings
+from src.database.core import engine
+from src.services.ingest.registry import SensorInfo
+from src.services.metrics.collectors import (
+    SENSOR_HEALTH_FLUSH_SECONDS,
+    SENSOR_HEARTBEATS_TOTAL,
+    SENSOR_STATUS_CHANGES_TOTAL,
+    SENSORS_BY_STATUS,
+)
+
+logger = logging.getLogger(__name__)
+
+SENSOR_STATUSES = ("ONLINE", "OFFLINE", "MAINTENANCE")
+
+_RECORD_SIGHTINGS_SQL = text(
+    """
+    UPDATE sensors AS s
+    SET last_seen_at = GREATEST(s.last_seen_at, b.seen_at)
+    FROM unnest(CAST(:sensor_ids AS uuid[]), CAST(:seen_at AS timestamptz[]))
+        AS b(sensor_id, seen_at)
+    WHERE s.id = b.sensor_id
+    """
+)
+
+# Silence is judged on `last_seen_at`, the latest sighting any API process has
+# flushed, so a sensor whose readings all reach another process stays ONLINE.
+# MAINTENANCE is only ever set and cleared by an operator.
+_UPDATE_STATUSES_SQL = text(
+    """
+    WITH back AS (
+        UPDATE sensors SET status = 'ONLINE'
+        WHERE status = 'OFFLINE'
+            AND last_seen_at >= now() - make_interval(secs => :offline_after)
+        RETURNING id, status
+    ), silent AS (
+        UPDATE sensors SET status = 'OFFLINE'
+        WHERE status = 'ONLINE'
+            AND COALESCE(last_seen_at, installed_at, '-infinity')
+                < now() - make_interval(secs => :offline_after)
+        RETURNING id, status
+    )
+    INSERT INTO sensor_status_log (sensor_id, status)
+    SELECT id, status FROM back
+    UNION ALL
+    SELECT id, status FROM silent
+    RETURNING sensor_id, status::text
+    """
+).columns(sensor_id=PG_UUID(as_uuid=True), status=String)
+
+_SENSOR_STATUSES_SQL = text("SELECT id, status::text FROM sensors").columns(
+    id=PG_UUID(as_uuid=True), status=String
+)
+
+
+class SensorHealthTable:
+    """
+    Sensor liveness, kept in memory so heartbeats never touch `asset_tracking` or
+    the database on the request path.
+
+    Heartbeats and accepted readings record when each sensor was last heard from.
+    Every `flush_interval` seconds a background thread writes those sightings to
+    `sensors.last_seen_at` in one statement, moves sensors silent for longer than
+    `offline_after` seconds to OFFLINE (a sensor never heard from counts as silent
+    since it was installed) and heard-from OFFLINE sensors back to ONLINE, appends
+    each such change to `sensor_status_log`, and reloads every sensor's status, so
+    one set to MAINTENANCE elsewhere is known here within a flush without a query
+    per event.
+    """
+
+    def __init__(self, engine: Engine, flush_interval: float, offline_after: float):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.offline_after = offline_after
+        self._sightings: Dict[UUID, datetime.datetime] = {}
+        self._statuses: Dict[UUID, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for status in SENSOR_STATUSES:
+            SENSORS_BY_STATUS.labels(status).set_function(
+                lambda status=status: Counter(self._statuses.values())[status]
+            )
+
+    # --- Public API ---
+
+    def start(self):
+        try:
+            self._load_statuses()
+        except Exception:
+            logger.exception("Could not load sensor statuses; retrying on flush.")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._flusher, name="sensor-health-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stops the flusher and writes the sightings it has not flushed yet."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final sensor health flush failed.")
+
+    def beat(
+        self, sensor_ids: Iterable[UUID], seen_at: Optional[datetime.datetime] = None
+    ):
+        """Records that the sensors were heard from at `seen_at` (default: now)."""
+        seen_at = seen_at or datetime.datetime.now(datetime.timezone.utc)
+        count = 0
+        with self._lock:
+            for sensor_id in sensor_ids:
+                previous = self._sightings.get(sensor_id)
+                if previous is None or seen_at > previous:
+                    self._sightings[sensor_id] = seen_at
+                count += 1
+        SENSOR_HEARTBEATS_TOTAL.inc(count)
+
+    def status(self, sensor: SensorInfo) -> str:
+        """The sensor's status as of the last flush, or as the registry cached it."""
+        return self._statuses.get(sensor.id, sensor.status)
+
+    def in_maintenance(self, sensor: SensorInfo) -> bool:
+        return self.status(sensor) == "MAINTENANCE"
+
+    def flush(self) -> List[Tuple[UUID, str]]:
+        """Writes pending sightings and status changes. Returns the changes."""
+        with self._lock:
+            sightings, self._sightings = self._sightings, {}
+        try:
+            with SENSOR_HEALTH_FLUSH_SECONDS.time(), self.engine.begin() as conn:
+                if sightings:
+                    conn.execute(
+                        _RECORD_SIGHTINGS_SQL,
+                        {
+                            "sensor_ids": [str(s) for s in sightings],
+                            "seen_at": list(sightings.values()),
+                        },
+                    )
+                changes = conn.execute(
+                    _UPDATE_STATUSES_SQL, {"offline_after": self.offline_after}
+                ).all()
+        except Exception:
+            # Keep the sightings for the next flush, unless newer ones replaced them.
+            with self._lock:
+                for sensor_id, seen_at in sightings.items():
+                    self._sightings.setdefault(sensor_id, seen_at)
+            raise
+        for sensor_id, status in changes:
+            SENSOR_STATUS_CHANGES_TOTAL.labels(status).inc()
+            logger.info(
+                "Sensor status changed",
+                extra={"sensor_id": str(sensor_id), "status": status},
+            )
+        self._load_statuses()
+        return changes
+
+    # --- Internals ---
+
+    def _load_statuses(self):
+        with self.engine.connect() as conn:
+            statuses = dict(conn.execute(_SENSOR_STATUSES_SQL).all())
+        # Replaced whole, so readers never see a half-updated table.
+        self._statuses = statuses
+
+    def _flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(
+                    "Sensor health flush failed; retrying.",
+                    extra={"rate_limited": True},
+                )
+
+
+sensor_health = SensorHealthTable(
+    engine,
+    flush_interval=settings.SENSOR_HEALTH_FLUSH_SECONDS,
+    offline_after=settings.SENSOR_OFFLINE_AFTER_SECONDS,
+)
@@ -0,0 +1,105 @@
+"""
+Typed storage for the known fields of tracking event `details`.
+
+Most readings carry the same handful of keys (scan direction and locations,
+custodian auth, weight and environmental readings). They are stored in typed
+`asset_tracking` columns instead of being repeated in every row's JSONB; `details`
+keeps only the rest. `split_details` does this at ingest and `merge_details` puts
+the original payload back together on read.
+
+A value is only moved to its column if it reads back exactly as it was written:
+`log_bundle_hash` covers `details` as loaded from JSONB, so the merged payload
+must be the same dict, in the same key order, as before. Anything else (a number
+where a string is expected, an int weight, a non-canonical UUID, ...) stays in
+`details`. Rows written before the typed columns, or by writers that do not split,
+read back the same way.
+"""
+
+import math
+import uuid
+from typing import Any, Dict, Optional
+
+# details key -> (kind, max length for strings). Each key is an `asset_tracking`
+# column of the same name.
+TYPED_DETAIL_FIELDS = {
+    "direction": ("str", 10),
+    "location_name": ("str", 50),
+    "location_from": ("str", 50),
+    "location_to": ("str", 50),
+    "action": ("str", 50),
+    "custodian_id": ("uuid", None),
+    "custodian_name": ("str", 255),
+    "showcase_status": ("str", 20),
+    "current_weight_kg": ("float", None),
+    "temperature_c": ("float", None),
+    "humidity_pct": ("float", None),
+}
+
+
+def _fits(kind: str, max_length: Optional[int], value: Any) -> bool:
+    if kind == "str":
+        return isinstance(value, str) and len(value) <= max_length
+    if kind == "float":
+        # JSONB keeps numbers as numeric: 1e16 reads back as an int, -0.0 as 0.0.
+        return (
+            type(value) is float
+            and math.isfinite(value)
+            and "e" not in repr(value)
+            and not (value == 0 and math.copysign(1, value) < 0)
+        )
+    if kind == "uuid":
+        try:
+            return isinstance(value, str) and str(uuid.UUID(value)) == value
+        except ValueError:
+            return False
+    raise ValueError(f"Unknown detail kind '{kind}'")
+
+
+def split_details(details: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The `asset_tracking` column values for a reading's `details`: every typed
+    field (None where the reading does not carry it), plus `details` with the
+    remaining keys. Rows of one bulk insert must all have the same keys: a Core
+    executemany takes its columns from the first row.
+    """
+    columns = {key: None for key in TYPED_DETAIL_FIELDS}
+    if details is None:
+        columns["details"] = None
+        return columns
+    rest = {}
+    for key, value in details.items():
+        field = TYPED_DETAIL_FIELDS.get(key)
+        if field is not None and _fits(*field, value):
+            columns[key] = value
+        else:
+            rest[key] = value
+    # An empty dict rather than NULL, so the payload reads back as a dict.
+    columns["details"] = rest
+    return columns
+
+
+def split_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """`row` with its `details` split into the typed columns."""
+    return {**row, **split_details(row.get("details"))}
+
+
+def merge_details(event) -> Optional[Dict[str, Any]]:
+    """
+    The `details` a reading was ingested with, from an `AssetTracking` object or a
+    row with its columns. Keys are in JSONB order (shortest first, then bytewise),
+    as if the whole payload had been loaded from JSONB.
+    """
+    rest = event.details
+    if rest is None:
+        return None
+    merged = dict(rest)
+    for key in TYPED_DETAIL_FIELDS:
+        value = getattr(event, key)
+        if value is not None:
+            merged[key] = str(value) if isinstance(value, uuid.UUID) else value
+    if len(merged) == len(rest):
+        return rest
+    return {
+        key: merged[key]
+        for key in sorted(merged, key=lambda k: (len(k.encode()), k.encode()))
+    }
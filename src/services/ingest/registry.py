@@ -0,0 +1,131 @@
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional
+from uuid import UUID
+
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+
+from src.database.entities.assets import Asset
+from src.database.entities.sensor import Sensor
+
+
+class SensorInfo(NamedTuple):
+    id: UUID
+    name: str
+    sensor_type: str
+    location_id: UUID
+    status: str
+    short_id: int
+
+
+class AssetInfo(NamedTuple):
+    id: UUID
+    serial_number: str
+    short_id: int
+
+
+def _sensor_info(sensor: Sensor) -> SensorInfo:
+    return SensorInfo(
+        id=sensor.id,
+        name=sensor.name,
+        sensor_type=getattr(sensor.sensor_type, "value", sensor.sensor_type),
+        location_id=sensor.location_id,
+        status=getattr(sensor.status, "value", sensor.status),
+        short_id=sensor.short_id,
+    )
+
+
+def _asset_info(asset: Asset) -> AssetInfo:
+    return AssetInfo(
+        id=asset.id, serial_number=asset.serial_number, short_id=asset.short_id
+    )
+
+
+class IngestRegistry:
+    """
+    Read-through cache of the sensor and asset rows ingestion validates against, so
+    a burst of events costs one lookup per sensor and asset instead of one per event.
+    Entries expire after `ttl` seconds to pick up edits made elsewhere.
+    """
+
+    def __init__(self, ttl: float = 60, maxsize: int = 100_000):
+        self._sensors = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._assets = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._sensors_by_short_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._assets_by_short_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def sensor_by_name(self, db: Session, name: str) -> Optional[SensorInfo]:
+        with self._lock:
+            cached = self._sensors.get(name)
+        if cached is not None:
+            return cached
+        sensor = db.query(Sensor).filter(Sensor.name == name).first()
+        if sensor is None:
+            return None
+        info = _sensor_info(sensor)
+        with self._lock:
+            self._sensors[name] = info
+        return info
+
+    def asset_by_serial(self, db: Session, serial_number: str) -> Optional[AssetInfo]:
+        with self._lock:
+            cached = self._assets.get(serial_number)
+        if cached is not None:
+            return cached
+        asset = db.query(Asset).filter(Asset.serial_number == serial_number).first()
+        if asset is None:
+            return None
+        info = _asset_info(asset)
+        with self._lock:
+            self._assets[serial_number] = info
+        return info
+
+    def sensors_by_short_ids(
+        self, db: Session, short_ids: Iterable[int]
+    ) -> Dict[int, SensorInfo]:
+        """Resolves a batch of sensor short ids with at most one query."""
+        return self._resolve_short_ids(
+            db, short_ids, self._sensors_by_short_id, Sensor, _sensor_info
+        )
+
+    def assets_by_short_ids(
+        self, db: Session, short_ids: Iterable[int]
+    ) -> Dict[int, AssetInfo]:
+        """Resolves a batch of asset short ids with at most one query."""
+        return self._resolve_short_ids(
+            db, short_ids, self._assets_by_short_id, Asset, _asset_info
+        )
+
+    def cached_sensors_by_short_ids(
+        self, short_ids: Iterable[int]
+    ) -> Dict[int, SensorInfo]:
+        """The sensors already in the cache, without querying for the rest."""
+        with self._lock:
+            return {
+                short_id: info
+                for short_id in set(short_ids)
+                if (info := self._sensors_by_short_id.get(short_id)) is not None
+            }
+
+    def _resolve_short_ids(self, db, short_ids, cache, entity, to_info):
+        # Callers pass generators, so the ids are read exactly once.
+        short_ids = set(short_ids)
+        found = {}
+        with self._lock:
+            for short_id in short_ids:
+                info = cache.get(short_id)
+                if info is not None:
+                    found[short_id] = info
+        missing = short_ids - found.keys()
+        if missing:
+            rows = db.query(entity).filter(entity.short_id.in_(missing)).all()
+            with self._lock:
+                for row in rows:
+                    info = to_info(row)
+                    cache[info.short_id] = info
+                    found[info.short_id] = info
+        return found
+
+
+ingest_registry = IngestRegistry()
@@ -0,0 +1,472 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src.configs.core import settings
+from src.database.core import engine
+from src.database.entities.asset_tracking import AssetTracking
+from src.services.ingest.payload import TYPED_DETAIL_FIELDS
+from src.services.metrics.collectors import (
+    INGEST_FLUSH_ROWS,
+    INGEST_FLUSH_SECONDS,
+    INGEST_WRITE_BEHIND_BACKLOG,
+    INGEST_WRITE_BEHIND_DROPPED_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PATTERN = "segment-*.log"
+_QUARANTINE_FILE = "quarantine.jsonl"
+
+
+class IdAllocator:
+    """
+    Hands out `asset_tracking.id` values reserved from the table's sequence in
+    blocks, so an event has its final id before it reaches the database and the
+    request can be acknowledged with it.
+    """
+
+    def __init__(self, engine: Engine, block_size: int):
+        self.engine = engine
+        self.block_size = block_size
+        self._ids: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return self.next_ids(1)[0]
+
+    def next_ids(self, count: int) -> List[int]:
+        with self._lock:
+            if len(self._ids) < count:
+                with self.engine.connect() as conn:
+                    rows = conn.execute(
+                        text(
+                            "SELECT nextval(pg_get_serial_sequence('asset_tracking', 'id')) "
+                            "FROM generate_series(1, :n)"
+                        ),
+                        {"n": max(self.block_size, count - len(self._ids))},
+                    ).scalars()
+                    self._ids.extend(rows)
+            return [self._ids.popleft() for _ in range(count)]
+
+
+class _Segment:
+    __slots__ = ("seq", "path", "appended", "committed", "sealed")
+
+    def __init__(self, seq: int, path: str):
+        self.seq = seq
+        self.path = path
+        self.appended = 0
+        self.committed = 0
+        self.sealed = False
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledges ingested events as soon as they are durable in a local append-only
+    log, and group-commits them to `asset_tracking` from a background thread.
+
+    Appending is itself group-committed: request threads hand their record to a log
+    writer thread, which writes everything pending in one `write` + `fsync` and then
+    wakes all of those requests at once. The flusher drains durable records in
+    batches of up to `flush_max_events` or every `flush_interval` seconds, inserts
+    them with a single multi-row statement, and deletes a log segment once every
+    record in it is committed. Segments left over from a crash are replayed on
+    `start()`; replay is idempotent because ids are assigned before logging and
+    repeats carry the row's absolute read count.
+
+    A batch the database refuses for its data is split in halves and retried until
+    the records at fault are found; those are appended to `quarantine.jsonl` in the
+    log directory instead of blocking every later flush. Any other failure (e.g. a
+    lost connection) retries the whole batch.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        log_dir: str,
+        flush_max_events: int = 5000,
+        flush_interval: float = 0.05,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        id_block_size: int = 1000,
+    ):
+        self.engine = engine
+        self.log_dir = log_dir
+        self.flush_max_events = flush_max_events
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.ids = IdAllocator(engine, id_block_size)
+
+        self._lock = threading.Condition()
+        self._pending: List[Tuple[int, bytes, Dict[str, Any]]] = []
+        self._appended_seq = 0
+        self._durable_seq = 0
+        self._log_error: Optional[BaseException] = None
+
+        self._flush_lock = threading.Condition()
+        self._ready: Deque[Tuple[int, Dict[str, Any]]] = deque()
+
+        self._segments: Dict[int, _Segment] = {}
+        self._segment: Optional[_Segment] = None
+        self._segment_file = None
+        self._segment_bytes = 0
+
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        INGEST_WRITE_BEHIND_BACKLOG.set_function(lambda: len(self._ready))
+
+    # --- Public API ---
+
+    def start(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._replay()
+        self._open_segment()
+        self._running = True
+        for name, target in (
+            ("ingest-log-writer", self._log_writer),
+            ("ingest-flusher", self._flusher),
+        ):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Write-behind ingestion started", extra={"log_dir": self.log_dir})
+
+    def stop(self, timeout: float = 30):
+        """Stops accepting work and flushes everything that was acknowledged."""
+        self._running = False
+        with self._lock:
+            self._lock.notify_all()
+        with self._flush_lock:
+            self._flush_lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._segment_file:
+            self._segment_file.close()
+            self._segment_file = None
+            with self._flush_lock:
+                self._segment.sealed = True
+                self._delete_committed_segments()
+
+    def append_insert(self, row: Dict[str, Any]):
+        """Durably logs a new `asset_tracking` row. Returns once it is on disk."""
+        self._append([{"op": "insert", "row": _encode_row(row)}])
+
+    def append_inserts(self, rows: List[Dict[str, Any]]):
+        """Durably logs many rows with a single wait for the log writer."""
+        self._append([{"op": "insert", "row": _encode_row(row)} for row in rows])
+
+    def append_repeat(self, row_id: int, seen_at: datetime.datetime, reads: int):
+        """
+        Durably logs a repeated read that belongs to an existing row, with the number
+        of reads the row holds after it. The count is absolute, so committing the
+        record again on replay changes nothing.
+        """
+        self._append(
+            [
+                {
+                    "op": "repeat",
+                    "id": row_id,
+                    "seen_at": seen_at.isoformat(),
+                    "reads": reads,
+                }
+            ]
+        )
+
+    @property
+    def backlog(self) -> int:
+        return len(self._ready)
+
+    # --- Durable log ---
+
+    def _append(self, records: List[Dict[str, Any]]):
+        if not self._running:
+            raise RuntimeError("Write-behind ingestion is not running.")
+        if not records:
+            return
+        lines = [
+            (json.dumps(record, separators=(",", ":")) + "\n").encode()
+            for record in records
+        ]
+        with self._lock:
+            for line, record in zip(lines, records):
+                self._appended_seq += 1
+                self._pending.append((self._appended_seq, line, record))
+            seq = self._appended_seq
+            self._lock.notify_all()
+            while self._durable_seq < seq:
+                if self._log_error is not None:
+                    raise RuntimeError("Ingest log write failed.") from self._log_error
+                self._lock.wait()
+
+    def _log_writer(self):
+        while self._running or self._pending:
+            with self._lock:
+                while not self._pending and self._running:
+                    self._lock.wait()
+                batch, self._pending = self._pending, []
+            if not batch:
+                continue
+            try:
+                payload = b"".join(line for _, line, _ in batch)
+                self._segment_file.write(payload)
+                self._segment_file.flush()
+                os.fsync(self._segment_file.fileno())
+                segment = self._segment
+                segment.appended += len(batch)
+                self._segment_bytes += len(payload)
+                with self._flush_lock:
+                    self._ready.extend((segment.seq, record) for _, _, record in batch)
+                    if len(self._ready) >= self.flush_max_events:
+                        self._flush_lock.notify_all()
+                if self._segment_bytes >= self.segment_max_bytes:
+                    self._roll_segment()
+                with self._lock:
+                    self._durable_seq = batch[-1][0]
+                    self._lock.notify_all()
+            except BaseException as e:
+                logger.exception("Failed to write the ingest log.")
+                with self._lock:
+                    self._log_error = e
+                    self._lock.notify_all()
+                return
+
+    def _open_segment(self):
+        existing = [_segment_seq(path) for path in self._segment_paths()]
+        seq = max(existing, default=0) + 1
+        path = os.path.join(self.log_dir, f"segment-{seq:012d}.log")
+        self._segment = _Segment(seq, path)
+        self._segments[seq] = self._segment
+        self._segment_file = open(path, "ab")
+        self._segment_bytes = 0
+
+    def _roll_segment(self):
+        self._segment_file.close()
+        with self._flush_lock:
+            self._segment.sealed = True
+            self._delete_committed_segments()
+        self._open_segment()
+
+    def _delete_committed_segments(self):
+        for seq, segment in list(self._segments.items()):
+            if segment.sealed and segment.committed >= segment.appended:
+                try:
+                    os.remove(segment.path)
+                except OSError:
+                    logger.warning("Could not delete ingest log %s", segment.path)
+                del self._segments[seq]
+
+    # --- Group commit to Postgres ---
+
+    def _flusher(self):
+        while True:
+            with self._flush_lock:
+                if len(self._ready) < self.flush_max_events and self._running:
+                    self._flush_lock.wait(self.flush_interval)
+                if not self._ready:
+                    if not self._running and not self._pending:
+                        return
+                    if not self._running:
+                        # Stopping: wait for the log writer's last records.
+                        self._flush_lock.wait(self.flush_interval)
+                    continue
+                count = min(len(self._ready), self.flush_max_events)
+                batch = [self._ready.popleft() for _ in range(count)]
+            try:
+                self._commit_or_quarantine([record for _, record in batch])
+            except Exception:
+                logger.exception(
+                    "Group commit failed; retrying.", extra={"rate_limited": True}
+                )
+                with self._flush_lock:
+                    self._ready.extendleft(reversed(batch))
+                time.sleep(1)
+                continue
+
+            with self._flush_lock:
+                for seq, _ in batch:
+                    self._segments[seq].committed += 1
+                self._delete_committed_segments()
+
+    def _commit_or_quarantine(self, records: List[Dict[str, Any]]):
+        """
+        Commits `records`, bisecting a batch the database refuses for its data down
+        to the single records at fault, which are quarantined. Other errors are
+        raised for the whole batch to be retried.
+        """
+        try:
+            self._commit(records)
+        except (DataError, IntegrityError) as e:
+            if len(records) > 1:
+                middle = len(records) // 2
+                self._commit_or_quarantine(records[:middle])
+                self._commit_or_quarantine(records[middle:])
+                return
+            self._quarantine(records[0], e)
+
+    def _quarantine(self, record: Dict[str, Any], error: Exception):
+        message = str(getattr(error, "orig", error)).splitlines()[0]
+        logger.error(
+            "Write-behind record refused by the database; quarantined.",
+            extra={"record": record, "error": message},
+        )
+        with open(os.path.join(self.log_dir, _QUARANTINE_FILE), "a") as f:
+            f.write(json.dumps({"record": record, "error": message}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        INGEST_WRITE_BEHIND_DROPPED_TOTAL.labels("quarantined").inc()
+
+    def _commit(self, records: List[Dict[str, Any]]):
+        rows = [_decode_row(r["row"]) for r in records if r["op"] == "insert"]
+        # row id -> (reads, last seen); later records of a burst have both higher.
+        repeats: Dict[int, Tuple[int, datetime.datetime]] = {}
+        for r in records:
+            if r["op"] == "repeat":
+                seen_at = datetime.datetime.fromisoformat(r["seen_at"])
+                reads, last_seen = repeats.get(r["id"], (0, seen_at))
+                # Records logged before counts were absolute only move last_seen_at.
+                count = r.get("reads", 0)
+                repeats[r["id"]] = (max(reads, count), max(last_seen, seen_at))
+
+        with INGEST_FLUSH_SECONDS.time(), self.engine.begin() as conn:
+            rows = _drop_duplicate_keys(conn, rows)
+            if rows:
+                # Ids are assigned up front, so a replayed row simply conflicts.
+                conn.execute(
+                    insert(AssetTracking).on_conflict_do_nothing(index_elements=["id"]),
+                    rows,
+                )
+            if repeats:
+                table = AssetTracking.__table__
+                conn.execute(
+                    update(table)
+                    .where(
+                        table.c.id == bindparam("row_id"),
+                        table.c.state_change_id.is_(None),
+                    )
+                    .values(
+                        repeat_count=func.greatest(
+                            table.c.repeat_count, bindparam("reads")
+                        ),
+                        last_seen_at=func.greatest(
+                            table.c.last_seen_at, bindparam("seen_at")
+                        ),
+                    ),
+                    [
+                        {"row_id": row_id, "reads": reads, "seen_at": seen_at}
+                        for row_id, (reads, seen_at) in repeats.items()
+                    ],
+                )
+        INGEST_FLUSH_ROWS.observe(len(records))
+
+    # --- Recovery ---
+
+    def _segment_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.log_dir, _SEGMENT_PATTERN)))
+
+    def _replay(self):
+        """
+        Commits whatever earlier runs acknowledged but never flushed. A segment may
+        hold batches that were already committed; committing them again is a no-op,
+        since inserts conflict on their id and repeats set absolute counts.
+        """
+        for path in self._segment_paths():
+            records = []
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line was never acknowledged; skip it.
+                        logger.warning("Skipping unreadable record in %s", path)
+            for start in range(0, len(records), self.flush_max_events):
+                self._commit_or_quarantine(
+                    records[start : start + self.flush_max_events]
+                )
+            os.remove(path)
+            logger.info(
+                "Replayed ingest log segment",
+                extra={"segment": os.path.basename(path), "records": len(records)},
+            )
+
+
+def _drop_duplicate_keys(
+    conn: Connection, rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    `rows` without those whose idempotency key another row already has, in the
+    table or earlier in the batch. The request cache of keys is in memory, so a
+    retry after a restart can get a new id for the same key; the row stored first
+    wins and the other is logged.
+    """
+    keys = {row["idempotency_key"] for row in rows if row.get("idempotency_key")}
+    if not keys:
+        return rows
+    table = AssetTracking.__table__
+    owners = dict(
+        conn.execute(
+            select(table.c.idempotency_key, table.c.id).where(
+                table.c.idempotency_key.in_(keys)
+            )
+        ).all()
+    )
+    kept = []
+    for row in rows:
+        key = row.get("idempotency_key")
+        owner = owners.setdefault(key, row["id"]) if key else row["id"]
+        if owner != row["id"]:
+            logger.warning(
+                "Dropped a write-behind row whose idempotency key is already stored.",
+                extra={"row_id": row["id"], "existing_id": owner},
+            )
+            INGEST_WRITE_BEHIND_DROPPED_TOTAL.labels("duplicate_key").inc()
+            continue
+        kept.append(row)
+    return kept
+
+
+def _segment_seq(path: str) -> int:
+    return int(os.path.basename(path)[len("segment-") : -len(".log")])
+
+
+def _encode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = dict(row)
+    for key in ("asset_id", "sensor_id"):
+        if encoded.get(key) is not None:
+            encoded[key] = str(encoded[key])
+    encoded["timestamp"] = encoded["timestamp"].isoformat()
+    return encoded
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Records logged before `split_details` emitted every typed key lack some of
+    # them; a batch's rows must all have the same keys.
+    decoded = {key: None for key in TYPED_DETAIL_FIELDS}
+    decoded.update(row)
+    decoded["timestamp"] = datetime.datetime.fromisoformat(decoded["timestamp"])
+    return decoded
+
+
+write_behind_buffer = (
+    WriteBehindBuffer(
+        engine,
+        settings.INGEST_LOG_DIR,
+        flush_max_events=settings.INGEST_FLUSH_MAX_EVENTS,
+        flush_interval=settings.INGEST_FLUSH_INTERVAL_MS / 1000,
+        segment_max_bytes=settings.INGEST_LOG_SEGMENT_BYTES,
+        id_block_size=settings.INGEST_ID_BLOCK_SIZE,
+    )
+    if settings.INGEST_WRITE_BEHIND
+    else None
+)
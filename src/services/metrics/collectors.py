@@ -0,0 +1,199 @@
+from src.services.metrics.core import registry
+
+# --- Ingestion API ---
+INGEST_REQUEST_SECONDS = registry.histogram(
+    "aegis_ingest_request_seconds",
+    "Latency of sensor ingestion requests, by sensor type.",
+    ["sensor_type"],
+)
+INGEST_COALESCED_READS_TOTAL = registry.counter(
+    "aegis_ingest_coalesced_reads_total",
+    "Sensor reads folded into an existing row instead of inserted, by sensor type.",
+    ["sensor_type"],
+)
+INGEST_FRAME_SECONDS = registry.histogram(
+    "aegis_ingest_frame_seconds",
+    "Time to decode, validate and store one binary ingestion frame.",
+)
+INGEST_FRAME_READINGS_TOTAL = registry.counter(
+    "aegis_ingest_frame_readings_total",
+    "Readings received in binary ingestion frames, by outcome.",
+    ["outcome"],
+)
+INGEST_WS_CONNECTIONS = registry.gauge(
+    "aegis_ingest_ws_connections", "Sensor gateways connected over WebSocket."
+)
+INGEST_WS_COMMIT_SECONDS = registry.histogram(
+    "aegis_ingest_ws_commit_seconds",
+    "Time to commit a batch of WebSocket frames before acknowledging it.",
+)
+INGEST_WRITE_BEHIND_BACKLOG = registry.gauge(
+    "aegis_ingest_write_behind_backlog",
+    "Acknowledged events in the local ingest log not yet committed to the database.",
+)
+INGEST_FLUSH_SECONDS = registry.histogram(
+    "aegis_ingest_flush_seconds",
+    "Duration of a write-behind group commit to the database.",
+)
+INGEST_FLUSH_ROWS = registry.histogram(
+    "aegis_ingest_flush_rows",
+    "Log records applied per write-behind group commit.",
+    buckets=(1, 10, 50, 100, 500, 1000, 2500, 5000, 10000),
+)
+INGEST_WRITE_BEHIND_DROPPED_TOTAL = registry.counter(
+    "aegis_ingest_write_behind_dropped_total",
+    "Acknowledged write-behind records never committed, by reason (a duplicate "
+    "idempotency key, or refused by the database and quarantined).",
+    ["reason"],
+)
+INGEST_IN_FLIGHT = registry.gauge(
+    "aegis_ingest_in_flight", "Ingestion requests currently admitted and being served."
+)
+INGEST_ADMISSION_REJECTED_TOTAL = registry.counter(
+    "aegis_ingest_admission_rejected_total",
+    "Ingestion requests or frame readings shed by admission control.",
+    ["reason", "priority"],
+)
+SENSOR_HEARTBEATS_TOTAL = registry.counter(
+    "aegis_sensor_heartbeats_total",
+    "Sensor sightings recorded in the health table, heartbeats and readings alike.",
+)
+SENSOR_STATUS_CHANGES_TOTAL = registry.counter(
+    "aegis_sensor_status_changes_total",
+    "Automatic sensor status changes, by the status moved to.",
+    ["status"],
+)
+SENSORS_BY_STATUS = registry.gauge(
+    "aegis_sensors", "Sensors by status, as of the last health flush.", ["status"]
+)
+SENSOR_HEALTH_FLUSH_SECONDS = registry.histogram(
+    "aegis_sensor_health_flush_seconds",
+    "Time to write sensor sightings and status changes to the database.",
+)
+OCCUPANCY_UPDATES_TOTAL = registry.counter(
+    "aegis_occupancy_updates_total",
+    "Asset moves applied to the in-memory occupancy index.",
+)
+OCCUPANCY_REBUILDS_TOTAL = registry.counter(
+    "aegis_occupancy_rebuilds_total",
+    "Full reloads of the occupancy index from the assets table.",
+)
+ASSET_IMPORT_ROWS_TOTAL = registry.counter(
+    "aegis_asset_import_rows_total",
+    "Rows of asset bulk imports, by outcome (inserted, updated or rejected).",
+    ["outcome"],
+)
+ASSET_SEARCH_SECONDS = registry.histogram(
+    "aegis_asset_search_seconds",
+    "Database time of asset searches not served from cache.",
+)
+ASSET_SEARCH_CACHE_TOTAL = registry.counter(
+    "aegis_asset_search_cache_total",
+    "Asset search pages looked up in the search cache, by result (hit or miss).",
+    ["result"],
+)
+
+# --- Daemon ---
+CYCLE_SECONDS = registry.histogram(
+    "aegis_daemon_cycle_seconds", "Duration of a full daemon processing cycle."
+)
+CYCLE_PHASE_SECONDS = registry.histogram(
+    "aegis_daemon_cycle_phase_seconds",
+    "Duration of individual phases and processor calls within a daemon cycle.",
+    ["phase"],
+)
+UNPROCESSED_EVENTS = registry.gauge(
+    "aegis_daemon_unprocessed_events",
+    "Tracking events the daemon still holds as match candidates in the last cycle.",
+)
+LAST_CYCLE_TIMESTAMP = registry.gauge(
+    "aegis_daemon_last_cycle_timestamp_seconds",
+    "Unix time at which the last daemon cycle finished.",
+)
+EVENT_REORDER_BUFFERED = registry.gauge(
+    "aegis_event_reorder_buffered",
+    "Tracking events held in the reordering buffer until the watermark passes them.",
+)
+EVENTS_LATE_TOTAL = registry.counter(
+    "aegis_events_late_total",
+    "Tracking events that arrived behind the watermark, by how they were handled.",
+    ["outcome"],
+)
+EVENTS_FORCED_RELEASE_TOTAL = registry.counter(
+    "aegis_events_forced_release_total",
+    "Tracking events released ahead of the watermark because the buffer was full.",
+)
+STATE_CHANGES_TOTAL = registry.counter(
+    "aegis_state_changes_total",
+    "State changes committed to the database, by state change type.",
+    ["event_type"],
+)
+INCIDENT_QUEUE_DEPTH = registry.gauge(
+    "aegis_incident_queue_depth", "Incident jobs waiting for a worker."
+)
+INCIDENT_JOBS_TOTAL = registry.counter(
+    "aegis_incident_jobs_total",
+    "Incident jobs, by outcome (written, duplicate, dropped, skipped or failed).",
+    ["outcome"],
+)
+INCIDENT_BUILD_SECONDS = registry.histogram(
+    "aegis_incident_build_seconds",
+    "Time to gather an incident's context and write its report.",
+)
+
+# --- Database ---
+DB_QUERY_SECONDS = registry.histogram(
+    "aegis_db_query_seconds", "Latency of DatabaseService queries.", ["query"]
+)
+
+DB_POOL_SIZE = registry.gauge(
+    "aegis_db_pool_size", "Connections kept open by a connection pool.", ["pool"]
+)
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "aegis_db_pool_checked_out",
+    "Connections currently checked out of a connection pool.",
+    ["pool"],
+)
+DB_POOL_OVERFLOW = registry.gauge(
+    "aegis_db_pool_overflow",
+    "Connections opened beyond a pool's size to absorb bursts.",
+    ["pool"],
+)
+DB_REPLICA_LAG_SECONDS = registry.gauge(
+    "aegis_db_replica_lag_seconds",
+    "Replay lag of a read replica at its last check.",
+    ["replica"],
+)
+DB_READS_ROUTED_TOTAL = registry.counter(
+    "aegis_db_reads_routed_total",
+    "Read-intent sessions, by the engine they were routed to.",
+    ["target"],
+)
+EXPORT_ROWS_TOTAL = registry.counter(
+    "aegis_export_rows_total",
+    "Rows streamed out by history exports, by table.",
+    ["table"],
+)
+
+# --- Blockchain ---
+CHAIN_SUBMIT_SECONDS = registry.histogram(
+    "aegis_chain_submit_seconds",
+    "Time to build, sign and submit a state change transaction.",
+)
+CHAIN_CONFIRMATION_SECONDS = registry.histogram(
+    "aegis_chain_confirmation_seconds",
+    "Time from submission until a state change transaction is seen on-chain.",
+)
+UTXO_POOL_AVAILABLE = registry.gauge(
+    "aegis_utxo_pool_available", "Pool UTxOs free to be leased to a new transaction."
+)
+UTXO_POOL_IN_FLIGHT = registry.gauge(
+    "aegis_utxo_pool_in_flight",
+    "Pool UTxOs leased to transactions that have not confirmed yet.",
+)
+
+# --- Logging ---
+LOG_RECORDS_DROPPED_TOTAL = registry.counter(
+    "aegis_log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
@@ -0,0 +1,285 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB hits up to slow chain confirmations.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+
+class _ShardedCells:
+    """
+    Hands every thread its own private value cell, so writers never take a lock.
+    The cells are only summed when the metric is scraped.
+    """
+
+    def __init__(self, factory: Callable[[], list]):
+        self._factory = factory
+        self._local = threading.local()
+        self._cells: List[list] = []  # list.append is atomic under the GIL
+
+    def cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._factory()
+            self._local.cell = cell
+            self._cells.append(cell)
+            return cell
+
+    def snapshot(self) -> List[list]:
+        return list(self._cells)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _ShardedCells(lambda: [0.0])
+
+    def inc(self, amount: float = 1.0):
+        self._shards.cell()[0] += amount
+
+    def value(self) -> float:
+        return sum(cell[0] for cell in self._shards.snapshot())
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        # A single attribute store is atomic, so gauges need no sharding.
+        self._value = float(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Computes the gauge lazily at scrape time instead of on the hot path."""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "_HistogramChild"):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, and a trailing running sum.
+        size = len(self._buckets) + 2
+        self._shards = _ShardedCells(lambda: [0] * (size - 1) + [0.0])
+
+    def observe(self, value: float):
+        cell = self._shards.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self) -> _Timer:
+        """Context manager that observes the wall-clock duration of its block."""
+        return _Timer(self)
+
+    def collect(self) -> Tuple[List[int], int, float]:
+        counts = [0] * (len(self._buckets) + 1)
+        total = 0.0
+        for cell in self._shards.snapshot():
+            for i in range(len(counts)):
+                counts[i] += cell[i]
+            total += cell[-1]
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(
+                    f"Metric '{self.name}' expects labels {self.labelnames}, got {key}"
+                )
+            # setdefault keeps the first child if two threads race here.
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_string(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{self._label_string(key)} {_format(child.value())}"]
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _render_child(self, key, child) -> List[str]:
+        cumulative, count, total = child.collect()
+        lines = []
+        for bound, value in zip(self.buckets + (math.inf,), cumulative):
+            le = 'le="' + ("+Inf" if bound == math.inf else _format(bound)) + '"'
+            lines.append(f"{self.name}_bucket{self._label_string(key, le)} {value}")
+        lines.append(f"{self.name}_sum{self._label_string(key)} {_format(total)}")
+        lines.append(f"{self.name}_count{self._label_string(key)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds every metric of the process and renders the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()  # Only taken at registration, never on updates.
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Content type expected by Prometheus scrapers.
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
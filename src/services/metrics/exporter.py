@@ -0,0 +1,38 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.services.metrics.core import CONTENT_TYPE_LATEST, registry
+
+logger = logging.getLogger(__name__)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Scrapes happen every few seconds; keep them out of the daemon output.
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves `/metrics` from a background thread so processes without a web framework,
+    such as the Aegis daemon, can be scraped by Prometheus.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-exporter", daemon=True
+    )
+    thread.start()
+    logger.info("Metrics exporter listening on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,169 @@
+"""
+Which assets are at which location, kept in memory in the API process.
+
+The daemon moves assets by updating `assets.current_location_id` and
+`current_status` in the same transaction as their state change. A trigger on
+`assets` (migration 006) turns each of those updates into a NOTIFY on
+`OCCUPANCY_CHANNEL`, which Postgres delivers only once the transaction commits.
+`OccupancyIndex` LISTENs on a connection of its own and applies every notification
+to two maps, location -> assets and asset -> location. It is rebuilt from `assets`
+at startup and whenever the connection is re-established, since notifications sent
+while no one was listening are lost. Released assets are not at any location.
+"""
+
+import logging
+import select
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from src.database.core import engine
+from src.services.metrics.collectors import (
+    OCCUPANCY_REBUILDS_TOTAL,
+    OCCUPANCY_UPDATES_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_CHANNEL = "asset_occupancy"
+# How long the listener waits for a notification before checking for shutdown.
+POLL_SECONDS = 1.0
+RECONNECT_SECONDS = 5.0
+
+_LOCATIONS_SQL = text("SELECT id::text, name::text FROM locations")
+_ASSET_LOCATIONS_SQL = text(
+    """
+    SELECT id::text, current_location_id::text FROM assets
+    WHERE current_status <> 'RELEASED'
+    """
+)
+
+
+def parse_notification(payload: str) -> Tuple[str, Optional[str]]:
+    """
+    `(asset_id, location_id)` from a trigger payload of the form
+    'asset_id,location_id,status'; the location is None for a released or
+    deleted asset.
+    """
+    asset_id, location_id, status = payload.split(",")
+    if status in ("RELEASED", "DELETED") or not location_id:
+        return asset_id, None
+    return asset_id, location_id
+
+
+class OccupancyIndex:
+    """
+    Location -> assets and asset -> location. Lookups are dict reads; listing a
+    location copies its set under the lock, so it costs the size of the answer.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.ready = False
+        self._assets_at: Dict[str, Set[str]] = {}
+        self._location_of: Dict[str, str] = {}
+        self._location_ids: Dict[str, str] = {}
+        self._location_names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Public API ---
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listener, name="occupancy-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def assets_at(self, location_name: str) -> Optional[List[str]]:
+        """The ids of the assets at a location, or None for an unknown location."""
+        location_id = self._location_ids.get(location_name)
+        if location_id is None:
+            return None
+        with self._lock:
+            return list(self._assets_at.get(location_id, ()))
+
+    def location_of(self, asset_id: str) -> Optional[str]:
+        """The name of the location an asset is at, if it is at one."""
+        location_id = self._location_of.get(asset_id)
+        return self._location_names.get(location_id) if location_id else None
+
+    def locations(self) -> List[str]:
+        return list(self._location_ids)
+
+    def apply(self, moves: Iterable[Tuple[str, Optional[str]]]):
+        """Moves each asset to its location id (None: removes it from the index)."""
+        count = 0
+        with self._lock:
+            for asset_id, location_id in moves:
+                previous = self._location_of.pop(asset_id, None)
+                if previous is not None:
+                    self._assets_at[previous].discard(asset_id)
+                if location_id is not None:
+                    self._location_of[asset_id] = location_id
+                    self._assets_at.setdefault(location_id, set()).add(asset_id)
+                count += 1
+        OCCUPANCY_UPDATES_TOTAL.inc(count)
+
+    def rebuild(self, conn: Connection):
+        """Replaces the whole index with the locations of the assets in the database."""
+        locations = conn.execute(_LOCATIONS_SQL).all()
+        assets_at: Dict[str, Set[str]] = {
+            location_id: set() for location_id, _ in locations
+        }
+        location_of = {}
+        for asset_id, location_id in conn.execute(_ASSET_LOCATIONS_SQL):
+            location_of[asset_id] = location_id
+            assets_at.setdefault(location_id, set()).add(asset_id)
+        with self._lock:
+            self._location_names = dict(locations)
+            self._location_ids = {name: location_id for location_id, name in locations}
+            self._assets_at = assets_at
+            self._location_of = location_of
+        self.ready = True
+        OCCUPANCY_REBUILDS_TOTAL.inc()
+        logger.info("Occupancy index rebuilt", extra={"assets": len(location_of)})
+
+    # --- Listener ---
+
+    def _listener(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                # Moves are missed until the next connection rebuilds the index.
+                self.ready = False
+                logger.exception(
+                    "Occupancy listener failed; reconnecting.",
+                    extra={"rate_limited": True},
+                )
+            self._stop.wait(RECONNECT_SECONDS)
+
+    def _listen(self):
+        with self.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            # Listen before reading, so no move between the two is missed; moves
+            # the snapshot already has are applied again, which changes nothing.
+            conn.exec_driver_sql(f"LISTEN {OCCUPANCY_CHANNEL}")
+            self.rebuild(conn)
+            dbapi_conn = conn.connection.driver_connection
+            while not self._stop.is_set():
+                if not select.select([dbapi_conn], [], [], POLL_SECONDS)[0]:
+                    continue
+                dbapi_conn.poll()
+                notifies, dbapi_conn.notifies[:] = list(dbapi_conn.notifies), []
+                self.apply(parse_notification(n.payload) for n in notifies)
+
+
+occupancy_index = OccupancyIndex(engine)
@@ -6,7 +6,7 @@ from dotenv import find_dotenv, load_dotenv
 
 # Important: This assumes your test script is in the project root,
 # and your service is in src/services/aegis/
-from src.services.aegis.blockchain_service import BlockchainService
+from src.services.aegis.chain.blockfrost import BlockfrostBackend
 from src.services.aegis import config
 
 # Load environment variables from .env file
@@ -15,7 +15,7 @@ load_dotenv(find_dotenv())
 
 async def main():
     """
-    Initializes the BlockchainService and attempts to send a single,
+    Initializes the Blockfrost chain backend and attempts to send a single,
     hard-coded transaction to the Cardano network to test the connection.
     """
     print("--- Starting Standalone Blockchain Service Test ---")
@@ -41,8 +41,8 @@ async def main():
     try:
         # --- 2. Initialize the Blockchain Service ---
         # It will pull its configuration from your .env and config.py files
-        print("\nInitializing BlockchainService...")
-        bc_service = BlockchainService(
+        print("\nInitializing BlockfrostBackend...")
+        bc_service = BlockfrostBackend(
             base_url=config.CARDANO_BASE_URL,
             project_id=config.BLOCKFROST_PROJECT_ID,
             payment_skey_path=config.WALLET_SKEY_PATH,
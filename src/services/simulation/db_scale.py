@@ -0,0 +1,610 @@
+"""
+Runs the hot `DatabaseService` queries against a database seeded at production
+scale, and checks their latency and query plans against a baseline.
+
+    python -m src.services.simulation.db_scale seed [--events N] [--assets N] ...
+    python -m src.services.simulation.db_scale run [--baseline FILE] [--save FILE]
+
+`seed` fills the database at `DATABASE_URL` (by default 10M tracking events, 100k
+assets and 1M state changes) with set-based INSERT ... SELECTs, and refuses to
+touch a database that holds anything but its own rows. Use a scratch database.
+
+`run` times each hot query through the real `DatabaseService` methods, so ORM
+loading is part of the latency, and records the `EXPLAIN (ANALYZE, BUFFERS)` plan
+of every statement the method sent. The event-linking UPDATEs run in a transaction
+that is rolled back, so runs can be repeated on the same data. A query is flagged
+if one of its plans sequentially scans a watched table (`asset_tracking` by
+default), if its plan shape differs from the baseline's, or if its p95 latency is
+more than `--threshold` above the baseline's. `run` exits with 1 if anything is
+flagged, so it can gate an index or query change.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from src.database.core import engine
+from src.services.aegis import config
+from src.services.aegis.database import (
+    _LINK_EVENTS_SQL,
+    _UPDATE_ASSETS_SQL,
+    DatabaseService,
+)
+from src.services.aegis.log import configure_logging, shutdown_logging
+
+# Named explicitly: run with `python -m`, __name__ is "__main__", which is outside
+# the "src" logger tree configure_logging routes.
+logger = logging.getLogger("src.services.simulation.db_scale")
+
+# Rows the harness creates are named with this prefix.
+PREFIX = "SCALE-"
+DEFAULT_EVENTS = 10_000_000
+DEFAULT_ASSETS = 100_000
+DEFAULT_STATE_CHANGES = 1_000_000
+DEFAULT_SENSORS = 500
+# The most recent events are left unlinked, as the daemon's backlog.
+DEFAULT_UNPROCESSED = 5_000
+# Tracking events are inserted and committed this many at a time.
+SEED_CHUNK_ROWS = 1_000_000
+# Seeded history spans this far back from now.
+SEED_SPAN = timedelta(days=30)
+
+# Tables a sequential scan of is flagged.
+WATCHED_TABLES = ("asset_tracking",)
+# Events and assets touched by the sampled linking queries.
+LINK_SAMPLE = 200
+
+
+# --- Seeding ---
+
+_SEED_LOCATIONS_SQL = text(
+    """
+    INSERT INTO locations (name)
+    SELECT unnest(enum_range(NULL::location_name_enum))
+    ON CONFLICT (name) DO NOTHING
+    """
+)
+
+_SEED_SENSORS_SQL = text(
+    """
+    INSERT INTO sensors (name, sensor_type, location_id)
+    SELECT :prefix || 'SNS-' || g,
+        (enum_range(NULL::sensor_type_enum))[1 + g % 7],
+        l.id
+    FROM generate_series(0, :sensors - 1) AS g
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY name) - 1 AS n FROM locations
+    ) AS l ON l.n = g % (SELECT count(*) FROM locations)
+    """
+)
+
+# A tenth of the assets are released and a tenth flagged; most sit in the vault.
+_SEED_ASSETS_SQL = text(
+    """
+    INSERT INTO assets (
+        serial_number, name, current_location_id, current_status, updated_at
+    )
+    SELECT :prefix || 'AST-' || g,
+        'Scale asset ' || g,
+        (SELECT id FROM locations WHERE name = 'VAULT'),
+        CAST(
+            (ARRAY[
+                'IN_VAULT', 'IN_VAULT', 'IN_VAULT', 'IN_VAULT', 'IN_VAULT',
+                'IN_VAULT', 'IN_VIEWING', 'IN_TRANSIT_OUT', 'RELEASED',
+                'FLAGGED_ANOMALY'
+            ])[1 + g % 10] AS asset_status_enum
+        ),
+        CAST(:start AS timestamptz) + random() * make_interval(secs => :span)
+    FROM generate_series(0, :assets - 1) AS g
+    """
+)
+
+_SEED_STATE_CHANGES_SQL = text(
+    """
+    INSERT INTO state_changes (
+        asset_id, event_type, timestamp, log_bundle_hash, on_chain_tx_id, created_at
+    )
+    SELECT a.id,
+        (enum_range(NULL::state_change_event_type))[1 + g % 5],
+        ts,
+        md5(g::text) || md5(a.id::text),
+        :prefix || 'TX-' || g,
+        ts
+    FROM generate_series(0, :state_changes - 1) AS g
+    JOIN scale_assets AS a ON a.n = g % :assets
+    CROSS JOIN LATERAL (
+        SELECT CAST(:start AS timestamptz) + g * make_interval(secs => :step) AS ts
+    ) AS t
+    """
+)
+
+# Event g is linked to state change g * state_changes / linked, so every state
+# change bundles about the same number of events, or, past `linked`, is left for
+# the daemon on an asset of its own.
+_SEED_EVENTS_SQL = text(
+    """
+    INSERT INTO asset_tracking (
+        asset_id, sensor_id, event_type, timestamp, details, location_name,
+        state_change_id
+    )
+    SELECT COALESCE(sc.asset_id, a.id),
+        s.id,
+        (ARRAY[
+            'scan_exit', 'auth_success', 'scan_entry', 'custody_scan', 'ENV_READING'
+        ])[1 + g % 5],
+        CAST(:start AS timestamptz) + g * make_interval(secs => :step),
+        '{}'::jsonb,
+        s.location,
+        sc.id
+    FROM generate_series(CAST(:low AS bigint), :high - 1) AS g
+    JOIN scale_sensors AS s ON s.n = g % :sensors
+    LEFT JOIN scale_state_changes AS sc
+        ON g < :linked AND sc.n = g * :state_changes / NULLIF(:linked, 0)
+    LEFT JOIN scale_assets AS a ON g >= :linked AND a.n = g % :assets
+    """
+)
+
+# Row numbers for the seeded rows, so generated rows can be joined to them.
+_NUMBER_ROWS_SQL = [
+    text(
+        """
+        CREATE TEMP TABLE scale_assets AS
+        SELECT id, row_number() OVER (ORDER BY short_id) - 1 AS n
+        FROM assets WHERE serial_number LIKE :prefix || 'AST-%'
+        """
+    ),
+    text(
+        """
+        CREATE TEMP TABLE scale_sensors AS
+        SELECT s.id, l.name::text AS location,
+            row_number() OVER (ORDER BY s.short_id) - 1 AS n
+        FROM sensors AS s JOIN locations AS l ON l.id = s.location_id
+        WHERE s.name LIKE :prefix || 'SNS-%'
+        """
+    ),
+    text("CREATE UNIQUE INDEX ON scale_assets (n)"),
+    text("CREATE UNIQUE INDEX ON scale_sensors (n)"),
+]
+
+_NUMBER_STATE_CHANGES_SQL = [
+    text(
+        """
+        CREATE TEMP TABLE scale_state_changes AS
+        SELECT id, asset_id, row_number() OVER (ORDER BY timestamp, id) - 1 AS n
+        FROM state_changes
+        """
+    ),
+    text("CREATE UNIQUE INDEX ON scale_state_changes (n)"),
+]
+
+_FOREIGN_ROWS_SQL = text(
+    """
+    SELECT
+        (SELECT count(*) FROM assets WHERE serial_number NOT LIKE :prefix || '%')
+        + (SELECT count(*) FROM sensors WHERE name NOT LIKE :prefix || '%')
+    """
+)
+
+
+def seed(
+    db_engine: Engine,
+    events: int = DEFAULT_EVENTS,
+    assets: int = DEFAULT_ASSETS,
+    state_changes: int = DEFAULT_STATE_CHANGES,
+    sensors: int = DEFAULT_SENSORS,
+    unprocessed: int = DEFAULT_UNPROCESSED,
+    seed_value: int = 0,
+):
+    """
+    Replaces the tracking history of `db_engine`'s database with a generated one.
+    Raises `RuntimeError` if the database holds assets or sensors it did not seed.
+    """
+    if min(assets, sensors) < 1 or not 0 <= unprocessed <= events:
+        raise ValueError("Need an asset and a sensor, and unprocessed <= events.")
+    linked = events - unprocessed
+    if linked and not state_changes:
+        raise ValueError("Linked events need state changes to link to.")
+    start = datetime.now(timezone.utc) - SEED_SPAN
+    span = SEED_SPAN.total_seconds()
+    params = {
+        "prefix": PREFIX,
+        "start": start,
+        "span": span,
+        "sensors": sensors,
+        "assets": assets,
+        "state_changes": state_changes,
+        "linked": linked,
+    }
+
+    with db_engine.connect() as conn:
+        foreign = conn.scalar(_FOREIGN_ROWS_SQL, params)
+        if foreign:
+            raise RuntimeError(
+                f"The database holds {foreign} assets or sensors that were not "
+                "seeded by this harness; refusing to seed it. Point DATABASE_URL "
+                "at a scratch database."
+            )
+        conn.execute(
+            text(
+                "TRUNCATE asset_tracking, state_changes, assets, sensors "
+                "RESTART IDENTITY CASCADE"
+            )
+        )
+        # random() is repeatable for a given seed.
+        conn.execute(text("SELECT setseed(:s)"), {"s": (seed_value % 1000) / 1000})
+        conn.execute(_SEED_LOCATIONS_SQL)
+        conn.execute(_SEED_SENSORS_SQL, params)
+        conn.execute(_SEED_ASSETS_SQL, params)
+        for statement in _NUMBER_ROWS_SQL:
+            conn.execute(statement, params)
+        conn.commit()
+        logger.info("Seeded %d sensors and %d assets", sensors, assets)
+
+        conn.execute(
+            _SEED_STATE_CHANGES_SQL,
+            {**params, "step": span / max(state_changes, 1)},
+        )
+        for statement in _NUMBER_STATE_CHANGES_SQL:
+            conn.execute(statement)
+        conn.commit()
+        logger.info("Seeded %d state changes", state_changes)
+
+        for low in range(0, events, SEED_CHUNK_ROWS):
+            high = min(low + SEED_CHUNK_ROWS, events)
+            conn.execute(
+                _SEED_EVENTS_SQL,
+                {**params, "low": low, "high": high, "step": span / events},
+            )
+            conn.commit()
+            logger.info("Seeded %d of %d tracking events", high, events)
+
+    # Plans are only realistic with fresh statistics. VACUUM also sets the
+    # visibility map, so index-only scans are costed as they would be in production.
+    with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE assets, sensors, state_changes"))
+        conn.execute(text("VACUUM ANALYZE asset_tracking"))
+
+
+# --- Hot queries ---
+
+
+class HotQuery(NamedTuple):
+    name: str
+    # Runs the query once; called with the service and the sample of `prepare`.
+    run: Callable[[DatabaseService, Dict[str, Any]], Any]
+
+
+_SAMPLE_SQL = text(
+    """
+    SELECT
+        (SELECT now()),
+        (SELECT coalesce(max(id), 0) FROM asset_tracking),
+        (SELECT array_agg(id) FROM (
+            SELECT id FROM asset_tracking WHERE state_change_id IS NULL
+            ORDER BY id DESC LIMIT :n) AS e),
+        (SELECT array_agg(id) FROM (
+            SELECT id FROM asset_tracking WHERE state_change_id IS NOT NULL
+            ORDER BY id DESC LIMIT :n) AS e),
+        (SELECT id FROM state_changes ORDER BY timestamp DESC LIMIT 1),
+        (SELECT array_agg(id) FROM (
+            SELECT id FROM assets WHERE current_status <> 'RELEASED' LIMIT :n) AS a),
+        (SELECT id FROM sensors LIMIT 1)
+    """
+)
+
+
+def prepare(db: DatabaseService) -> Dict[str, Any]:
+    """Ids and times the queries are run with, taken from the seeded data."""
+    with db.engine.connect() as conn:
+        now, max_id, unlinked, linked, state_change, assets, sensor = conn.execute(
+            _SAMPLE_SQL, {"n": LINK_SAMPLE}
+        ).one()
+    return {
+        "now": now,
+        "max_id": max_id,
+        "unlinked": unlinked or [],
+        "recent_ids": (unlinked or []) + (linked or []),
+        "state_change_id": state_change,
+        "asset_ids": assets or [],
+        "sensor_id": sensor,
+    }
+
+
+def link_events(db: DatabaseService, sample: Dict[str, Any]):
+    """The linking UPDATEs of `commit_state_changes`, rolled back."""
+    with db.engine.connect() as conn:
+        with conn.begin() as transaction:
+            conn.execute(
+                _LINK_EVENTS_SQL,
+                {
+                    "event_ids": sample["unlinked"],
+                    "state_change_ids": [str(sample["state_change_id"])]
+                    * len(sample["unlinked"]),
+                },
+            )
+            conn.execute(
+                _UPDATE_ASSETS_SQL,
+                {
+                    "asset_ids": [str(a) for a in sample["asset_ids"]],
+                    "statuses": ["IN_TRANSIT_OUT"] * len(sample["asset_ids"]),
+                    "sensor_ids": [str(sample["sensor_id"])] * len(sample["asset_ids"]),
+                },
+            )
+            transaction.rollback()
+
+
+HOT_QUERIES = [
+    HotQuery(
+        "unprocessed_events_full",
+        lambda db, s: db.get_unprocessed_tracking_events(),
+    ),
+    HotQuery(
+        "unprocessed_events_since",
+        lambda db, s: db.get_unprocessed_tracking_events(
+            # What a restarted daemon reads back (see `EventTimeStage.resume_from`).
+            since=s["now"]
+            - timedelta(minutes=config.EVENT_SEQUENCE_MAX_SPAN_MINUTES)
+        ),
+    ),
+    HotQuery(
+        "tracking_events_after",
+        lambda db, s: db.get_tracking_events_after(s["max_id"] - 1000),
+    ),
+    HotQuery("active_assets_state", lambda db, s: db.get_active_assets_state()),
+    HotQuery(
+        "assets_state_changed_since",
+        lambda db, s: db.get_assets_state_changed_since(
+            s["now"] - timedelta(minutes=5)
+        ),
+    ),
+    HotQuery(
+        "linked_event_ids",
+        lambda db, s: db.get_linked_event_ids(s["recent_ids"]),
+    ),
+    HotQuery("link_events", link_events),
+]
+
+
+# --- Measuring ---
+
+
+@contextmanager
+def captured_statements() -> Iterator[List[Tuple[str, Any]]]:
+    """Collects the SQL statements, with their parameters, sent by any engine."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+
+
+def explain(db_engine: Engine, statement: str, parameters: Any) -> Dict[str, Any]:
+    """The `EXPLAIN (ANALYZE, BUFFERS)` plan of one statement, rolled back."""
+    raw = db_engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+        )
+        (plan,) = cursor.fetchone()[0]
+        return plan
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+def plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_shape(plan: Dict[str, Any]) -> List[str]:
+    """The plan's nodes in order, e.g. 'Index Scan on asset_tracking using ...'."""
+    shape = []
+    for node in plan_nodes(plan["Plan"]):
+        step = node["Node Type"]
+        if "Relation Name" in node:
+            step += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            step += f" using {node['Index Name']}"
+        shape.append(step)
+    return shape
+
+
+def seq_scans(plan: Dict[str, Any], tables=WATCHED_TABLES) -> List[str]:
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(plan["Plan"])
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables
+    ]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50, p95 and p99 of `samples`, in milliseconds."""
+    if len(samples) == 1:
+        cuts = samples * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+def measure(
+    db: DatabaseService, query: HotQuery, sample: Dict[str, Any], runs: int
+) -> Dict[str, Any]:
+    """Latency percentiles over `runs` timed runs, and the plan of each statement."""
+    with captured_statements() as statements:
+        result = query.run(db, sample)
+    rows = len(result[0] if isinstance(result, tuple) else result or [])
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        query.run(db, sample)
+        timings.append(time.perf_counter() - started)
+
+    plans = []
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "WITH")):
+            continue
+        plan = explain(db.engine, statement, parameters)
+        top = plan["Plan"]
+        plans.append(
+            {
+                "statement": " ".join(statement.split()),
+                "shape": plan_shape(plan),
+                "seq_scans": seq_scans(plan),
+                "execution_ms": plan["Execution Time"],
+                "shared_hit_blocks": top.get("Shared Hit Blocks", 0),
+                "shared_read_blocks": top.get("Shared Read Blocks", 0),
+                "plan": plan,
+            }
+        )
+    return {"rows": rows, "runs": runs, **percentiles(timings), "plans": plans}
+
+
+# --- Checks ---
+
+
+def check(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Optional[Dict[str, Dict[str, Any]]],
+    threshold: float,
+    min_delta_ms: float,
+) -> List[str]:
+    """
+    Human-readable findings: sequential scans of watched tables, plan shapes that
+    differ from the baseline, and p95 latency more than `threshold` (a fraction)
+    and `min_delta_ms` above the baseline's.
+    """
+    findings = []
+    for name, result in results.items():
+        for plan in result["plans"]:
+            for table in plan["seq_scans"]:
+                findings.append(
+                    f"{name}: Seq Scan on {table} in: {plan['statement'][:120]}"
+                )
+
+        before = (baseline or {}).get(name)
+        if before is None:
+            continue
+        if [p["shape"] for p in before["plans"]] != [
+            p["shape"] for p in result["plans"]
+        ]:
+            findings.append(f"{name}: plan changed from the baseline")
+        limit = max(before["p95_ms"] * (1 + threshold), before["p95_ms"] + min_delta_ms)
+        if result["p95_ms"] > limit:
+            findings.append(
+                f"{name}: p95 {result['p95_ms']:.1f} ms, baseline "
+                f"{before['p95_ms']:.1f} ms (+{threshold:.0%} allowed)"
+            )
+    return findings
+
+
+def run(args: argparse.Namespace) -> int:
+    unknown = set(args.queries) - {query.name for query in HOT_QUERIES}
+    if unknown:
+        print(f"Unknown queries: {', '.join(sorted(unknown))}.")
+        return 2
+    db = DatabaseService()
+    sample = prepare(db)
+    results = {}
+    for query in HOT_QUERIES:
+        if args.queries and query.name not in args.queries:
+            continue
+        results[query.name] = measure(db, query, sample, args.runs)
+        result = results[query.name]
+        print(
+            f"  {query.name:<28} {result['rows']:>8} rows"
+            f"  p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms"
+            f"  p99 {result['p99_ms']:9.2f} ms"
+        )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["queries"]
+    findings = check(results, baseline, args.threshold, args.min_delta_ms)
+    for finding in findings:
+        print(f"  FLAG {finding}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "recorded_at": datetime.now(timezone.utc).isoformat(),
+                    "queries": results,
+                },
+                f,
+                indent=2,
+                default=str,
+            )
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Seed a database at scale and check the hot queries against it."
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log at INFO.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Seed DATABASE_URL.")
+    seed_parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    seed_parser.add_argument("--assets", type=int, default=DEFAULT_ASSETS)
+    seed_parser.add_argument("--state-changes", type=int, default=DEFAULT_STATE_CHANGES)
+    seed_parser.add_argument("--sensors", type=int, default=DEFAULT_SENSORS)
+    seed_parser.add_argument("--unprocessed", type=int, default=DEFAULT_UNPROCESSED)
+    seed_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="Time and explain the hot queries.")
+    run_parser.add_argument("queries", nargs="*", help="Queries to run (default: all).")
+    run_parser.add_argument("--runs", type=int, default=20, help="Timed runs each.")
+    run_parser.add_argument("--baseline", help="Report to compare against.")
+    run_parser.add_argument("--save", help="Write the report here, as JSON.")
+    run_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed p95 increase over the baseline, as a fraction.",
+    )
+    run_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+
+    parsed = parser.parse_args()
+    configure_logging("INFO" if parsed.verbose else "WARNING", config.LOG_FORMAT)
+    try:
+        if parsed.command == "seed":
+            seed(
+                engine,
+                events=parsed.events,
+                assets=parsed.assets,
+                state_changes=parsed.state_changes,
+                sensors=parsed.sensors,
+                unprocessed=parsed.unprocessed,
+                seed_value=parsed.seed,
+            )
+            exit_code = 0
+        else:
+            exit_code = run(parsed)
+    finally:
+        shutdown_logging()
+    sys.exit(exit_code)
@@ -0,0 +1,86 @@
+import argparse
+import json
+import random
+import time
+import uuid
+
+from src.api.simulation.controller import AssetTrackingCreate
+from src.services.ingest.frames import Reading, build_rows, decode_frame, encode_frame
+from src.services.ingest.registry import AssetInfo, SensorInfo
+
+SENSORS = {
+    1: SensorInfo(
+        uuid.uuid4(), "ENV-VLT-T1", "ENVIRONMENTAL", uuid.uuid4(), "ONLINE", 1
+    ),
+    2: SensorInfo(
+        uuid.uuid4(), "WSP-TRZ-01", "WEIGHT_PLATE", uuid.uuid4(), "ONLINE", 2
+    ),
+}
+ASSETS = {1: AssetInfo(uuid.uuid4(), "Mogok-Ruby-001", 1)}
+
+
+def make_readings(count: int):
+    """High-frequency environmental and weight readings, as a vault gateway sends."""
+    now_ms = int(time.time() * 1000)
+    readings = []
+    for i in range(count):
+        if i % 2:
+            details = {
+                "temperature_c": round(random.uniform(18, 22), 2),
+                "humidity_pct": round(random.uniform(40, 50), 2),
+            }
+            readings.append(Reading(1, None, now_ms + i * 10, details))
+        else:
+            details = {"current_weight_kg": round(random.uniform(1.2, 1.3), 4)}
+            readings.append(Reading(2, 1, now_ms + i * 10, details))
+    return readings
+
+
+def bench_json(readings) -> float:
+    """CPU seconds per event for JSON bodies validated one request at a time."""
+    bodies = [
+        json.dumps(
+            {
+                "sensor_id": str(SENSORS[r.sensor].id),
+                "asset_id": str(ASSETS[r.asset].id) if r.asset else None,
+                "event_type": "ENV_READING",
+                "details": r.details,
+            }
+        ).encode()
+        for r in readings
+    ]
+    started = time.process_time()
+    for body in bodies:
+        AssetTrackingCreate(**json.loads(body)).dict()
+    return (time.process_time() - started) / len(bodies)
+
+
+def bench_cbor(readings, frame_size: int) -> float:
+    """CPU seconds per event for CBOR frames of `frame_size` readings."""
+    frames = [
+        encode_frame(readings[i : i + frame_size])
+        for i in range(0, len(readings), frame_size)
+    ]
+    started = time.process_time()
+    for frame in frames:
+        build_rows(decode_frame(frame), SENSORS, ASSETS)
+    return (time.process_time() - started) / len(readings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare API CPU per event for JSON and binary CBOR ingestion."
+    )
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--frame-size", type=int, default=500)
+    args = parser.parse_args()
+
+    readings = make_readings(args.count)
+    json_cpu = bench_json(readings)
+    cbor_cpu = bench_cbor(readings, args.frame_size)
+    print("\n" + "=" * 50)
+    print(f"  Events:          {args.count} (frames of {args.frame_size})")
+    print(f"  JSON CPU/event:  {json_cpu * 1e6:.1f}us")
+    print(f"  CBOR CPU/event:  {cbor_cpu * 1e6:.1f}us")
+    print(f"  Speedup:         {json_cpu / cbor_cpu:.1f}x")
+    print("=" * 50)
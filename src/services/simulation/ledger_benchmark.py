@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from pycardano import PaymentSigningKey, PaymentVerificationKey
+
+from src.services.aegis.chain.emulator import EmulatorBackend
+from src.services.aegis.ledger_emulator import LocalLedgerContext
+
+
+def create_throwaway_wallet(directory: str):
+    """Writes a fresh key pair so the benchmark never touches the real wallet."""
+    skey = PaymentSigningKey.generate()
+    vkey = PaymentVerificationKey.from_signing_key(skey)
+    skey_path = os.path.join(directory, "payment.skey")
+    vkey_path = os.path.join(directory, "payment.vkey")
+    skey.save(skey_path)
+    vkey.save(vkey_path)
+    return skey_path, vkey_path
+
+
+async def run_benchmark(
+    count: int, block_time: float, confirmation_latency: float, concurrency: int = 1
+):
+    """
+    Records `count` state changes through the real EmulatorBackend build/sign path
+    against a fresh local ledger, and reports end-to-end throughput and latency.
+    With `concurrency` > 1 the wallet is split into a UTxO pool and up to that many
+    submissions are in flight at once.
+    """
+    ledger = LocalLedgerContext(
+        block_time=block_time, confirmation_latency=confirmation_latency
+    )
+    with tempfile.TemporaryDirectory() as wallet_dir:
+        skey_path, vkey_path = create_throwaway_wallet(wallet_dir)
+        bc_service = EmulatorBackend(
+            payment_skey_path=skey_path,
+            payment_vkey_path=vkey_path,
+            ledger=ledger,
+            utxo_pool_settings=(
+                {
+                    "utxo_lovelace": 5_000_000,
+                    "target_size": concurrency * 2,
+                    "low_water": concurrency,
+                    "min_lovelace": 1_500_000,
+                }
+                if concurrency > 1
+                else None
+            ),
+            genesis_lovelace=10_000_000_000,
+        )
+
+    print(
+        f"Recording {count} state changes with concurrency {concurrency} "
+        f"(block time {block_time}s, confirmation latency {confirmation_latency}s)..."
+    )
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def record(i: int):
+        nonlocal failures
+        async with semaphore:
+            timestamp = datetime.now(timezone.utc)
+            log_hash = hashlib.sha256(f"benchmark-{i}-{timestamp}".encode()).hexdigest()
+            submit_started = time.perf_counter()
+            tx_id = await bc_service.record_state_change(
+                asset_id="a2b3cc56-b8e3-46d8-bcf5-d8f62cc5697a",
+                event_type="VAULT_EXIT",
+                log_bundle_hash=log_hash,
+                timestamp=timestamp,
+            )
+            if tx_id:
+                latencies.append(time.perf_counter() - submit_started)
+            else:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(record(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print("\n" + "=" * 50)
+    print(f"  Transactions:  {len(latencies)} in {elapsed:.2f}s ({failures} failed)")
+    print(f"  Throughput:    {len(latencies) / elapsed:.1f} tx/s")
+    print(f"  Latency p50:   {statistics.median(latencies) * 1000:.1f}ms")
+    print(f"  Latency p99:   {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+    print(f"  Ledger state:  {ledger.stats()}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure state change throughput against the local ledger emulator."
+    )
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--block-time", type=float, default=0.05)
+    parser.add_argument("--confirmation-latency", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(
+        run_benchmark(
+            args.count, args.block_time, args.confirmation_latency, args.concurrency
+        )
+    )
@@ -0,0 +1,385 @@
+"""
+Runs custody scenarios end to end through the real daemon cycle, in virtual time.
+
+Each run gets a fresh `MemoryDatabase` (an in-process stand-in for the parts of
+`DatabaseService` the cycle uses), a dry-run chain backend and a `VirtualClock`
+shared by the daemon, its working set and the anomaly processor. Waiting runs a
+daemon cycle every `CYCLE_INTERVAL_SECONDS` of virtual time, so a scenario that
+spans minutes, breach timeouts included, finishes in milliseconds.
+
+    python -m src.services.simulation.scenario [--repeat N] [--verbose] [NAME ...]
+
+exits with 1 if any run fails, so it can gate CI.
+
+The rules never move an asset into IN_TRANSIT_IN (no state change maps to it), so
+the return leg starts from an asset seeded in that status.
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from src.services.aegis import config
+from src.services.aegis.chain.base import ChainBackend
+from src.services.aegis.chain.dry_run import DryRunBackend
+from src.services.aegis.clock import VirtualClock
+from src.services.aegis.database import PendingStateChange, tracking_event_dict
+from src.services.aegis.log import configure_logging, shutdown_logging
+from src.services.aegis.main import Daemon
+from src.services.ingest.payload import split_details
+
+# Virtual time every run starts at.
+START = datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+class MemoryDatabase:
+    """
+    An ephemeral database for one scenario run. It implements the `DatabaseService`
+    methods the daemon cycle calls, over plain dicts, and stores tracking events as
+    rows with the `asset_tracking` columns, so the event dicts the processors see
+    are built exactly as in production.
+    """
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.assets: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.sensor_locations: Dict[uuid.UUID, str] = {}
+        self.events: Dict[int, SimpleNamespace] = {}
+        self.state_changes: List[Dict[str, Any]] = []
+        self._event_ids = itertools.count(1)
+
+    def add_asset(self, status: str) -> uuid.UUID:
+        asset_id = uuid.uuid4()
+        self.assets[asset_id] = {
+            "status": status,
+            "location": None,
+            "updated_at": self.clock.now(),
+        }
+        return asset_id
+
+    def add_sensor(self, location: str) -> uuid.UUID:
+        sensor_id = uuid.uuid4()
+        self.sensor_locations[sensor_id] = location
+        return sensor_id
+
+    def record_event(
+        self,
+        sensor_id: uuid.UUID,
+        asset_id: Optional[uuid.UUID],
+        event_type: str,
+        details: Optional[Dict[str, Any]],
+        timestamp: datetime,
+    ) -> int:
+        event_id = next(self._event_ids)
+        self.events[event_id] = SimpleNamespace(
+            id=event_id,
+            asset_id=asset_id,
+            sensor_id=sensor_id,
+            event_type=event_type,
+            timestamp=timestamp,
+            state_change_id=None,
+            **split_details(details),
+        )
+        return event_id
+
+    def state_changes_of(self, asset_id: uuid.UUID) -> List[str]:
+        return [
+            sc["event_type"] for sc in self.state_changes if sc["asset_id"] == asset_id
+        ]
+
+    # --- DatabaseService interface used by the daemon cycle ---
+
+    def get_refresh_watermarks(self) -> Tuple[datetime, int]:
+        return self.clock.now(), max(self.events, default=0)
+
+    def get_active_assets_state(self) -> List[Dict[str, Any]]:
+        return [
+            self._asset_state(asset_id)
+            for asset_id, asset in self.assets.items()
+            if asset["status"] != "RELEASED"
+        ]
+
+    def get_assets_state_changed_since(
+        self, since: datetime
+    ) -> Tuple[List[Dict[str, Any]], datetime]:
+        changed = [
+            self._asset_state(asset_id)
+            for asset_id, asset in self.assets.items()
+            if asset["updated_at"] >= since
+        ]
+        return changed, self.clock.now()
+
+    def get_unprocessed_tracking_events(
+        self, since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        rows = [
+            row
+            for row in self.events.values()
+            if row.state_change_id is None and (since is None or row.timestamp > since)
+        ]
+        rows.sort(key=lambda row: row.timestamp)
+        return [tracking_event_dict(row) for row in rows]
+
+    def get_tracking_events_after(self, after_id: int) -> List[Dict[str, Any]]:
+        return [
+            tracking_event_dict(row)
+            for event_id, row in sorted(self.events.items())
+            if event_id > after_id and row.state_change_id is None
+        ]
+
+    def get_linked_event_ids(self, event_ids: List[int]) -> List[int]:
+        return [
+            event_id
+            for event_id in event_ids
+            if event_id in self.events
+            and self.events[event_id].state_change_id is not None
+        ]
+
+    def commit_state_changes(
+        self, pending: List[PendingStateChange]
+    ) -> Tuple[List[Tuple[uuid.UUID, PendingStateChange]], List[PendingStateChange]]:
+        committed = []
+        for state_change in pending:
+            state_change_id = uuid.uuid4()
+            asset_id = uuid.UUID(str(state_change.asset_id))
+            self.state_changes.append(
+                {
+                    "id": state_change_id,
+                    "asset_id": asset_id,
+                    "event_type": state_change.event_type,
+                    "timestamp": state_change.timestamp,
+                    "on_chain_tx_id": state_change.on_chain_tx_id,
+                }
+            )
+            for event_id in state_change.event_ids_to_link:
+                self.events[event_id].state_change_id = state_change_id
+            asset = self.assets[asset_id]
+            asset["status"] = state_change.new_asset_status
+            if state_change.final_sensor_id is not None:
+                asset["location"] = self.sensor_locations.get(
+                    state_change.final_sensor_id, asset["location"]
+                )
+            asset["updated_at"] = self.clock.now()
+            committed.append((state_change_id, state_change))
+        return committed, []
+
+    def _asset_state(self, asset_id: uuid.UUID) -> Dict[str, Any]:
+        last_ts = max(
+            (
+                sc["timestamp"]
+                for sc in self.state_changes
+                if sc["asset_id"] == asset_id
+            ),
+            default=None,
+        )
+        return {
+            "id": asset_id,
+            "current_status": self.assets[asset_id]["status"],
+            "last_state_change_ts": last_ts.isoformat() if last_ts else None,
+        }
+
+
+# --- Scenarios ---
+
+
+class Emit(NamedTuple):
+    """A reading for the scenario's asset from the sensor at `location`."""
+
+    event_type: str
+    location: str
+    # Event time relative to the clock, e.g. -3 for a reading that arrives late.
+    offset_seconds: float = 0
+
+
+class Wait(NamedTuple):
+    """Runs daemon cycles for `seconds` of virtual time."""
+
+    seconds: float
+
+
+class Expect(NamedTuple):
+    """The asset's status, and optionally its latest state change."""
+
+    status: str
+    state_change: Optional[str] = None
+
+
+Step = Union[Emit, Wait, Expect]
+
+
+class Scenario(NamedTuple):
+    name: str
+    initial_status: str
+    steps: List[Step]
+
+
+VAULT_EXIT = [Emit("scan_exit", "VAULT"), Emit("auth_success", "TRANSFER_ZONE")]
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario(
+            "vault_exit_to_viewing",
+            "IN_VAULT",
+            [
+                *VAULT_EXIT,
+                Wait(30),
+                Expect("IN_TRANSIT_OUT", "VAULT_EXIT"),
+                Emit("scan_entry", "ANTECHAMBER"),
+                Emit("custody_scan", "ANTECHAMBER"),
+                Wait(30),
+                Expect("IN_VIEWING", "CUSTODY_TRANSFER"),
+            ],
+        ),
+        Scenario(
+            "transit_breach",
+            "IN_VAULT",
+            [
+                *VAULT_EXIT,
+                Wait(30),
+                Expect("IN_TRANSIT_OUT", "VAULT_EXIT"),
+                Wait(config.TRANSIT_ANOMALY_RULES["max_duration_minutes"] * 60),
+                Expect("FLAGGED_ANOMALY", "SECURITY_BREACH"),
+            ],
+        ),
+        Scenario(
+            "vault_return",
+            "IN_TRANSIT_IN",
+            [
+                Emit("scan_entry", "VAULT"),
+                Wait(30),
+                Expect("IN_VAULT", "VAULT_RETURN"),
+            ],
+        ),
+        Scenario(
+            "out_of_order_exit",
+            "IN_VAULT",
+            [
+                # The scan is stored after the auth that followed it.
+                Emit("auth_success", "TRANSFER_ZONE"),
+                Emit("scan_exit", "VAULT", offset_seconds=-2),
+                Wait(30),
+                Expect("IN_TRANSIT_OUT", "VAULT_EXIT"),
+            ],
+        ),
+    ]
+}
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class ScenarioResult(NamedTuple):
+    name: str
+    cycles: int
+    virtual_seconds: float
+    wall_seconds: float
+
+
+async def run_scenario(
+    scenario: Scenario,
+    bc_service: ChainBackend,
+    cycle_seconds: float = config.CYCLE_INTERVAL_SECONDS,
+) -> ScenarioResult:
+    """Runs `scenario` against a fresh database; raises `ScenarioFailed` on a miss."""
+    started = time.perf_counter()
+    clock = VirtualClock(START)
+    db = MemoryDatabase(clock)
+    daemon = Daemon(
+        db_service=db, bc_service=bc_service, clock=clock, snapshot_path=None
+    )
+    asset_id = db.add_asset(scenario.initial_status)
+    sensors = defaultdict(lambda: None)
+
+    for index, step in enumerate(scenario.steps):
+        if isinstance(step, Emit):
+            if sensors[step.location] is None:
+                sensors[step.location] = db.add_sensor(step.location)
+            db.record_event(
+                sensors[step.location],
+                asset_id,
+                step.event_type,
+                {"location_name": step.location},
+                clock.now() + timedelta(seconds=step.offset_seconds),
+            )
+            # Readings of a sequence are a second apart.
+            clock.advance(1)
+        elif isinstance(step, Wait):
+            until = clock.monotonic() + step.seconds
+            while clock.monotonic() < until:
+                await daemon.run_cycle()
+                await clock.sleep(cycle_seconds)
+        elif isinstance(step, Expect):
+            status = db.assets[asset_id]["status"]
+            history = db.state_changes_of(asset_id)
+            if status != step.status or (
+                step.state_change and history[-1:] != [step.state_change]
+            ):
+                raise ScenarioFailed(
+                    f"{scenario.name}, step {index}: expected {step.status}"
+                    f" after {step.state_change or 'any state change'}, got {status}"
+                    f" after {history or 'none'}"
+                )
+
+    return ScenarioResult(
+        scenario.name,
+        daemon.cycle_number,
+        clock.monotonic(),
+        time.perf_counter() - started,
+    )
+
+
+async def main(args: argparse.Namespace) -> int:
+    names = args.names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(
+            f"Unknown scenario(s): {', '.join(unknown)}. Choose from: {', '.join(SCENARIOS)}."
+        )
+        return 2
+
+    bc_service = DryRunBackend()
+    failures = 0
+    for name in names:
+        wall = []
+        failed = 0
+        for _ in range(args.repeat):
+            try:
+                result = await run_scenario(SCENARIOS[name], bc_service)
+            except ScenarioFailed as e:
+                failed += 1
+                if failed == 1:
+                    print(f"  FAIL {e}")
+                continue
+            wall.append(result.wall_seconds)
+        failures += failed
+        mean_ms = 1000 * sum(wall) / len(wall) if wall else float("nan")
+        print(
+            f"  {name:<24} {args.repeat - failed}/{args.repeat} passed"
+            f"  {mean_ms:7.2f} ms/run"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run custody scenarios through the daemon in virtual time."
+    )
+    parser.add_argument("names", nargs="*", help="Scenarios to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Log at INFO.")
+    parsed = parser.parse_args()
+    configure_logging("INFO" if parsed.verbose else "ERROR", config.LOG_FORMAT)
+    try:
+        exit_code = asyncio.run(main(parsed))
+    finally:
+        shutdown_logging()
+    sys.exit(exit_code)
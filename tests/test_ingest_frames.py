@@ -0,0 +1,165 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from src.api.ingest import controller
+from src.api.ingest.admission import gateway_key
+from src.configs.core import settings
+from src.database.core import get_db
+from src.database.entities.assets import Asset
+from src.database.entities.sensor import Sensor
+from src.main import app
+from src.services.ingest.frames import (
+    CONTENT_TYPE,
+    FrameError,
+    Reading,
+    encode_frame,
+    parse_frame,
+)
+from src.services.ingest.admission import AdmissionController
+from src.services.ingest.registry import IngestRegistry
+
+SENSOR = SimpleNamespace(
+    id=uuid.uuid4(),
+    name="vault-gate",
+    sensor_type="RFID_GATE",
+    location_id=uuid.uuid4(),
+    status="ONLINE",
+    short_id=7,
+)
+ASSET = SimpleNamespace(id=uuid.uuid4(), serial_number="A-1", short_id=3)
+
+
+class _StubQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _StubSession:
+    def __init__(self):
+        self.queried = []
+        self.inserted = []
+
+    def query(self, entity):
+        self.queried.append(entity)
+        return _StubQuery({Sensor: [SENSOR], Asset: [ASSET]}[entity])
+
+    def execute(self, statement, rows):
+        self.inserted.extend(rows)
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # A cold registry, and no write-behind or admission control in the way.
+    monkeypatch.setattr(controller, "ingest_registry", IngestRegistry())
+    monkeypatch.setattr(controller, "write_behind_buffer", None)
+    monkeypatch.setattr(controller, "admission_controller", None)
+    monkeypatch.setattr("src.api.ingest.admission.admission_controller", None)
+    session = _StubSession()
+    app.dependency_overrides[get_db] = lambda: session
+    yield session
+    app.dependency_overrides.pop(get_db)
+
+
+def test_frame_resolves_short_ids_against_a_cold_registry(session):
+    frame = encode_frame(
+        [Reading(SENSOR.short_id, ASSET.short_id, 1_700_000_000_000, None)]
+    )
+
+    response = TestClient(app).post(
+        "/api/v1/ingest/frames",
+        content=frame,
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+
+    assert response.status_code == 201, response.text
+    assert response.json() == {"accepted": 1, "rejected": []}
+    assert session.queried == [Sensor, Asset]
+    assert [row["sensor_id"] for row in session.inserted] == [SENSOR.id]
+    assert [row["asset_id"] for row in session.inserted] == [ASSET.id]
+
+
+@pytest.mark.parametrize(
+    "reading",
+    [
+        [[1], None, 0, None],
+        [1, "2", 0, None],
+        [True, None, 0, None],
+        [1, None, 1.5, None],
+        [1, None, 10**18, None],
+        [1, None, -(10**13), None],
+        [1, None, 0],
+    ],
+)
+def test_malformed_readings_fail_the_frame(reading):
+    with pytest.raises(FrameError):
+        parse_frame([1, 1_700_000_000_000, [reading]])
+
+
+def test_uncached_custody_readings_are_not_refused_as_too_large(session, monkeypatch):
+    admission = AdmissionController(
+        sensor_rate=1000,
+        sensor_burst=1000,
+        gateway_rate=10,
+        gateway_burst=10,
+        max_in_flight=4,
+        priority_sensor_types=["RFID_GATE"],
+        normal_share=0.5,
+        pool_usage=lambda: 0.0,
+    )
+    monkeypatch.setattr(controller, "admission_controller", admission)
+    monkeypatch.setattr("src.api.ingest.admission.admission_controller", admission)
+    # More readings than a request may carry as normal priority.
+    frame = encode_frame(
+        [
+            Reading(SENSOR.short_id, ASSET.short_id, 1_700_000_000_000 + i, None)
+            for i in range(8)
+        ]
+    )
+
+    response = TestClient(app).post(
+        "/api/v1/ingest/frames",
+        content=frame,
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+
+    assert response.status_code == 201, response.text
+    assert response.json()["accepted"] == 8
+
+
+def _request(headers):
+    return Request(
+        {
+            "type": "http",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("10.0.0.9", 5000),
+        }
+    )
+
+
+def test_gateway_is_charged_only_with_its_token(monkeypatch):
+    monkeypatch.setitem(settings.INGEST_GATEWAY_TOKENS, "vault-gw-1", "secret")
+
+    assert gateway_key(_request({"X-Gateway-Id": "vault-gw-1"})) == "ip:10.0.0.9"
+    assert (
+        gateway_key(_request({"X-Gateway-Id": "vault-gw-1", "X-Gateway-Token": "x"}))
+        == "ip:10.0.0.9"
+    )
+    assert (
+        gateway_key(
+            _request({"X-Gateway-Id": "vault-gw-1", "X-Gateway-Token": "secret"})
+        )
+        == "gw:vault-gw-1"
+    )
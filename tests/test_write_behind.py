@@ -0,0 +1,159 @@
+import contextlib
+import datetime
+import uuid
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError
+from sqlalchemy.sql import Select
+
+from src.services.ingest.payload import split_row
+from src.services.ingest.write_behind import (
+    WriteBehindBuffer,
+    _encode_row,
+)
+
+
+class _RecordingConnection:
+    def __init__(self, stored_keys=None):
+        self.executions = []
+        # idempotency key -> id of the row already holding it.
+        self.stored_keys = stored_keys or {}
+
+    def execute(self, statement, parameters=None):
+        if isinstance(statement, Select):
+            return _Result(list(self.stored_keys.items()))
+        if any(row.get("event_type") == "BAD" for row in parameters or []):
+            raise DataError(str(statement), parameters, Exception("value too long"))
+        self.executions.append((statement, parameters))
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _RecordingEngine:
+    def __init__(self, stored_keys=None):
+        self.conn = _RecordingConnection(stored_keys)
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self.conn
+
+
+def _reading(row_id, details):
+    return split_row(
+        {
+            "id": row_id,
+            "asset_id": uuid.uuid4(),
+            "sensor_id": uuid.uuid4(),
+            "event_type": "SCAN",
+            "details": details,
+            "timestamp": datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        }
+    )
+
+
+def test_commit_keeps_typed_fields_of_mixed_payload_families(tmp_path):
+    engine = _RecordingEngine()
+    buffer = WriteBehindBuffer(engine, str(tmp_path))
+    rfid = _reading(1, {"direction": "out", "location_name": "VAULT"})
+    environmental = _reading(2, {"temperature_c": 21.5, "humidity_pct": 40.5})
+
+    buffer._commit(
+        [
+            {"op": "insert", "row": _encode_row(rfid)},
+            {"op": "insert", "row": _encode_row(environmental)},
+        ]
+    )
+
+    ((statement, rows),) = engine.conn.executions
+    # A Core executemany takes its columns from the first row, as the driver will.
+    compiled = statement.compile(
+        dialect=postgresql.dialect(), column_keys=list(rows[0])
+    )
+    params = [compiled.construct_params(row) for row in rows]
+    assert params[0]["direction"] == "out"
+    assert params[0]["location_name"] == "VAULT"
+    assert params[0]["temperature_c"] is None
+    assert params[1]["temperature_c"] == 21.5
+    assert params[1]["humidity_pct"] == 40.5
+    assert params[1]["direction"] is None
+
+
+def test_replayed_rows_without_typed_keys_are_filled(tmp_path):
+    engine = _RecordingEngine()
+    buffer = WriteBehindBuffer(engine, str(tmp_path))
+    old = {
+        "id": 3,
+        "asset_id": None,
+        "sensor_id": str(uuid.uuid4()),
+        "event_type": "ENV",
+        "details": {},
+        "temperature_c": 19.0,
+        "timestamp": "2025-01-01T00:00:00+00:00",
+    }
+    rfid = _reading(4, {"direction": "in"})
+
+    buffer._commit(
+        [{"op": "insert", "row": old}, {"op": "insert", "row": _encode_row(rfid)}]
+    )
+
+    ((_, rows),) = engine.conn.executions
+    assert set(rows[0]) == set(rows[1])
+    assert rows[1]["direction"] == "in"
+
+
+def test_repeats_are_committed_as_absolute_counts(tmp_path):
+    engine = _RecordingEngine()
+    buffer = WriteBehindBuffer(engine, str(tmp_path))
+    records = [
+        {"op": "repeat", "id": 7, "seen_at": "2025-01-01T00:00:01+00:00", "reads": 2},
+        {"op": "repeat", "id": 7, "seen_at": "2025-01-01T00:00:02+00:00", "reads": 3},
+    ]
+
+    # A replay commits the same records again; the parameters must not accumulate.
+    buffer._commit(records)
+    buffer._commit(records)
+
+    first, second = (params for _, params in engine.conn.executions)
+    assert first == second
+    assert first[0]["reads"] == 3
+    assert first[0]["seen_at"].second == 2
+
+
+def test_refused_record_is_quarantined_and_the_rest_committed(tmp_path):
+    engine = _RecordingEngine()
+    buffer = WriteBehindBuffer(engine, str(tmp_path))
+    rows = [_reading(row_id, None) for row_id in range(1, 6)]
+    rows[3]["event_type"] = "BAD"
+
+    buffer._commit_or_quarantine(
+        [{"op": "insert", "row": _encode_row(row)} for row in rows]
+    )
+
+    committed = [row["id"] for _, params in engine.conn.executions for row in params]
+    assert sorted(committed) == [1, 2, 3, 5]
+    (quarantined,) = (tmp_path / "quarantine.jsonl").read_text().splitlines()
+    assert '"id": 4' in quarantined
+
+
+def test_row_with_a_stored_idempotency_key_is_dropped(tmp_path):
+    engine = _RecordingEngine(stored_keys={"retry-1": 1})
+    buffer = WriteBehindBuffer(engine, str(tmp_path))
+    replayed = {**_reading(1, None), "idempotency_key": "retry-1"}
+    duplicate = {**_reading(2, None), "idempotency_key": "retry-1"}
+    fresh = {**_reading(3, None), "idempotency_key": "retry-2"}
+
+    buffer._commit(
+        [
+            {"op": "insert", "row": _encode_row(row)}
+            for row in (replayed, duplicate, fresh)
+        ]
+    )
+
+    ((_, rows),) = engine.conn.executions
+    assert [row["id"] for row in rows] == [1, 3]